@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from django.contrib.auth.forms import UserCreationForm
+from leads.models import Agent, Category
 
 User = get_user_model()
 
@@ -15,4 +16,16 @@ class AgentModelForm(forms.ModelForm):
         )
 
 
+class AgentCategoriesForm(forms.ModelForm):
+    class Meta:
+        model = Agent
+        fields = (
+            'categories',
+        )
 
+    def __init__(self, *args, **kwargs):
+        request = kwargs.pop("request")
+        super(AgentCategoriesForm, self).__init__(*args, **kwargs)
+        self.fields["categories"].queryset = Category.objects.filter(organisation=request.organisation)
+        self.fields["categories"].widget = forms.CheckboxSelectMultiple()
+        self.fields["categories"].help_text = "Leads in these categories go to this agent first when routing by category affinity."
@@ -1,9 +1,93 @@
+import uuid
+
 from django.contrib.auth.mixins import AccessMixin
+from django.contrib import messages
+from django.http import JsonResponse
 from django.shortcuts import redirect
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from leads import caching, idempotency
 
 class OrganisorAndLoginRequiredMixin(AccessMixin):
     """Verify that the current user is authenticated and is an organisor"""
     def dispatch(self, request, *args, **kwargs):
         if not request.user.is_authenticated or not request.user.is_organisor:
             return redirect("leads:lead-list")
-        return super().dispatch(request, *args, **kwargs) 
\ No newline at end of file
+        return super().dispatch(request, *args, **kwargs) 
+
+
+class ConditionalGetMixin:
+    """Answer GETs with 304 Not Modified, before any rendering, when the client's copy is current.
+
+    By default a page is current for as long as its organisation stays on
+    the same cache generation, so checking costs no queries. Views that
+    render a single row can use its timestamp instead with get_version()
+    and get_last_modified().
+    """
+
+    def get_version(self):
+        """What the page was rendered from, anything that changes it must change this."""
+        return self.request.organisation.cache_generation
+
+    def get_last_modified(self):
+        return None
+
+    def get_etag(self):
+        request = self.request
+        #forms on the page embed the user's CSRF secret, which changes when they log in again
+        csrf = request.META.get("CSRF_COOKIE", "")
+        return caching.text_key(f"{request.user.pk}:{csrf}:{self.get_version()}:{request.get_full_path()}")
+
+    def get(self, request, *args, **kwargs):
+        #a page carrying flash messages is always rendered, or they would be lost
+        if len(messages.get_messages(request)):
+            return super().get(request, *args, **kwargs)
+        etag = quote_etag(self.get_etag())
+        last_modified = self.get_last_modified()
+        last_modified = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            response["ETag"] = etag
+            if last_modified:
+                response["Last-Modified"] = http_date(last_modified)
+        #keep it in the browser, but ask every time
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+
+class IdempotentPostMixin:
+    """Make POSTs safe to retry.
+
+    A POST sent again with the same Idempotency-Key header, or
+    idempotency_key form field, gets the first one's response back without
+    running again. See leads/idempotency.py. This wraps post() rather than
+    dispatch() so the view's access checks always run first, wherever the
+    mixin is listed.
+    """
+
+    def post(self, request, *args, **kwargs):
+        key = idempotency.get_key(request)
+        if not key:
+            return super().post(request, *args, **kwargs)
+        try:
+            return idempotency.run_once(
+                request, key, lambda: super(IdempotentPostMixin, self).post(request, *args, **kwargs)
+            )
+        except idempotency.KeyReused:
+            return self.key_error("This idempotency key was already used for a different request.", 422)
+        except idempotency.KeyInProgress:
+            return self.key_error("A request with this idempotency key is still in progress.", 409)
+
+    def key_error(self, message, status):
+        if not hasattr(self, "get_form"):
+            return JsonResponse({"errors": {"__all__": [message]}}, status=status)
+        #a form sent again after going back and editing it, show it with a fresh key to send it as new
+        #post() of a create view hasn't run, which is where it sets object
+        self.object = getattr(self, "object", None)
+        form = self.get_form()
+        form.add_error(None, "This form was already sent. Check it wasn't saved before sending it again.")
+        response = self.render_to_response(self.get_context_data(form=form, idempotency_key=uuid.uuid4().hex))
+        response.status_code = status
+        return response
@@ -1,3 +1,25 @@
 from django.test import TestCase
+from django.shortcuts import reverse
 
-# Create your tests here.
+from leads.tests.helpers import QueryBudgetMixin, create_organisor, create_agent
+
+
+class AgentQueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.agents = []
+        self.client.force_login(self.user)
+
+    def seed_agents(self, count):
+        start = len(self.agents)
+        for i in range(start, start + count):
+            self.agents.append(create_agent(self.user.userprofile, f"agent{i}"))
+
+    def test_agent_list(self):
+        self.assertQueryBudget(reverse("agents:agent-list"), 5, self.seed_agents)
+
+    def test_agent_detail(self):
+        self.seed_agents(1)
+        url = reverse("agents:agent-detail", kwargs={"pk": self.agents[0].pk})
+        self.assertQueryBudget(url, 5, self.seed_agents)
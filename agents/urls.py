@@ -1,7 +1,7 @@
 from django.urls import path
 from .views import (
     AgentListView, AgentCreateView, AgentDetailView,
-    AgentUpdateView, AgentDeleteView
+    AgentUpdateView, AgentDeleteView, AgentCategoriesView
 )    
 
 app_name='agents'
@@ -12,4 +12,5 @@ urlpatterns = [
     path('<int:pk>/', AgentDetailView.as_view(), name='agent-detail'),
     path('<int:pk>/update/', AgentUpdateView.as_view(), name='agent-update'),
     path('<int:pk>/delete/', AgentDeleteView.as_view(), name='agent-delete'),
+    path('<int:pk>/categories/', AgentCategoriesView.as_view(), name='agent-categories'),
 ]
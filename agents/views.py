@@ -1,19 +1,24 @@
 from django.shortcuts import reverse
 from django.views import generic
 from django.contrib.auth.mixins import LoginRequiredMixin
+from leads import caching
 from leads.models import Agent
-from .forms import AgentModelForm
-from django.core.mail import send_mail
-from .mixins import OrganisorAndLoginRequiredMixin
+from .forms import AgentModelForm, AgentCategoriesForm
+from django.db import transaction
+from leads.mail import queue_mail
+from .mixins import OrganisorAndLoginRequiredMixin, ConditionalGetMixin
 import random
 # Create your views here.
 
-class AgentListView(OrganisorAndLoginRequiredMixin, generic.ListView):
+class AgentListView(OrganisorAndLoginRequiredMixin, ConditionalGetMixin, generic.ListView):
     template_name = "agents/agent_list.html"
+    read_from_replica = True
 
     def get_queryset(self):
-        organisation = self.request.user.userprofile
-        return Agent.objects.filter(organisation=organisation)
+        organisation = self.request.organisation
+        return caching.get_or_set(
+            organisation, "agents", lambda: list(Agent.objects.filter(organisation=organisation).select_related("user"))
+        )
 
 
 class AgentCreateView(OrganisorAndLoginRequiredMixin, generic.CreateView):
@@ -23,6 +28,7 @@ class AgentCreateView(OrganisorAndLoginRequiredMixin, generic.CreateView):
     def get_success_url(self):
         return reverse("agents:agent-list")
 
+    @transaction.atomic
     def form_valid(self, form):
         user=form.save(commit=False)
         user.is_agent = True
@@ -31,9 +37,9 @@ class AgentCreateView(OrganisorAndLoginRequiredMixin, generic.CreateView):
         user.save()
         Agent.objects.create(
             user=user,
-            organisation= self.request.user.userprofile
+            organisation= self.request.organisation
         )
-        send_mail(
+        queue_mail(
            subject="Your are invited to be an agent",
            message="You were added as an agent on DJCRM.Please come login to start working.",
            from_email="admin@test.com",
@@ -43,12 +49,13 @@ class AgentCreateView(OrganisorAndLoginRequiredMixin, generic.CreateView):
 
 
 
-class AgentDetailView(OrganisorAndLoginRequiredMixin, generic.DetailView):
+class AgentDetailView(OrganisorAndLoginRequiredMixin, ConditionalGetMixin, generic.DetailView):
     template_name = "agents/agent_detail.html"
+    read_from_replica = True
     context_object_name = "agent"
 
     def get_queryset(self):
-        return Agent.objects.all()
+        return Agent.objects.filter(organisation=self.request.organisation).select_related("user")
         
 
 
@@ -60,9 +67,28 @@ class AgentUpdateView(OrganisorAndLoginRequiredMixin, generic.UpdateView):
         return reverse("agents:agent-list")
 
     def get_queryset(self):
-        return Agent.objects.all()    
+        return Agent.objects.filter(organisation=self.request.organisation)    
         
 
+class AgentCategoriesView(OrganisorAndLoginRequiredMixin, generic.UpdateView):
+    template_name = "agents/agent_categories.html"
+    form_class = AgentCategoriesForm
+    context_object_name = "agent"
+
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(AgentCategoriesView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "request": self.request
+        })
+        return kwargs
+
+    def get_success_url(self):
+        return reverse("agents:agent-detail", kwargs={"pk": self.object.pk})
+
+    def get_queryset(self):
+        return Agent.objects.filter(organisation=self.request.organisation).select_related("user")
+
+
 class AgentDeleteView(OrganisorAndLoginRequiredMixin, generic.DeleteView):
     template_name = "agents/agent_delete.html"
     context_object_name = "agent"
@@ -71,4 +97,4 @@ class AgentDeleteView(OrganisorAndLoginRequiredMixin, generic.DeleteView):
         return reverse("agents:agent-list")
 
     def get_queryset(self):
-        return Agent.objects.all()
+        return Agent.objects.filter(organisation=self.request.organisation)
@@ -57,6 +57,8 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'leads.middleware.OrganisationMiddleware',
+    'leads.middleware.ReplicaMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -87,10 +89,58 @@ WSGI_APPLICATION = 'djcrm.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'leads.sqlite_backend',
         'NAME': BASE_DIR / 'db.sqlite3',
+    },
+    # a copy of default kept up to date by `manage.py sync_replicas`
+    'replica': {
+        'ENGINE': 'leads.sqlite_backend',
+        'NAME': BASE_DIR / 'db-replica.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['leads.replicas.ReplicaRouter']
+# Views with read_from_replica = True read from one of these, see leads/replicas.py.
+# Add 'replica' once sync_replicas is running. A client's reads stay on
+# default for LEAD_REPLICA_PIN_SECONDS after it writes, which should be
+# longer than the replicas can lag behind.
+LEAD_READ_REPLICAS = []
+LEAD_REPLICA_PIN_SECONDS = 10
+
+# Applied to every new SQLite connection, see leads/sqlite.py.
+# busy_timeout makes a writer wait for the lock instead of failing with
+# "database is locked". synchronous=NORMAL is safe with WAL, a power cut
+# can only lose the last transactions, never corrupt the file.
+SQLITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'synchronous': 'normal',
+    'mmap_size': 256 * 1024 * 1024,
+    'cache_size': -64 * 1024,  # KiB when negative
+    'temp_store': 'memory',
+}
+# The journal mode is stored in the database file. `manage.py set_journal_mode`
+# switches a database to this once, WAL lets readers carry on while a
+# worker writes.
+SQLITE_JOURNAL_MODE = 'wal'
+# Transactions begin DEFERRED, the write paths use leads.sqlite.atomic_write(),
+# which begins them IMMEDIATE so concurrent writers queue on busy_timeout.
+SQLITE_TRANSACTION_MODE = 'DEFERRED'
+
+
+# Cache
+# Organisation scoped data is cached under LEAD_CACHE_ALIAS, see leads/caching.py.
+# Any django cache backend can be used: locmem keeps a cache per process,
+# FileBasedCache ("LOCATION": "/var/tmp/djcrm_cache") shares one between the
+# processes on a machine, and a Redis backend (e.g. django-redis) between machines.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'djcrm',
     }
 }
+LEAD_CACHE_ALIAS = 'default'
+LEAD_CACHE_TIMEOUT = 300
 
 
 # Password validation
@@ -136,7 +186,16 @@ STATICFILES_DIRS = [
 STATIC_ROOT = "static_root"
 
 AUTH_USER_MODEL = 'leads.User'
+AUTHENTICATION_BACKENDS = ['leads.backends.TenantModelBackend']
 EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
+#outgoing email is queued and sent by `manage.py process_outbox`
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETRY_BACKOFF_SECONDS = 60
+OUTBOX_LEASE_SECONDS = 300
+#country code assumed for lead phone numbers entered without one
+LEAD_PHONE_COUNTRY_CODE = "1"
+#seconds a lead create request's Idempotency-Key is remembered, expired keys are deleted by `manage.py prune_idempotency_keys`
+LEAD_IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
 LOGIN_REDIRECT_URL = "/leads"
 LOGIN_URL = "/login"
 LOGOUT_REDIRECT_URL = "/"
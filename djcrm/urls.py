@@ -6,6 +6,7 @@ PasswordResetView, PasswordResetConfirmView, PasswordResetCompleteView,
 PasswordResetDoneView)
 from django.urls import path, include
 from leads.views import LandingPageView, SignupView
+from leads.forms import OutboxPasswordResetForm
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -13,7 +14,7 @@ urlpatterns = [
     path('leads/', include('leads.urls', namespace="leads")),
     path('agents/', include('agents.urls', namespace="agents")),
     path('signup/', SignupView.as_view(), name='signup'), 
-    path('reset-password/', PasswordResetView.as_view(), name='reset-password'), 
+    path('reset-password/', PasswordResetView.as_view(form_class=OutboxPasswordResetForm), name='reset-password'), 
     path('password-reset-done/', PasswordResetDoneView.as_view(), name='password_reset_done'), 
     path('password-reset-confirm/<uidb64>/<token>/', PasswordResetConfirmView.as_view(), name='password_reset_confirm'), 
     path('password-reset-complete/', PasswordResetCompleteView.as_view(), name='password_reset_complete'), 
@@ -1,10 +1,12 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import User, Lead, Agent, UserProfile, Category
+from .models import User, Lead, Agent, UserProfile, Category, OutgoingEmail, IdempotencyKey
 
 admin.site.register(User)
 admin.site.register(UserProfile)
 admin.site.register(Lead)
 admin.site.register(Agent)
-admin.site.register(Category)
\ No newline at end of file
+admin.site.register(Category)
+admin.site.register(OutgoingEmail)
+admin.site.register(IdempotencyKey)
@@ -0,0 +1,176 @@
+from django.forms.models import model_to_dict
+
+from . import routing
+from .bulk import bulk_create_leads, bulk_save_leads
+from .forms import LeadApiRowForm
+from .models import Lead, Agent, Category
+from .sqlite import atomic_write
+
+# field clients can ask for -> lookup, the joins are resolved by the database
+LEAD_FIELDS = {
+    "id": "id",
+    "first_name": "first_name",
+    "last_name": "last_name",
+    "age": "age",
+    "email": "email",
+    "phone_number": "phone_number",
+    "description": "description",
+    "agent": "agent_id",
+    "agent_email": "agent__user__email",
+    "category": "category_id",
+    "category_name": "category__name",
+    "date_added": "date_added",
+    "updated_at": "updated_at",
+}
+CATEGORY_FIELDS = {
+    "id": "id",
+    "name": "name",
+    "lead_count": "lead_count",
+    "updated_at": "updated_at",
+}
+AGENT_FIELDS = {
+    "id": "id",
+    "username": "user__username",
+    "email": "user__email",
+    "first_name": "user__first_name",
+    "last_name": "user__last_name",
+    "open_lead_count": "open_lead_count",
+    "updated_at": "updated_at",
+}
+
+# leads are listed oldest first, so a client can follow the next cursors to catch up
+LEAD_ORDERING = ("date_added", "id")
+
+
+class InvalidFields(ValueError):
+    pass
+
+
+def parse_fields(value, available):
+    """The field names asked for in a comma separated `fields` parameter, all of them if it is empty."""
+    names = [name.strip() for name in (value or "").split(",") if name.strip()]
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        raise InvalidFields(f"Unknown fields {', '.join(unknown)}, expected some of {', '.join(available)}")
+    return list(dict.fromkeys(names)) or list(available)
+
+
+def project(queryset, names, available, extra=()):
+    """The queryset as dicts holding only the columns behind names, plus any extra lookups."""
+    lookups = [available[name] for name in names]
+    return queryset.values(*dict.fromkeys(lookups + list(extra)))
+
+
+def serialise(rows, names, available):
+    """Rename projected rows to the API's field names, dropping anything not asked for."""
+    return [{name: row[available[name]] for name in names} for row in rows]
+
+
+def lead_queryset(user, organisation):
+    """The leads a user may read, every lead of the organisation or an agent's own."""
+    queryset = Lead.objects.filter(organisation=organisation)
+    if not user.is_organisor:
+        queryset = queryset.filter(agent__user=user)
+    return queryset
+
+
+def category_queryset(organisation):
+    return Category.objects.filter(organisation=organisation).order_by("id")
+
+
+def agent_queryset(organisation):
+    return Agent.objects.filter(organisation=organisation).order_by("id")
+
+
+class LeadBatchWriter:
+    """Create and update leads from the items of a bulk API request.
+
+    Items with an "id" update that lead, the rest are new leads. Every item
+    is validated first, then the valid ones are written chunk by chunk with
+    bulk_create and bulk_update, one transaction per chunk, so a request
+    costs a few queries per chunk rather than several per lead. run()
+    returns one result per item, in the same order.
+    """
+    fields = LeadApiRowForm.Meta.fields
+
+    def __init__(self, organisation, chunk_size=500):
+        self.organisation = organisation
+        self.chunk_size = chunk_size
+        self.agents = set(Agent.objects.filter(organisation=organisation).values_list("id", flat=True))
+        self.categories = set(Category.objects.filter(organisation=organisation).values_list("id", flat=True))
+        self.router = routing.get_strategy(organisation) if organisation.routing_strategy else None
+
+    def run(self, items):
+        results = [None] * len(items)
+        ids = [item["id"] for item in items if isinstance(item, dict) and type(item.get("id")) is int]
+        existing = Lead.objects.filter(organisation=self.organisation).in_bulk(ids)
+        seen = set()
+        created, updated = [], []
+        for index, item in enumerate(items):
+            lead, errors = self.build_lead(item, existing, seen)
+            if errors:
+                results[index] = {"status": "error", "errors": errors}
+            elif lead.pk is None:
+                created.append((index, lead))
+            elif lead._changed_fields:
+                updated.append((index, lead))
+            else:
+                results[index] = {"status": "unchanged", "id": lead.pk}
+
+        for chunk in self.chunks(created):
+            leads = [lead for index, lead in chunk]
+            with atomic_write():
+                if self.router is not None:
+                    routing.route_new_leads(self.router, leads)
+                bulk_create_leads(leads)
+            for index, lead in chunk:
+                results[index] = {"status": "created", "id": lead.pk}
+        for chunk in self.chunks(updated):
+            #only the columns some lead in the chunk changed are written
+            changed = set().union(*[lead._changed_fields for index, lead in chunk])
+            bulk_save_leads([lead for index, lead in chunk], changed)
+            for index, lead in chunk:
+                results[index] = {"status": "updated", "id": lead.pk}
+        return results
+
+    def chunks(self, items):
+        for start in range(0, len(items), self.chunk_size):
+            yield items[start:start + self.chunk_size]
+
+    def build_lead(self, item, existing, seen):
+        if not isinstance(item, dict):
+            return None, {"__all__": ["Item is not a JSON object."]}
+        lead = None
+        data = item
+        initial = None
+        if item.get("id") is not None:
+            pk = item["id"]
+            if type(pk) is not int or pk not in existing:
+                return None, {"id": [f"No lead with id {pk!r} in this organisation."]}
+            if pk in seen:
+                return None, {"id": ["This lead appears more than once."]}
+            seen.add(pk)
+            lead = existing[pk]
+            #fields left out of an update keep their values
+            initial = {"agent": lead.agent_id, "category": lead.category_id}
+            data = {**model_to_dict(lead, fields=self.fields), **initial, **item}
+
+        form = LeadApiRowForm(data=data, instance=lead, initial=initial)
+        if not form.is_valid():
+            return None, {field: list(messages) for field, messages in form.errors.items()}
+        agent_id, category_id = form.cleaned_data["agent"], form.cleaned_data["category"]
+        errors = {}
+        if agent_id is not None and agent_id not in self.agents:
+            errors["agent"] = [f"No agent with id {agent_id} in this organisation."]
+        if category_id is not None and category_id not in self.categories:
+            errors["category"] = [f"No category with id {category_id} in this organisation."]
+        if errors:
+            return None, errors
+
+        lead = form.save(commit=False)
+        lead._changed_fields = set(form.changed_data)
+        lead.organisation = self.organisation
+        #new leads left without an agent are routed when they are written
+        lead.agent_id = agent_id
+        lead.category_id = category_id
+        return lead, {}
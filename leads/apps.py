@@ -1,5 +1,21 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_migrate
+
+
+def install_search_index(sender, using, **kwargs):
+    from django.db import connections
+    from . import search, fuzzy
+    search.install(connections[using])
+    fuzzy.install(connections[using])
 
 
 class LeadsConfig(AppConfig):
     name = 'leads'
+
+    def ready(self):
+        #connects the cache invalidation signals
+        from . import caching
+        post_migrate.connect(install_search_index, sender=self)
+        from . import sqlite
+        connection_created.connect(sqlite.configure_connection)
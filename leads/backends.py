@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+UserModel = get_user_model()
+
+
+class TenantModelBackend(ModelBackend):
+    """ModelBackend that loads the user's tenant context along with the user.
+
+    The profile, agent and the agent's organisation come back in the same
+    joined query as the session user, so request.user.userprofile and
+    request.user.agent.organisation never cost another query.
+    """
+    def get_user(self, user_id):
+        try:
+            user = UserModel._default_manager.select_related(
+                "userprofile", "agent__organisation"
+            ).get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
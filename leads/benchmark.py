@@ -0,0 +1,288 @@
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import statistics
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection, connections
+from django.shortcuts import reverse
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from . import caching
+from .models import Lead, Agent, Category
+from .seeding import Seeder
+from .sqlite import DEFAULT_JOURNAL_MODE
+
+
+def percentile(values, percent):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(percent / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class Scenario:
+    """One view to benchmark, requests() yields (method, url, data) forever."""
+
+    def __init__(self, name, requests):
+        self.name = name
+        self.requests = requests
+
+
+def build_scenarios(organisation):
+    lead_ids = list(Lead.objects.filter(organisation=organisation).order_by("?").values_list("id", flat=True)[:200])
+    unassigned_ids = list(
+        Lead.objects.filter(organisation=organisation, agent__isnull=True).order_by("?").values_list("id", flat=True)[:200]
+    ) or lead_ids
+    category_ids = list(Category.objects.filter(organisation=organisation).values_list("id", flat=True))
+    agent_ids = list(Agent.objects.filter(organisation=organisation).values_list("id", flat=True))
+
+    def get(name, *ids):
+        def requests():
+            for pk in itertools.cycle(ids or [None]):
+                yield "get", reverse(name, kwargs={"pk": pk}) if pk else reverse(name), None
+        return requests
+
+    def create_lead():
+        for number in itertools.count():
+            yield "post", reverse("leads:lead-create"), {
+                "first_name": "Bench", "last_name": f"Mark{number}", "age": 30, "agent": "",
+                "description": "Created by the benchmark", "phone_number": "0700000000",
+                "email": f"bench{number}@example.com",
+            }
+
+    def fuzzy_search():
+        #a different misspelled email per request, so searches miss the cache
+        emails = Lead.objects.filter(pk__in=lead_ids).values_list("email", flat=True)
+        queries = [f"{email[1]}{email[0]}{email.split('@')[0][2:]}" for email in emails]
+        for query in itertools.cycle(queries or ["nobody"]):
+            yield "get", reverse("leads:lead-search"), {"q": query, "mode": "fuzzy"}
+
+    def assign_agent():
+        for pk, agent_id in zip(itertools.cycle(unassigned_ids), itertools.cycle(agent_ids)):
+            yield "post", reverse("leads:assign-agent", kwargs={"pk": pk}), {"agent": agent_id}
+
+    return [
+        Scenario("lead_list", get("leads:lead-list")),
+        Scenario("lead_detail", get("leads:lead-details", *lead_ids)),
+        Scenario("category_list", get("leads:category-list")),
+        Scenario("category_detail", get("leads:category-detail", *category_ids)),
+        Scenario("agent_list", get("agents:agent-list")),
+        Scenario("lead_search_fuzzy", fuzzy_search),
+        Scenario("lead_create", create_lead),
+        Scenario("assign_agent", assign_agent),
+    ]
+
+
+class ViewBenchmark:
+    """Seed a fresh database and time each scenario through django's test Client."""
+
+    def __init__(self, requests=50, warmup=5, memory_requests=5, seed=0, agents=20, categories=6, log=None):
+        self.requests = requests
+        self.warmup = warmup
+        self.memory_requests = memory_requests
+        self.seed = seed
+        self.agents = agents
+        self.categories = categories
+        self.log = log or (lambda message: None)
+
+    def run(self, size, only=None):
+        [organisation] = Seeder(seed=self.seed, prefix=f"bench{size}").seed(
+            organisations=1, agents=self.agents, categories=self.categories, leads=size
+        )
+        client = Client()
+        client.force_login(organisation.user)
+
+        results = []
+        for scenario in build_scenarios(organisation):
+            if only and scenario.name not in only:
+                continue
+            self.log(f"{scenario.name} at {size} leads")
+            results.append(self.measure(client, scenario, size))
+        return results
+
+    def request(self, client, method, url, data):
+        response = getattr(client, method)(url, data)
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method.upper()} {url} returned {response.status_code}")
+        if response.streaming:
+            b"".join(response.streaming_content)
+        return response
+
+    def measure(self, client, scenario, size):
+        requests = scenario.requests()
+        for method, url, data in itertools.islice(requests, self.warmup):
+            self.request(client, method, url, data)
+
+        timings = []
+        queries = []
+        caching.fragment_stats.reset()
+        for method, url, data in itertools.islice(requests, self.requests):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                self.request(client, method, url, data)
+                timings.append((time.perf_counter() - start) * 1000)
+            queries.append(len(captured))
+        hit_rate = caching.fragment_stats.hit_rate
+
+        #tracemalloc slows everything down, so peak memory gets its own pass
+        peaks = []
+        tracemalloc.start()
+        try:
+            for method, url, data in itertools.islice(requests, self.memory_requests):
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                self.request(client, method, url, data)
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+        finally:
+            tracemalloc.stop()
+
+        return {
+            "view": scenario.name,
+            "size": size,
+            "requests": len(timings),
+            "p50_ms": round(percentile(timings, 50), 3),
+            "p95_ms": round(percentile(timings, 95), 3),
+            "p99_ms": round(percentile(timings, 99), 3),
+            "mean_ms": round(statistics.mean(timings), 3),
+            "queries": max(queries),
+            "peak_memory_kib": round(max(peaks) / 1024, 1) if peaks else None,
+            "fragment_hit_rate": None if hit_rate is None else round(hit_rate, 3),
+        }
+
+
+def concurrency_requests(username, write_ratio, rng):
+    """(is_write, method, url, data) for a mix of reads and writes, forever."""
+    lead_ids = list(Lead.objects.filter(organisation__user__username=username).values_list("id", flat=True)[:200])
+    category_ids = list(Category.objects.filter(organisation__user__username=username).values_list("id", flat=True))
+    for number in itertools.count():
+        if rng.random() >= write_ratio:
+            yield False, "get", rng.choice([
+                reverse("leads:lead-list"),
+                reverse("leads:lead-details", kwargs={"pk": rng.choice(lead_ids)}),
+                reverse("leads:api-lead-list"),
+            ]), None
+        elif rng.random() < 0.5:
+            yield True, "post", reverse("leads:lead-create"), {
+                "first_name": "Bench", "last_name": f"Worker{number}", "age": 30, "agent": "",
+                "description": "Created by the benchmark", "phone_number": "0700000000",
+                "email": f"bench{rng.random()}@example.com",
+            }
+        else:
+            yield True, "post", reverse("leads:lead-category-update", kwargs={"pk": rng.choice(lead_ids)}), {
+                "category": rng.choice(category_ids),
+            }
+
+
+def concurrency_worker(job):
+    """One process of a ConcurrencyBenchmark run, returns its latencies and errors."""
+    database, overrides, username, seconds, write_ratio, seed = job
+    connections["default"].settings_dict["NAME"] = database
+    #the failures are counted, their tracebacks would only drown the report
+    logging.getLogger("django.request").setLevel(logging.CRITICAL)
+    result = {"reads": [], "writes": [], "errors": {}}
+    with override_settings(**overrides):
+        client = Client()
+        client.force_login(get_user_model().objects.get(username=username))
+        requests = concurrency_requests(username, write_ratio, random.Random(seed))
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            write, method, url, data = next(requests)
+            start = time.perf_counter()
+            try:
+                response = getattr(client, method)(url, data)
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{method.upper()} {url} returned {response.status_code}")
+            except Exception as error:
+                #"database is locked" is what the tuning is meant to get rid of, count it rather than stop
+                message = f"{type(error).__name__}: {error}"
+                result["errors"][message] = result["errors"].get(message, 0) + 1
+                continue
+            result["writes" if write else "reads"].append((time.perf_counter() - start) * 1000)
+    connections.close_all()
+    return result
+
+
+class ConcurrencyBenchmark:
+    """Hammer one SQLite file from several processes at once, once per profile.
+
+    Every process logs in as the seeded organisation and mixes reads (lead
+    list, lead detail, API page) with writes (creating leads, changing a
+    lead's category) until the time is up. Each profile gets its own copy
+    of the same seeded database, so the runs only differ in the settings
+    the profile overrides, SQLITE_PRAGMAS, SQLITE_JOURNAL_MODE and
+    SQLITE_TRANSACTION_MODE.
+    """
+
+    def __init__(self, processes=(1, 4, 8), seconds=5, write_ratio=0.2, leads=10000, seed=0, log=None):
+        self.processes = processes
+        self.seconds = seconds
+        self.write_ratio = write_ratio
+        self.leads = leads
+        self.seed = seed
+        self.log = log or (lambda message: None)
+
+    def seed_database(self, name):
+        connections.close_all()
+        connection.settings_dict["NAME"] = name
+        call_command("migrate", verbosity=0)
+        [organisation] = Seeder(seed=self.seed, prefix="concurrency").seed(
+            organisations=1, agents=10, categories=4, leads=self.leads
+        )
+        connections.close_all()
+        return organisation.user.username
+
+    def run(self, directory, profiles):
+        """Results for each of profiles, a dict of name -> settings, at each number of processes."""
+        template = os.path.join(directory, "template.sqlite3")
+        self.log(f"seeding {self.leads} leads")
+        username = self.seed_database(template)
+
+        results = []
+        for profile, overrides in profiles.items():
+            journal_mode = overrides.get("SQLITE_JOURNAL_MODE", DEFAULT_JOURNAL_MODE)
+            for processes in self.processes:
+                name = os.path.join(directory, f"{profile}-{processes}.sqlite3")
+                shutil.copyfile(template, name)
+                #switching the journal mode needs the file to itself, so it is done before the workers start
+                database = sqlite3.connect(name)
+                database.execute(f"PRAGMA journal_mode = {journal_mode}")
+                database.close()
+
+                self.log(f"{profile} with {processes} processes")
+                connections.close_all()
+                jobs = [
+                    (name, overrides, username, self.seconds, self.write_ratio, self.seed + number)
+                    for number in range(processes)
+                ]
+                with multiprocessing.get_context("fork").Pool(processes) as pool:
+                    outcomes = pool.map(concurrency_worker, jobs)
+                results.append(self.summarise(profile, processes, outcomes))
+        return results
+
+    def summarise(self, profile, processes, outcomes):
+        reads = [timing for outcome in outcomes for timing in outcome["reads"]]
+        writes = [timing for outcome in outcomes for timing in outcome["writes"]]
+        errors = {}
+        for outcome in outcomes:
+            for message, count in outcome["errors"].items():
+                errors[message] = errors.get(message, 0) + count
+        return {
+            "profile": profile,
+            "processes": processes,
+            "reads_per_s": round(len(reads) / self.seconds, 1),
+            "writes_per_s": round(len(writes) / self.seconds, 1),
+            "read_p95_ms": round(percentile(reads, 95), 3) if reads else None,
+            "write_p95_ms": round(percentile(writes, 95), 3) if writes else None,
+            "errors": sum(errors.values()),
+            "error_messages": errors,
+        }
@@ -0,0 +1,111 @@
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import caching, counters
+from .models import Lead
+from .sqlite import atomic_write
+
+
+def bulk_create_leads(leads, batch_size=None):
+    """bulk_create leads and do the bookkeeping the save signals would have done.
+
+    Runs in one transaction, callers wanting smaller transactions should
+    call it once per chunk. The leads get their ids on every backend.
+    """
+    for lead in leads:
+        lead.normalize()
+    with transaction.atomic():
+        Lead.objects.bulk_create(leads, batch_size=batch_size)
+        if leads and leads[0].pk is None:
+            #SQLite can't return the new ids, but the transaction holds the write lock, so they are the newest ids
+            ids = Lead.objects.order_by("-id").values_list("id", flat=True)[:len(leads)]
+            for lead, pk in zip(leads, reversed(ids)):
+                lead.pk = pk
+                lead._counted_keys = counters.counted_keys(lead)
+        counters.apply_deltas(counters.lead_deltas(leads))
+        for organisation_id in {lead.organisation_id for lead in leads}:
+            caching.bump(organisation_id)
+    return leads
+
+
+def bulk_save_leads(leads, fields, batch_size=None):
+    """bulk_update fields of leads loaded from the database, with the bookkeeping save() would do.
+
+    Sets updated_at and the normalized columns, and moves the counters
+    from what the leads were loaded with to what they hold now. Fields
+    every lead has the same value for are written with one plain UPDATE,
+    bulk_update's CASE expressions are only built for the others.
+    """
+    now = timezone.now()
+    for lead in leads:
+        lead.normalize()
+        lead.updated_at = now
+        lead.version += 1
+    fields = set(fields) | {"updated_at"}
+    if "email" in fields:
+        fields.add("email_normalized")
+    if "phone_number" in fields:
+        fields.add("phone_e164")
+    same, varying = {}, []
+    for name in sorted(fields):
+        attname = Lead._meta.get_field(name).attname
+        values = {getattr(lead, attname) for lead in leads}
+        if len(values) == 1:
+            same[attname] = values.pop()
+        else:
+            varying.append(name)
+    same["version"] = F("version") + 1
+    deltas = counters.lead_deltas([lead._counted_keys for lead in leads], -1)
+    deltas.update(counters.lead_deltas(leads))
+    with transaction.atomic():
+        Lead.objects.filter(pk__in=[lead.pk for lead in leads]).update(**same)
+        if varying:
+            Lead.objects.bulk_update(leads, varying, batch_size=batch_size)
+        counters.apply_deltas(deltas)
+        for organisation_id in {lead.organisation_id for lead in leads}:
+            caching.bump(organisation_id)
+    for lead in leads:
+        lead._counted_keys = counters.counted_keys(lead)
+    return leads
+
+
+def bulk_update_leads(organisation, queryset, name, value):
+    """Point the `name` foreign key (agent or category) of every lead in queryset at value.
+
+    One UPDATE, scoped to the organisation, without loading the leads.
+    Returns the number of leads updated.
+    """
+    queryset = queryset.filter(organisation=organisation).order_by()
+    pk = getattr(value, "pk", value)
+    with atomic_write():
+        #what the counters lose is counted before the leads move, what they gain is the UPDATE's row count
+        deltas = counters.grouped_deltas(queryset, -1, names=[name])
+        updated = queryset.update(**{f"{name}_id": pk, "updated_at": timezone.now(), "version": F("version") + 1})
+        if pk is not None:
+            deltas[(name, pk)] += updated
+        counters.apply_deltas(deltas)
+        caching.bump(organisation.pk)
+    return updated
+
+
+def bulk_delete_leads(organisation, queryset):
+    """Delete every lead in queryset with one plain DELETE, scoped to the organisation.
+
+    QuerySet.delete() would load every lead to send its delete signals,
+    so the counters are adjusted here instead. The DELETE selects the ids
+    with queryset's own SQL and doesn't collect related rows, which is only
+    right while no other table points at leads, see
+    test_nothing_references_leads. Returns the number deleted.
+    """
+    queryset = queryset.filter(organisation=organisation).order_by()
+    table = connection.ops.quote_name(Lead._meta.db_table)
+    with atomic_write():
+        deltas = counters.grouped_deltas(queryset, -1)
+        ids, params = queryset.values("id").query.get_compiler(connection=connection).as_sql()
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {table} WHERE id IN ({ids})", params)
+            deleted = cursor.rowcount
+        counters.apply_deltas(deltas)
+        caching.bump(organisation.pk)
+    return deleted
@@ -0,0 +1,115 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F, Q
+from django.db.models.signals import post_save, post_delete, m2m_changed
+
+from .models import User, UserProfile, Lead, Agent, Category
+
+MISSING = object()
+
+
+def get_cache():
+    """The django cache backend configured as LEAD_CACHE_ALIAS."""
+    return caches[getattr(settings, "LEAD_CACHE_ALIAS", "default")]
+
+
+def cache_key(organisation, name):
+    """A key that belongs to the organisation's current generation.
+
+    The generation is read from the organisation instance, which the
+    tenant backend loads with the session user, so building a key costs
+    no queries. ReplicaMiddleware swaps in the replica's generation for
+    views that read from one.
+    """
+    return f"leads:{organisation.pk}:{organisation.cache_generation}:{name}"
+
+
+def read_generation(organisation_id, using=None):
+    """The organisation's generation as the database has it, None if the organisation isn't there."""
+    return UserProfile.objects.using(using).filter(pk=organisation_id).values_list("cache_generation", flat=True).first()
+
+
+def text_key(text):
+    """A short, backend safe stand-in for free text in a key."""
+    return hashlib.md5(text.encode()).hexdigest()
+
+
+def get_or_set(organisation, name, compute, timeout=None):
+    """The cached value for name, or compute() stored under the current generation."""
+    cache = get_cache()
+    key = cache_key(organisation, name)
+    value = cache.get(key, MISSING)
+    if value is MISSING:
+        value = compute()
+        cache.set(key, value, timeout or getattr(settings, "LEAD_CACHE_TIMEOUT", 300))
+    return value
+
+
+class FragmentStats:
+    """Hit and miss counts of the template fragment cache in this process."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else None
+
+
+fragment_stats = FragmentStats()
+
+
+def fragment_key(name, lead, vary=()):
+    """A fragment's key, which changes whenever the lead is saved or anything in vary changes.
+
+    Fragments don't need the organisation generation, so unrelated writes
+    leave them cached.
+    """
+    key = f"leads:fragment:{name}:{lead.pk}:{lead.updated_at.timestamp()}"
+    if vary:
+        key += ":" + text_key("\x1f".join(str(value) for value in vary))
+    return key
+
+
+def bump(organisation_id):
+    """Move the organisation on to a new generation, orphaning everything cached for it.
+
+    Nothing is deleted, the old entries are simply never asked for again
+    and expire or get evicted by the backend.
+    """
+    UserProfile.objects.filter(pk=organisation_id).update(cache_generation=F("cache_generation") + 1)
+
+
+def post_organisation_data_written_signal(sender, instance, **kwargs):
+    bump(instance.pk if sender is UserProfile else instance.organisation_id)
+
+
+def post_user_saved_signal(sender, instance, update_fields=None, **kwargs):
+    """Agent pages show their user's name and email, so a user's own and agent organisations move on too.
+
+    Logging in only saves last_login, which nothing cached shows.
+    """
+    if update_fields is not None and set(update_fields) <= {"last_login"}:
+        return
+    UserProfile.objects.filter(
+        Q(user=instance) | Q(pk__in=Agent.objects.filter(user=instance).values("organisation"))
+    ).update(cache_generation=F("cache_generation") + 1)
+
+
+def post_agent_categories_changed_signal(sender, instance, action, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump(instance.organisation_id)
+
+
+for model in (Lead, Agent, Category, UserProfile):
+    post_save.connect(post_organisation_data_written_signal, sender=model)
+    post_delete.connect(post_organisation_data_written_signal, sender=model)
+post_save.connect(post_user_saved_signal, sender=User)
+m2m_changed.connect(post_agent_categories_changed_signal, sender=Agent.categories.through)
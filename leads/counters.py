@@ -0,0 +1,91 @@
+from collections import Counter, defaultdict
+
+from django.apps import apps
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .sqlite import atomic_write
+
+# lead foreign key -> denormalised counter column on the model it points to
+COUNTERS = {
+    "agent": "open_lead_count",
+    "category": "lead_count",
+}
+
+
+def counted_keys(lead):
+    """The counted foreign key ids that are loaded on a lead instance."""
+    return {
+        name: lead.__dict__[f"{name}_id"]
+        for name in COUNTERS if f"{name}_id" in lead.__dict__
+    }
+
+
+def lead_deltas(leads, sign=1):
+    """Counter deltas for adding (sign=1) or removing (sign=-1) some leads.
+
+    `leads` can be Lead instances or dicts as returned by counted_keys().
+    """
+    deltas = Counter()
+    for lead in leads:
+        keys = lead if isinstance(lead, dict) else counted_keys(lead)
+        for name, pk in keys.items():
+            if pk is not None:
+                deltas[(name, pk)] += sign
+    return deltas
+
+
+def lead_changed(before, after):
+    """Move a lead's contribution from the `before` keys to the `after` keys."""
+    deltas = lead_deltas([before], -1)
+    deltas.update(lead_deltas([after], 1))
+    apply_deltas(deltas)
+
+
+def apply_deltas(deltas):
+    """Apply counter deltas with one F() UPDATE per (counter, delta) pair."""
+    grouped = defaultdict(list)
+    for (name, pk), delta in deltas.items():
+        if delta:
+            grouped[(name, delta)].append(pk)
+    Lead = apps.get_model("leads", "Lead")
+    now = timezone.now()
+    for (name, delta), pks in grouped.items():
+        column = COUNTERS[name]
+        model = Lead._meta.get_field(name).related_model
+        model.objects.filter(pk__in=pks).update(**{column: F(column) + delta, "updated_at": now})
+
+
+def grouped_deltas(queryset, sign=1, names=COUNTERS):
+    """Counter deltas for every lead in a queryset, computed in the database."""
+    deltas = Counter()
+    for name in names:
+        rows = queryset.filter(**{f"{name}__isnull": False}).order_by().values_list(name).annotate(count=Count("id"))
+        for pk, count in rows:
+            deltas[(name, pk)] += sign * count
+    return deltas
+
+
+def recount(dry_run=False):
+    """Rebuild every counter from the lead table.
+
+    Returns a list of (model, pk, stored, actual) tuples for the counters
+    that had drifted.
+    """
+    Lead = apps.get_model("leads", "Lead")
+    drift = []
+    with atomic_write():
+        actual = grouped_deltas(Lead.objects.all())
+        for name, column in COUNTERS.items():
+            model = Lead._meta.get_field(name).related_model
+            stale = []
+            for obj in model.objects.only("id", column).iterator():
+                stored = getattr(obj, column)
+                expected = actual[(name, obj.pk)]
+                if stored != expected:
+                    drift.append((model, obj.pk, stored, expected))
+                    setattr(obj, column, expected)
+                    stale.append(obj)
+            if not dry_run:
+                model.objects.bulk_update(stale, [column], batch_size=500)
+    return drift
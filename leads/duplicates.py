@@ -0,0 +1,123 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Subquery, Value
+from django.db.models.functions import Concat, Lower, Trim
+
+from .models import Lead
+from .sqlite import atomic_write
+
+# blocking key -> the expression leads are bucketed on, leads sharing a
+# non-empty value are duplicates of each other
+KEYS = {
+    "email": F("email_normalized"),
+    "phone": F("phone_e164"),
+    "name": Lower(Concat(Trim("first_name"), Value(" "), Trim("last_name"))),
+}
+DEFAULT_KEYS = ("email", "phone")
+
+# fields a merge copies from the losers when the survivor has no value
+MERGED_FIELDS = ("agent_id", "category_id", "first_name", "last_name", "phone_number", "email", "description")
+
+
+class MergeError(ValueError):
+    pass
+
+
+def bucket_rows(organisation, key, max_bucket_size):
+    """(value, lead id) for every lead sharing its key value with another lead.
+
+    The buckets are found with a GROUP BY over the (organisation, key)
+    index, so only the leads that actually have duplicates are read.
+    """
+    queryset = Lead.objects.filter(organisation=organisation).annotate(dedupe_key=KEYS[key]).exclude(dedupe_key="")
+    shared = (
+        queryset.order_by().values("dedupe_key").annotate(size=Count("id"))
+        .filter(size__gt=1, size__lte=max_bucket_size).values("dedupe_key")
+    )
+    return queryset.filter(dedupe_key__in=Subquery(shared)).order_by("dedupe_key", "id").values_list("dedupe_key", "id")
+
+
+def find_duplicates(organisation, keys=DEFAULT_KEYS, max_bucket_size=50):
+    """Groups of lead ids that look like the same person, each sorted oldest first.
+
+    Leads are linked when they share a value for any of `keys`, and linked
+    leads are joined into groups with union-find, so the work is linear in
+    the number of duplicated leads rather than quadratic in all of them.
+    Buckets bigger than max_bucket_size (a shared office switchboard, a
+    very common name) say little about identity and are skipped.
+    """
+    parent = {}
+
+    def find(pk):
+        root = pk
+        while parent.setdefault(root, root) != root:
+            root = parent[root]
+        while parent[pk] != root:
+            parent[pk], pk = root, parent[pk]
+        return root
+
+    for key in keys:
+        buckets = defaultdict(list)
+        for value, pk in bucket_rows(organisation, key, max_bucket_size).iterator():
+            buckets[value].append(pk)
+        for pks in buckets.values():
+            root = find(pks[0])
+            for pk in pks[1:]:
+                other = find(pk)
+                if other != root:
+                    parent[other] = root
+
+    groups = defaultdict(list)
+    for pk in parent:
+        groups[find(pk)].append(pk)
+    return sorted((sorted(group) for group in groups.values()), key=lambda group: group[0])
+
+
+def is_blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def merge_leads(survivor, losers):
+    """Fold the losers into the survivor and delete them, in one transaction.
+
+    Blank fields on the survivor, including its agent and category, are
+    filled in from the losers, newest first.
+    """
+    losers = sorted(losers, key=lambda lead: (lead.date_added, lead.pk), reverse=True)
+    with transaction.atomic():
+        for field in MERGED_FIELDS:
+            if is_blank(getattr(survivor, field)):
+                for lead in losers:
+                    if not is_blank(getattr(lead, field)):
+                        setattr(survivor, field, getattr(lead, field))
+                        break
+        survivor.save()
+        Lead.objects.filter(pk__in=[lead.pk for lead in losers]).delete()
+    return survivor
+
+
+def merge_group(organisation, ids, survivor_id=None):
+    """Merge the organisation's leads with these ids into one, the oldest unless survivor_id is given."""
+    ids = set(ids)
+    if survivor_id is not None:
+        ids.add(survivor_id)
+    if len(ids) < 2:
+        raise MergeError("Pick at least two leads to merge.")
+    #select_for_update() is a no-op on SQLite, which atomic_write() makes up for
+    with atomic_write():
+        leads = list(Lead.objects.select_for_update().filter(organisation=organisation, pk__in=ids).order_by("id"))
+        if len(leads) != len(ids):
+            raise MergeError("Some of these leads no longer exist.")
+        survivor = leads[0] if survivor_id is None else next(lead for lead in leads if lead.pk == survivor_id)
+        return merge_leads(survivor, [lead for lead in leads if lead is not survivor])
+
+
+def merge_all(organisation, keys=DEFAULT_KEYS, max_bucket_size=50):
+    """Merge every duplicate group into its oldest lead, returns (groups, leads removed)."""
+    groups = find_duplicates(organisation, keys=keys, max_bucket_size=max_bucket_size)
+    removed = 0
+    for group in groups:
+        merge_group(organisation, group)
+        removed += len(group) - 1
+    return len(groups), removed
@@ -0,0 +1,64 @@
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Lead
+
+FORMATS = ("csv", "ndjson")
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+# exported column -> lookup, the joins are resolved by the database
+COLUMNS = (
+    ("id", "id"),
+    ("first_name", "first_name"),
+    ("last_name", "last_name"),
+    ("age", "age"),
+    ("email", "email"),
+    ("phone_number", "phone_number"),
+    ("description", "description"),
+    ("agent_email", "agent__user__email"),
+    ("category", "category__name"),
+    ("date_added", "date_added"),
+)
+
+
+def export_rows(organisation, chunk_size=2000):
+    """Iterate over an organisation's leads as tuples without caching the queryset."""
+    return (
+        Lead.objects.filter(organisation=organisation)
+        .order_by("id")
+        .values_list(*[lookup for column, lookup in COLUMNS])
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+class Echo:
+    """A file-like object that hands back what is written, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow([column for column, lookup in COLUMNS])
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows):
+    columns = [column for column, lookup in COLUMNS]
+    encoder = DjangoJSONEncoder()
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + "\n"
+
+
+def export_lines(organisation, format, chunk_size=2000):
+    rows = export_rows(organisation, chunk_size=chunk_size)
+    if format == "csv":
+        return csv_lines(rows)
+    if format == "ndjson":
+        return ndjson_lines(rows)
+    raise ValueError(f"Unknown export format {format!r}, expected one of {', '.join(FORMATS)}")
@@ -1,12 +1,34 @@
 from django import forms
 from django.contrib.auth import get_user_model
-from django.contrib.auth.forms import UserCreationForm, UsernameField
-from .models import Lead, Agent
+from django.contrib.auth.forms import UserCreationForm, UsernameField, PasswordResetForm
+from django.template import loader
+from .models import Lead, Agent, Category, UserProfile
+from .mail import queue_mail
 
 
 User = get_user_model()
 
-class LeadModelForm(forms.ModelForm):
+class VersionedLeadForm(forms.ModelForm):
+    """Carries the version of the lead being edited in a hidden field.
+
+    Saving then only writes if nobody else has changed the lead since the
+    form was shown, otherwise it raises VersionConflict.
+    """
+    version = forms.IntegerField(required=False, min_value=1, widget=forms.HiddenInput)
+
+    def __init__(self, *args, **kwargs):
+        super(VersionedLeadForm, self).__init__(*args, **kwargs)
+        if self.instance.pk is not None:
+            self.fields["version"].initial = self.instance.version
+
+    def save(self, commit=True):
+        version = self.cleaned_data.get("version")
+        if self.instance.pk is not None and version is not None:
+            self.instance.expect_version(version)
+        return super(VersionedLeadForm, self).save(commit)
+
+
+class LeadModelForm(VersionedLeadForm):
     class Meta:
         model = Lead
         fields = (
@@ -19,6 +41,55 @@ class LeadModelForm(forms.ModelForm):
             'email'
         )
 
+    def __init__(self, *args, **kwargs):
+        request = kwargs.pop("request", None)
+        super(LeadModelForm, self).__init__(*args, **kwargs)
+        if request is not None:
+            agents = Agent.objects.filter(organisation=request.organisation).select_related("user")
+            self.fields["agent"].queryset = agents
+
+class LeadImportRowForm(forms.ModelForm):
+    """Validates one row of a lead import with the same rules as LeadModelForm.
+
+    Agent and category are given by name and resolved by the importer.
+    """
+    agent = forms.CharField(required=False)
+    category = forms.CharField(required=False)
+
+    class Meta:
+        model = Lead
+        fields = (
+            'first_name',
+            'last_name',
+            'age', 
+            'description',
+            'phone_number',
+            'email'
+        )
+
+
+class LeadApiRowForm(forms.ModelForm):
+    """Validates one lead of a bulk API request with the same rules as LeadModelForm.
+
+    Agent and category are given by id and checked by the writer.
+    """
+    agent = forms.IntegerField(required=False)
+    category = forms.IntegerField(required=False)
+
+    class Meta:
+        model = Lead
+        fields = LeadImportRowForm.Meta.fields
+
+
+class LeadImportForm(forms.Form):
+    FORMAT_CHOICES = (
+        ("csv", "CSV"),
+        ("ndjson", "NDJSON (one JSON object per line)"),
+    )
+    file = forms.FileField()
+    format = forms.ChoiceField(choices=FORMAT_CHOICES)
+
+
 class LeadForm(forms.Form):
     first_name = forms.CharField()
     last_name = forms.CharField()
@@ -37,18 +108,111 @@ class AssignAgentForm(forms.Form):
     
     def __init__(self, *args, **kwargs):
         request = kwargs.pop("request")
-        agents = Agent.objects.filter(organisation=request.user.userprofile)
+        agents = Agent.objects.filter(organisation=request.organisation).select_related("user")
         super(AssignAgentForm, self).__init__(*args, **kwargs)
         self.fields["agent"].queryset = agents
 
 
-class LeadCategoryUpdateForm(forms.ModelForm):
+class LeadCategoryUpdateForm(VersionedLeadForm):
     class Meta:
         model = Lead
         fields = (
            'category',
         )
 
+    def __init__(self, *args, **kwargs):
+        request = kwargs.pop("request", None)
+        super(LeadCategoryUpdateForm, self).__init__(*args, **kwargs)
+        if request is not None:
+            self.fields["category"].queryset = Category.objects.filter(organisation=request.organisation)
+
+
+class LeadMergeForm(forms.Form):
+    survivor = forms.ModelChoiceField(queryset=Lead.objects.none())
+    leads = forms.ModelMultipleChoiceField(queryset=Lead.objects.none())
+
+    def __init__(self, *args, **kwargs):
+        request = kwargs.pop("request")
+        super(LeadMergeForm, self).__init__(*args, **kwargs)
+        leads = Lead.objects.filter(organisation=request.organisation).only("id")
+        self.fields["survivor"].queryset = leads
+        self.fields["leads"].queryset = leads
+
 
+class LeadIdsField(forms.Field):
+    """A list of lead ids, cleaned to ints without looking the leads up."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(pk) for pk in value or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Invalid lead selection.")
+
+
+class LeadBulkActionForm(forms.Form):
+    ACTION_CHOICES = (
+        ("assign", "Assign to agent"),
+        ("categorise", "Move to category"),
+        ("delete", "Delete"),
+    )
+    SCOPE_CHOICES = (
+        ("selected", "Selected leads"),
+        ("unassigned", "Every unassigned lead"),
+        ("uncategorised", "Every uncategorised lead"),
+        ("all", "Every lead"),
+    )
+    action = forms.ChoiceField(choices=ACTION_CHOICES)
+    agent = forms.ModelChoiceField(queryset=Agent.objects.none(), required=False, empty_label="No agent")
+    category = forms.ModelChoiceField(queryset=Category.objects.none(), required=False, empty_label="No category")
+    scope = forms.ChoiceField(choices=SCOPE_CHOICES, initial="selected")
+    leads = LeadIdsField(required=False)
+
+    def __init__(self, *args, **kwargs):
+        self.request = kwargs.pop("request")
+        super(LeadBulkActionForm, self).__init__(*args, **kwargs)
+        organisation = self.request.organisation
+        self.fields["agent"].queryset = Agent.objects.filter(organisation=organisation).select_related("user")
+        self.fields["category"].queryset = Category.objects.filter(organisation=organisation)
+
+    def clean(self):
+        cleaned_data = super(LeadBulkActionForm, self).clean()
+        if cleaned_data.get("scope") == "selected" and not cleaned_data.get("leads"):
+            raise forms.ValidationError("Select some leads first.")
+        return cleaned_data
+
+    def get_queryset(self):
+        """The leads the action applies to, as a queryset that is never evaluated here."""
+        queryset = Lead.objects.filter(organisation=self.request.organisation)
+        scope = self.cleaned_data["scope"]
+        if scope == "selected":
+            return queryset.filter(pk__in=self.cleaned_data["leads"])
+        if scope == "unassigned":
+            return queryset.filter(agent__isnull=True)
+        if scope == "uncategorised":
+            return queryset.filter(category__isnull=True)
+        return queryset
+
+
+class LeadRoutingForm(forms.ModelForm):
+    class Meta:
+        model = UserProfile
+        fields = (
+            'routing_strategy',
+        )
+        labels = {
+            'routing_strategy': "Route new leads without an agent with",
+        }
 
 
+class OutboxPasswordResetForm(PasswordResetForm):
+    """Password reset form that queues the email in the outbox instead of sending it inline."""
+    def send_mail(self, subject_template_name, email_template_name,
+                  context, from_email, to_email, html_email_template_name=None):
+        subject = loader.render_to_string(subject_template_name, context)
+        subject = ''.join(subject.splitlines())
+        body = loader.render_to_string(email_template_name, context)
+        html_body = None
+        if html_email_template_name is not None:
+            html_body = loader.render_to_string(html_email_template_name, context)
+        queue_mail(subject, body, from_email, [to_email], html_message=html_body)
@@ -0,0 +1,209 @@
+from itertools import combinations
+
+from django.db import connection as default_connection
+
+from . import caching, search
+from .models import Lead
+
+TRIGRAM_TABLE = "leads_lead_trigram"
+VOCAB_TABLE = "leads_lead_trigram_vocab"
+COLUMNS = ("first_name", "last_name", "email")
+
+# Every row also holds its organisation as a single trigram made of three
+# characters from Unicode's private use area, which no name or email is
+# typed with. Searches AND it with the query's trigrams, so FTS5 only
+# ranks the organisation's rows instead of every tenant's.
+TENANT_BASE = 0xE000
+TENANT_DIGITS = 6400
+
+
+def tenant_sql(column):
+    """SQL computing the tenant trigram of an organisation id column, see tenant_token()."""
+    return "char({0}, {1}, {2})".format(*[
+        f"{TENANT_BASE} + {column} / {TENANT_DIGITS ** power} % {TENANT_DIGITS}" if power else
+        f"{TENANT_BASE} + {column} % {TENANT_DIGITS}"
+        for power in (2, 1, 0)
+    ])
+
+
+def tenant_token(organisation_id):
+    return "".join(
+        chr(TENANT_BASE + organisation_id // TENANT_DIGITS ** power % TENANT_DIGITS) for power in (2, 1, 0)
+    )
+
+
+# A contentless FTS5 table with the trigram tokenizer is the trigram index:
+# its doclists map every trigram to the leads containing it, and the
+# triggers keep it in step with leads_lead on every write path. Contentless
+# because the tenant column isn't a column of leads_lead, the 'delete'
+# command still works given the old values.
+NEW_VALUES = ", ".join([f"new.{column}" for column in COLUMNS] + [tenant_sql("new.organisation_id")])
+OLD_VALUES = ", ".join([f"old.{column}" for column in COLUMNS] + [tenant_sql("old.organisation_id")])
+SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TRIGRAM_TABLE} USING fts5(
+        {", ".join(COLUMNS)}, tenant, content='', tokenize='trigram', detail='none'
+    )""",
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {VOCAB_TABLE} USING fts5vocab({TRIGRAM_TABLE}, 'row')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_insert AFTER INSERT ON leads_lead BEGIN
+        INSERT INTO {TRIGRAM_TABLE}(rowid, {", ".join(COLUMNS)}, tenant) VALUES (new.id, {NEW_VALUES});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_delete AFTER DELETE ON leads_lead BEGIN
+        INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}, rowid, {", ".join(COLUMNS)}, tenant)
+        VALUES ('delete', old.id, {OLD_VALUES});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TRIGRAM_TABLE}_update
+    AFTER UPDATE OF {", ".join(COLUMNS)}, organisation_id ON leads_lead BEGIN
+        INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}, rowid, {", ".join(COLUMNS)}, tenant)
+        VALUES ('delete', old.id, {OLD_VALUES});
+        INSERT INTO {TRIGRAM_TABLE}(rowid, {", ".join(COLUMNS)}, tenant) VALUES (new.id, {NEW_VALUES});
+    END""",
+]
+REBUILD = [
+    f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('delete-all')",
+    f"""INSERT INTO {TRIGRAM_TABLE}(rowid, {", ".join(COLUMNS)}, tenant)
+        SELECT id, {", ".join(COLUMNS)}, {tenant_sql("organisation_id")} FROM leads_lead""",
+    f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('optimize')",
+]
+
+# how many of the query's rarest trigrams are looked up, how many of them a
+# candidate has to share, and how many candidates are reranked
+MAX_TERMS = 4
+MIN_SHARED = 2
+MAX_CANDIDATES = 200
+# trigram frequencies only order the terms, an hour old they still do
+TERM_COUNTS_TIMEOUT = 60 * 60
+
+
+def install(connection=default_connection):
+    if not search.is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+
+def rebuild(connection=default_connection):
+    install(connection)
+    with connection.cursor() as cursor:
+        for statement in REBUILD:
+            cursor.execute(statement)
+
+
+def trigrams(text):
+    """The set of trigrams the tokenizer indexes for text."""
+    text = (text or "").lower()
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def similarity(query_trigrams, text):
+    """Jaccard similarity of two trigram sets, like pg_trgm's similarity()."""
+    other = trigrams(text)
+    if not query_trigrams or not other:
+        return 0.0
+    shared = len(query_trigrams & other)
+    return shared / (len(query_trigrams) + len(other) - shared)
+
+
+def score(query_trigrams, first_name, last_name, email):
+    texts = [f"{first_name} {last_name}", first_name, last_name, email.split("@")[0]]
+    #only a query with a domain in it can look more like the whole address than its local part
+    if any("@" in trigram for trigram in query_trigrams):
+        texts.append(email)
+    return max(similarity(query_trigrams, text) for text in texts)
+
+
+def term_counts(terms):
+    """How many leads of any organisation contain each of terms that occurs in the index.
+
+    fts5vocab counts a term by reading its whole doclist, tens of
+    milliseconds for a common trigram of a million leads, so the counts are
+    cached.
+    """
+    cache = caching.get_cache()
+    keys = {term: f"leads:trigram:{caching.text_key(term)}" for term in terms}
+    cached = cache.get_many(keys.values())
+    counts = {term: cached[key] for term, key in keys.items() if key in cached}
+    missing = [term for term in terms if term not in counts]
+    if missing:
+        placeholders = ", ".join(["%s"] * len(missing))
+        with default_connection.cursor() as cursor:
+            cursor.execute(f"SELECT term, doc FROM {VOCAB_TABLE} WHERE term IN ({placeholders})", missing)
+            found = dict(cursor.fetchall())
+        cache.set_many({keys[term]: count for term, count in found.items()}, TERM_COUNTS_TIMEOUT)
+        counts.update(found)
+    return counts
+
+
+def rarest_terms(terms):
+    """The query's trigrams that occur in the index, least common first."""
+    counts = term_counts(terms)
+    return sorted((term for term in terms if counts.get(term)), key=lambda term: (counts[term], term))[:MAX_TERMS]
+
+
+def quote(term):
+    return '"{}"'.format(term.replace('"', '""'))
+
+
+def match_expression(organisation, terms, shared):
+    """The organisation's tenant trigram AND at least shared of terms."""
+    groups = [" AND ".join(quote(term) for term in group) for group in combinations(terms, shared)]
+    return f"{quote(tenant_token(organisation.pk))} AND (({') OR ('.join(groups)}))"
+
+
+def candidate_rows(organisation, terms, agent=None, enough=MAX_CANDIDATES):
+    """Up to MAX_CANDIDATES leads sharing the most of terms, newest first within each tier.
+
+    Leads with every term are looked for first, then with one fewer, down
+    to MIN_SHARED or until there are enough candidates. Each tier is read in
+    rowid order and stops at the limit, so FTS5 never has to rank every lead
+    with a common trigram; the candidates are reranked by similarity
+    afterwards.
+    """
+    sql = f"""
+        SELECT lead.id, lead.first_name, lead.last_name, lead.email FROM {TRIGRAM_TABLE}
+        JOIN leads_lead lead ON lead.id = {TRIGRAM_TABLE}.rowid
+        WHERE {TRIGRAM_TABLE} MATCH %s AND lead.organisation_id = %s
+    """
+    params = [organisation.pk]
+    if agent is not None:
+        sql += " AND lead.agent_id = %s"
+        params.append(agent.pk)
+    sql += f" ORDER BY {TRIGRAM_TABLE}.rowid DESC LIMIT {MAX_CANDIDATES}"
+
+    rows = {}
+    with default_connection.cursor() as cursor:
+        for shared in range(len(terms), min(MIN_SHARED, len(terms)) - 1, -1):
+            cursor.execute(sql, [match_expression(organisation, terms, shared)] + params)
+            for row in cursor.fetchall():
+                if len(rows) == MAX_CANDIDATES:
+                    break
+                rows.setdefault(row[0], row)
+            if len(rows) >= enough:
+                break
+    return list(rows.values())
+
+
+def fuzzy_search_lead_ids(organisation, text, agent=None, limit=25, threshold=0.2):
+    """Ids of the organisation's leads whose name or email look like text, most similar first."""
+    text = text.strip()
+    if len(text) < 3:
+        return []
+
+    def compute():
+        if not search.is_supported():
+            return search.search_lead_ids(organisation, text, agent=agent, limit=limit)
+        query_trigrams = trigrams(text)
+        terms = rarest_terms(query_trigrams)
+        rows = candidate_rows(organisation, terms, agent=agent, enough=limit) if terms else []
+        scored = [(score(query_trigrams, *row[1:]), row[0]) for row in rows]
+        scored = sorted((item for item in scored if item[0] >= threshold), key=lambda item: (-item[0], item[1]))
+        return [pk for similarity, pk in scored[:limit]]
+
+    name = f"fuzzy:{agent.pk if agent else ''}:{limit}:{threshold}:{caching.text_key(text.lower())}"
+    return caching.get_or_set(organisation, name, compute)
+
+
+def fuzzy_search_leads(organisation, text, agent=None, limit=25):
+    ids = fuzzy_search_lead_ids(organisation, text, agent=agent, limit=limit)
+    leads = Lead.objects.select_related("category").in_bulk(ids)
+    return [leads[pk] for pk in ids if pk in leads]
@@ -0,0 +1,122 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+
+from . import caching
+from .models import IdempotencyKey
+from .sqlite import atomic_write
+
+HEADER = "Idempotency-Key"
+#the same key as a form field, for HTML forms that can't set headers
+FIELD = "idempotency_key"
+MAX_LENGTH = 255
+
+
+class KeyReused(Exception):
+    """The key was already used for a different request."""
+
+
+class KeyInProgress(Exception):
+    """Another request with the key is still running, or its response has just expired."""
+
+
+def get_ttl():
+    """How long a key is remembered, LEAD_IDEMPOTENCY_KEY_TTL seconds (a day by default)."""
+    return timedelta(seconds=getattr(settings, "LEAD_IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+
+
+def get_key(request):
+    key = request.headers.get(HEADER) or request.POST.get(FIELD) or ""
+    return key.strip()[:MAX_LENGTH]
+
+
+def fingerprint(request):
+    """A hash of what the request asks for, leaving out the CSRF token that changes between page loads."""
+    if request.content_type in ("application/x-www-form-urlencoded", "multipart/form-data"):
+        data = request.POST.copy()
+        data.pop("csrfmiddlewaretoken", None)
+        data.pop(FIELD, None)
+        body = data.urlencode()
+    else:
+        body = request.body.decode("utf-8", "replace")
+    return caching.text_key(f"{request.method}:{request.path}:{body}")
+
+
+def is_final(response):
+    """Whether a response is the outcome of the request, worth replaying.
+
+    Redirects and JSON are. A form shown again with its errors isn't, the
+    client should be free to fix it and send it with the same key.
+    """
+    if response.streaming or response.status_code >= 500:
+        return False
+    return response.status_code < 400 and (
+        response.status_code >= 300 or response["Content-Type"].startswith("application/json")
+    )
+
+
+def replay(record):
+    response = HttpResponse(record.body, status=record.status_code, content_type=record.content_type)
+    if record.location:
+        response["Location"] = record.location
+    response["Idempotent-Replayed"] = "true"
+    return response
+
+
+def lookup(organisation, key, request_fingerprint):
+    """The stored response for key, None if there isn't one or it has expired."""
+    record = IdempotencyKey.objects.filter(organisation=organisation, key=key).first()
+    if record is None:
+        return None
+    if record.created_at < timezone.now() - get_ttl():
+        record.delete()
+        return None
+    if record.fingerprint != request_fingerprint:
+        raise KeyReused(key)
+    return record
+
+
+def run_once(request, key, handle):
+    """Return handle()'s response, or the response it gave the first time this key was sent.
+
+    handle() and the stored response commit together, so a request that
+    fails part way leaves nothing behind and can be retried with the same
+    key. Of two concurrent requests with the same key, the one that stores
+    its response second is rolled back and replays the first one's, or
+    raises KeyInProgress if that response can't be read yet.
+    """
+    organisation = request.organisation
+    request_fingerprint = fingerprint(request)
+    record = lookup(organisation, key, request_fingerprint)
+    if record is not None:
+        return replay(record)
+    with atomic_write():
+        response = handle()
+        if not is_final(response):
+            return response
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    organisation=organisation, key=key, fingerprint=request_fingerprint,
+                    status_code=response.status_code, content_type=response["Content-Type"],
+                    location=response.get("Location", ""), body=response.content.decode("utf-8"),
+                )
+        except IntegrityError:
+            transaction.set_rollback(True)
+        else:
+            return response
+    #lost the race to another request with the same key, undo this one and answer like it did
+    record = lookup(organisation, key, request_fingerprint)
+    if record is None:
+        raise KeyInProgress(key)
+    return replay(record)
+
+
+def prune(ttl=None):
+    """Delete the keys older than ttl, returns how many were deleted."""
+    cutoff = timezone.now() - (get_ttl() if ttl is None else ttl)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
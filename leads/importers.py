@@ -0,0 +1,148 @@
+import csv
+import io
+import json
+
+from . import routing
+from .bulk import bulk_create_leads
+from .forms import LeadImportRowForm
+from .models import Agent, Category
+from .sqlite import atomic_write
+
+FORMATS = ("csv", "ndjson")
+
+
+def read_rows(stream, format):
+    """Yield (row_number, row) pairs from a csv or ndjson text stream, one at a time."""
+    if format == "csv":
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif format == "ndjson":
+        for number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield number, row
+    else:
+        raise ValueError(f"Unknown import format {format!r}, expected one of {', '.join(FORMATS)}")
+
+
+def text_stream(file, encoding="utf-8"):
+    """Wrap an uploaded (binary) file so it can be read line by line as text."""
+    if isinstance(file, io.TextIOBase):
+        return file
+    return io.TextIOWrapper(file, encoding=encoding, newline="")
+
+
+class ImportResult:
+    """Counts of an import, with the errors of only the first max_errors failed rows kept."""
+
+    def __init__(self, max_errors=100):
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.max_errors = max_errors
+
+    def add_error(self, number, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append((number, errors))
+
+    @property
+    def errors_omitted(self):
+        return self.failed - len(self.errors)
+
+
+class LeadImporter:
+    """Validate rows one by one and write them with bulk_create in batches.
+
+    Every batch is written in its own transaction, so a bad row only skips
+    that row and a crash part way through keeps the batches already written.
+    Rows without an agent are routed if the organisation routes leads.
+    """
+    def __init__(self, organisation, batch_size=1000, max_errors=100):
+        self.organisation = organisation
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.agents = self.build_agent_lookup()
+        self.categories = self.build_category_lookup()
+        self.router = routing.get_strategy(organisation) if organisation.routing_strategy else None
+
+    def build_agent_lookup(self):
+        lookup = {}
+        agents = Agent.objects.filter(organisation=self.organisation).values_list(
+            "id", "user__username", "user__email"
+        )
+        for pk, username, email in agents:
+            lookup[username.lower()] = pk
+            if email:
+                lookup[email.lower()] = pk
+        return lookup
+
+    def build_category_lookup(self):
+        categories = Category.objects.filter(organisation=self.organisation).values_list("id", "name")
+        return {name.lower(): pk for pk, name in categories}
+
+    def run(self, rows):
+        result = ImportResult(self.max_errors)
+        batch = []
+        number = 0
+        try:
+            for number, row in rows:
+                lead = self.build_lead(number, row, result)
+                if lead is None:
+                    continue
+                batch.append(lead)
+                if len(batch) >= self.batch_size:
+                    self.write(batch, result)
+                    batch = []
+        except UnicodeDecodeError as error:
+            #the rows read before the bad bytes are still imported, the rest of the file is skipped
+            result.add_error(number + 1, {"__all__": [
+                f"The file isn't {error.encoding} text ({error.reason}), nothing after row {number} was imported. "
+                f"Save it as {error.encoding.upper()} and import the remaining rows again."
+            ]})
+        if batch:
+            self.write(batch, result)
+        return result
+
+    def build_lead(self, number, row, result):
+        if not isinstance(row, dict):
+            result.add_error(number, {"__all__": ["Row is not a valid JSON object."]})
+            return None
+        form = LeadImportRowForm(data=row)
+        errors = {}
+        agent_id = category_id = None
+        if form.is_valid():
+            agent_id, errors["agent"] = self.resolve(self.agents, form.cleaned_data["agent"], "agent")
+            category_id, errors["category"] = self.resolve(self.categories, form.cleaned_data["category"], "category")
+        else:
+            errors.update({field: list(messages) for field, messages in form.errors.items()})
+        errors = {field: messages for field, messages in errors.items() if messages}
+        if errors:
+            result.add_error(number, errors)
+            return None
+        lead = form.save(commit=False)
+        lead.organisation = self.organisation
+        #rows left without an agent are routed when their batch is written
+        lead.agent_id = agent_id
+        lead.category_id = category_id
+        return lead
+
+    def resolve(self, lookup, name, label):
+        if not name:
+            return None, []
+        pk = lookup.get(name.strip().lower())
+        if pk is None:
+            return None, [f"No {label} called {name!r} in this organisation."]
+        return pk, []
+
+    def write(self, batch, result):
+        with atomic_write():
+            if self.router is not None:
+                routing.route_new_leads(self.router, batch)
+            bulk_create_leads(batch)
+        result.created += len(batch)
@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+
+def get_outbox_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def queue_mail(subject, message, from_email, recipient_list, html_message=None):
+    """Drop-in replacement for django's send_mail that writes to the outbox.
+
+    The email is only an INSERT, so it commits or rolls back with whatever
+    transaction the caller is in and the request never waits on SMTP.
+    """
+    return OutgoingEmail.objects.create(
+        subject=subject,
+        message=message,
+        html_message=html_message or "",
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        recipient_list=list(recipient_list),
+    )
+
+
+def claim_batch(batch_size):
+    """Lease up to batch_size due emails to this worker.
+
+    Claimed emails have their next attempt pushed past the lease, so a
+    worker that dies mid-batch only delays them rather than losing them.
+    """
+    now = timezone.now()
+    lease_until = now + timedelta(seconds=get_outbox_setting("OUTBOX_LEASE_SECONDS", 300))
+    due = OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+    ids = list(due.order_by("next_attempt_at", "id").values_list("id", flat=True)[:batch_size])
+    if not ids:
+        return []
+    due.filter(id__in=ids).update(next_attempt_at=lease_until)
+    #another worker may have leased some of them first, keep only ours
+    return list(OutgoingEmail.objects.filter(id__in=ids, next_attempt_at=lease_until).order_by("id"))
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(
+        subject=email.subject,
+        body=email.message,
+        from_email=email.from_email,
+        to=email.recipient_list,
+        connection=connection,
+    )
+    if email.html_message:
+        message.attach_alternative(email.html_message, "text/html")
+    return message
+
+
+def record_failure(email, error):
+    email.attempts += 1
+    email.last_error = repr(error)
+    if email.attempts >= get_outbox_setting("OUTBOX_MAX_ATTEMPTS", 5):
+        email.status = OutgoingEmail.FAILED
+    else:
+        delay = get_outbox_setting("OUTBOX_RETRY_BACKOFF_SECONDS", 60) * 2 ** (email.attempts - 1)
+        email.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+    email.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+
+
+def record_success(email):
+    email.attempts += 1
+    email.status = OutgoingEmail.SENT
+    email.sent_at = timezone.now()
+    email.save(update_fields=["attempts", "status", "sent_at"])
+
+
+def process_outbox(batch_size=100, connection=None):
+    """Send one batch of due emails over a single connection.
+
+    Returns a (sent, failed) tuple. Failed emails are retried with
+    exponential backoff until OUTBOX_MAX_ATTEMPTS is reached.
+    """
+    emails = claim_batch(batch_size)
+    if not emails:
+        return 0, 0
+
+    connection = connection or get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            record_failure(email, error)
+        return 0, len(emails)
+
+    sent = failed = 0
+    try:
+        for email in emails:
+            try:
+                connection.send_messages([build_message(email, connection)])
+            except Exception as error:
+                record_failure(email, error)
+                failed += 1
+            else:
+                record_success(email)
+                sent += 1
+    finally:
+        connection.close()
+    return sent, failed
@@ -0,0 +1,88 @@
+import json
+import platform
+import sqlite3
+import tempfile
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from leads.benchmark import ConcurrencyBenchmark
+from leads.sqlite import DEFAULT_PRAGMAS, DEFAULT_JOURNAL_MODE, get_pragmas, get_journal_mode, get_transaction_mode
+
+from .bench_views import git_revision
+
+COLUMNS = ("profile", "processes", "reads_per_s", "writes_per_s", "read_p95_ms", "write_p95_ms", "errors")
+
+
+class Command(BaseCommand):
+    help = (
+        "Run reads and writes from several processes against a seeded SQLite file, "
+        "once with SQLite's defaults and once with SQLITE_PRAGMAS, SQLITE_JOURNAL_MODE and "
+        "SQLITE_TRANSACTION_MODE, "
+        "and report throughput, p95 latency and lock errors for each."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--processes", default="1,4,8", help="Comma separated worker process counts.")
+        parser.add_argument("--seconds", type=float, default=5, help="How long each run lasts.")
+        parser.add_argument("--write-ratio", type=float, default=0.2, help="Share of requests that write.")
+        parser.add_argument("--leads", type=int, default=10000, help="Leads to seed.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            self.stderr.write("bench_concurrency only measures SQLite.")
+            return
+        benchmark = ConcurrencyBenchmark(
+            processes=[int(count) for count in options["processes"].split(",")],
+            seconds=options["seconds"], write_ratio=options["write_ratio"],
+            leads=options["leads"], seed=options["seed"],
+            log=self.stderr.write if options["verbosity"] > 1 else None,
+        )
+        profiles = {
+            "default": {
+                "SQLITE_PRAGMAS": DEFAULT_PRAGMAS, "SQLITE_JOURNAL_MODE": DEFAULT_JOURNAL_MODE,
+                "SQLITE_TRANSACTION_MODE": "DEFERRED",
+            },
+            "tuned": {
+                "SQLITE_PRAGMAS": {**DEFAULT_PRAGMAS, **get_pragmas()},
+                "SQLITE_JOURNAL_MODE": get_journal_mode(),
+                "SQLITE_TRANSACTION_MODE": get_transaction_mode(),
+            },
+        }
+
+        old_name = connection.settings_dict["NAME"]
+        setup_test_environment()
+        try:
+            with tempfile.TemporaryDirectory() as directory:
+                results = benchmark.run(directory, profiles)
+        finally:
+            connection.close()
+            connection.settings_dict["NAME"] = old_name
+            teardown_test_environment()
+
+        report = {
+            "revision": git_revision(),
+            "created": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "seconds": options["seconds"],
+            "write_ratio": options["write_ratio"],
+            "profiles": profiles,
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2)
+
+        self.stdout.write("  ".join(f"{column:>13}" for column in COLUMNS))
+        for row in results:
+            self.stdout.write("  ".join(f"{str(row[column]):>13}" for column in COLUMNS))
+        for row in results:
+            for message, count in row["error_messages"].items():
+                self.stdout.write(f"{row['profile']} x{row['processes']}: {count} x {message}")
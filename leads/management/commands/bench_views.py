@@ -0,0 +1,107 @@
+import json
+import platform
+import sqlite3
+import subprocess
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from leads.benchmark import ViewBenchmark
+
+COLUMNS = ("view", "size", "p50_ms", "p95_ms", "p99_ms", "queries", "peak_memory_kib", "fragment_hit_rate")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark the leads and agents views against freshly seeded test databases "
+        "and report latency percentiles, queries per request and peak memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes", default="1000,10000",
+            help="Comma separated lead counts to seed, each gets its own database."
+        )
+        parser.add_argument("--requests", type=int, default=50, help="Timed requests per view.")
+        parser.add_argument("--warmup", type=int, default=5)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--views", help="Comma separated subset of views to run.")
+        parser.add_argument("--output", help="Write the results as JSON to this file.")
+        parser.add_argument("--compare", help="A previous --output file to diff the results against.")
+        parser.add_argument(
+            "--max-p95", type=float,
+            help="Fail when a view's p95 latency in milliseconds is above this, e.g. "
+                 "--sizes 1000000 --views lead_search_fuzzy --max-p95 100 for search on a large tenant."
+        )
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",")]
+        only = options["views"].split(",") if options["views"] else None
+        benchmark = ViewBenchmark(
+            requests=options["requests"], warmup=options["warmup"], seed=options["seed"],
+            log=self.stderr.write if options["verbosity"] > 1 else None,
+        )
+
+        results = []
+        setup_test_environment()
+        try:
+            for size in sizes:
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                try:
+                    results += benchmark.run(size, only=only)
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+        finally:
+            teardown_test_environment()
+
+        report = {
+            "revision": git_revision(),
+            "created": timezone.now().isoformat(),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "requests": options["requests"],
+            "seed": options["seed"],
+            "results": results,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as output:
+                json.dump(report, output, indent=2)
+
+        previous = {}
+        if options["compare"]:
+            with open(options["compare"]) as compare:
+                previous = {(row["view"], row["size"]): row for row in json.load(compare)["results"]}
+        self.print_table(results, previous)
+
+        if options["max_p95"] is not None:
+            slow = [f"{row['view']} at {row['size']} leads ({row['p95_ms']}ms)" for row in results if row["p95_ms"] > options["max_p95"]]
+            if slow:
+                raise CommandError(f"p95 above {options['max_p95']}ms: {', '.join(slow)}")
+
+    def print_table(self, results, previous):
+        self.stdout.write("  ".join(f"{column:>16}" for column in COLUMNS))
+        for row in results:
+            cells = []
+            before = previous.get((row["view"], row["size"]))
+            for column in COLUMNS:
+                cell = str(row[column])
+                if before and column not in ("view", "size") and before.get(column) and row[column] is not None:
+                    change = (row[column] - before[column]) / before[column] * 100
+                    cell = f"{cell} ({change:+.0f}%)"
+                cells.append(f"{cell:>16}")
+            self.stdout.write("  ".join(cells))
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.exporters import FORMATS, export_lines
+from leads.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Stream all of an organisation's leads out as CSV or NDJSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--organisation", required=True,
+            help="Username of the organisor that owns the leads."
+        )
+        parser.add_argument("--format", choices=FORMATS, default="csv")
+        parser.add_argument("--output", help="File to write to, defaults to stdout.")
+        parser.add_argument("--chunk-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            organisation = UserProfile.objects.get(user__username=options["organisation"])
+        except UserProfile.DoesNotExist:
+            raise CommandError(f"No organisation for user {options['organisation']!r}")
+
+        lines = export_lines(organisation, options["format"], chunk_size=options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8", newline="") as output:
+                output.writelines(lines)
+        else:
+            self.stdout.ending = ""
+            for line in lines:
+                self.stdout.write(line)
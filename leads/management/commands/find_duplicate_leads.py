@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads import duplicates
+from leads.models import Lead, UserProfile
+
+
+class Command(BaseCommand):
+    help = "List, and optionally merge, an organisation's leads that look like the same person."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--organisation", required=True,
+            help="Username of the organisor that owns the leads."
+        )
+        parser.add_argument(
+            "--by", nargs="+", choices=sorted(duplicates.KEYS), default=list(duplicates.DEFAULT_KEYS),
+            help="What leads are matched on."
+        )
+        parser.add_argument("--max-bucket-size", type=int, default=50)
+        parser.add_argument(
+            "--merge", action="store_true",
+            help="Merge every group into its oldest lead instead of only listing them."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            organisation = UserProfile.objects.get(user__username=options["organisation"])
+        except UserProfile.DoesNotExist:
+            raise CommandError(f"No organisation for user {options['organisation']!r}")
+
+        if options["merge"]:
+            groups, removed = duplicates.merge_all(
+                organisation, keys=options["by"], max_bucket_size=options["max_bucket_size"]
+            )
+            self.stdout.write(self.style.SUCCESS(f"Merged {groups} group(s), removed {removed} lead(s)."))
+            return
+
+        groups = duplicates.find_duplicates(
+            organisation, keys=options["by"], max_bucket_size=options["max_bucket_size"]
+        )
+        leads = Lead.objects.only("first_name", "last_name", "email", "phone_number").in_bulk(
+            [pk for group in groups for pk in group]
+        )
+        for group in groups:
+            self.stdout.write(", ".join(
+                f"#{pk} {leads[pk]} <{leads[pk].email}> {leads[pk].phone_number}" for pk in group
+            ))
+        self.stdout.write(self.style.SUCCESS(f"Found {len(groups)} group(s) of duplicate leads."))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads.importers import FORMATS, LeadImporter, read_rows
+from leads.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Import leads for an organisation from a CSV or NDJSON file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument(
+            "--organisation", required=True,
+            help="Username of the organisor that owns the imported leads."
+        )
+        parser.add_argument("--format", choices=FORMATS, help="Defaults to the file extension.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            organisation = UserProfile.objects.get(user__username=options["organisation"])
+        except UserProfile.DoesNotExist:
+            raise CommandError(f"No organisation for user {options['organisation']!r}")
+
+        path = options["path"]
+        format = options["format"] or path.rsplit(".", 1)[-1].lower()
+        if format not in FORMATS:
+            raise CommandError(f"Can't tell the format of {path}, pass --format")
+
+        importer = LeadImporter(organisation, batch_size=options["batch_size"])
+        with open(path, encoding="utf-8", newline="") as stream:
+            result = importer.run(read_rows(stream, format))
+
+        for number, errors in result.errors:
+            for field, messages in errors.items():
+                self.stderr.write(f"Row {number}: {field}: {' '.join(messages)}")
+        if result.errors_omitted:
+            self.stderr.write(f"...and {result.errors_omitted} more row(s) with errors.")
+        self.stdout.write(self.style.SUCCESS(f"Imported {result.created} lead(s), {result.failed} row(s) failed."))
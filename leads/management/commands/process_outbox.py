@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from leads.mail import process_outbox
+
+
+class Command(BaseCommand):
+    help = "Send queued emails from the outbox in batches over a single connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=100)
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep polling the outbox instead of exiting once it is empty."
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5,
+            help="Seconds to sleep between polls when --loop is given."
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = process_outbox(batch_size=options["batch_size"])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                continue
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Sent {total_sent} email(s), {total_failed} failed."))
@@ -0,0 +1,20 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from leads import idempotency
+
+
+class Command(BaseCommand):
+    help = "Delete idempotency keys older than LEAD_IDEMPOTENCY_KEY_TTL."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ttl", type=int, default=None,
+            help="Seconds to keep keys for instead of LEAD_IDEMPOTENCY_KEY_TTL."
+        )
+
+    def handle(self, *args, **options):
+        ttl = timedelta(seconds=options["ttl"]) if options["ttl"] is not None else None
+        deleted = idempotency.prune(ttl)
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} expired idempotency key(s)."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads import search, fuzzy
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text and trigram lead search indexes from the lead table."
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            raise CommandError("The lead search index needs SQLite with FTS5.")
+        search.rebuild()
+        fuzzy.rebuild()
+        self.stdout.write(self.style.SUCCESS("Rebuilt the lead search indexes."))
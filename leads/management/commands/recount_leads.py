@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from leads import counters
+
+
+class Command(BaseCommand):
+    help = "Rebuild the denormalised lead counters on Category and Agent and report any drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run", action="store_true",
+            help="Only report drifted counters, don't fix them."
+        )
+
+    def handle(self, *args, **options):
+        drift = counters.recount(dry_run=options["dry_run"])
+        for model, pk, stored, actual in drift:
+            self.stdout.write(f"{model.__name__} {pk}: stored {stored}, actual {actual}")
+        verb = "Found" if options["dry_run"] else "Fixed"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {len(drift)} drifted counter(s)."))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from leads import routing
+from leads.models import UserProfile
+
+
+class Command(BaseCommand):
+    help = "Assign all of an organisation's unassigned leads to its agents."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--organisation", required=True,
+            help="Username of the organisor that owns the leads."
+        )
+        parser.add_argument(
+            "--strategy", choices=sorted(routing.STRATEGIES),
+            help="Defaults to the organisation's routing strategy."
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            organisation = UserProfile.objects.get(user__username=options["organisation"])
+        except UserProfile.DoesNotExist:
+            raise CommandError(f"No organisation for user {options['organisation']!r}")
+        if not (options["strategy"] or organisation.routing_strategy):
+            raise CommandError("The organisation routes leads manually, pass --strategy.")
+
+        routed = routing.route_unassigned(organisation, options["strategy"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Routed {routed} lead(s)."))
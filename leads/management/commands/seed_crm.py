@@ -0,0 +1,60 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from leads.models import User
+from leads.seeding import Seeder, DEFAULT_END_DATE
+
+
+class Command(BaseCommand):
+    help = "Generate a deterministic, production sized dataset of organisations, agents, categories and leads."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--organisations", type=int, default=1)
+        parser.add_argument("--agents", type=int, default=10, help="Agents per organisation.")
+        parser.add_argument("--categories", type=int, default=4, help="Categories per organisation.")
+        parser.add_argument("--leads", type=int, default=10000, help="Leads per organisation.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--prefix", default="seed",
+            help="Username prefix, use a different one to seed the same database twice."
+        )
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--skew", type=float, default=1.1,
+            help="Zipf exponent for spreading leads over agents and categories, 0 is uniform."
+        )
+        parser.add_argument("--unassigned-ratio", type=float, default=0.1)
+        parser.add_argument("--uncategorised-ratio", type=float, default=0.2)
+        parser.add_argument("--mean-age-days", type=float, default=90)
+        parser.add_argument(
+            "--end-date", default=DEFAULT_END_DATE.date().isoformat(),
+            help="Newest date_added (YYYY-MM-DD), fixed so that runs are reproducible."
+        )
+
+    def handle(self, *args, **options):
+        if User.objects.filter(username__startswith=f"{options['prefix']}-org").exists():
+            raise CommandError(f"Users with the prefix {options['prefix']!r} already exist, pass another --prefix")
+        end_date = datetime.strptime(options["end_date"], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+
+        seeder = Seeder(
+            seed=options["seed"],
+            prefix=options["prefix"],
+            batch_size=options["batch_size"],
+            skew=options["skew"],
+            unassigned_ratio=options["unassigned_ratio"],
+            uncategorised_ratio=options["uncategorised_ratio"],
+            mean_age_days=options["mean_age_days"],
+            end_date=end_date,
+            log=self.stdout.write if options["verbosity"] > 1 else None,
+        )
+        organisations = seeder.seed(
+            organisations=options["organisations"],
+            agents=options["agents"],
+            categories=options["categories"],
+            leads=options["leads"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {len(organisations)} organisation(s), log in as {options['prefix']}-org0 / password"
+        ))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from leads import sqlite
+
+
+class Command(BaseCommand):
+    help = (
+        "Switch a SQLite database to SQLITE_JOURNAL_MODE, or the mode given. The mode is stored "
+        "in the database file, so this only needs running once, while nothing else has it open."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("mode", nargs="?", help="Journal mode instead of SQLITE_JOURNAL_MODE, e.g. wal or delete.")
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if connection.vendor != "sqlite":
+            raise CommandError(f"{options['database']} isn't a SQLite database.")
+        try:
+            mode = options["mode"].lower() if options["mode"] else sqlite.get_journal_mode()
+            current = sqlite.set_journal_mode(connection, mode)
+        except ValueError as error:
+            raise CommandError(error)
+        if current != mode:
+            raise CommandError(f"{options['database']} is still in {current} mode, is something else using it?")
+        self.stdout.write(self.style.SUCCESS(f"{options['database']} is in {current} mode."))
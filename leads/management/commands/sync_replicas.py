@@ -0,0 +1,45 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from leads import replicas
+
+
+class Command(BaseCommand):
+    help = "Copy the primary SQLite database over its read replicas with SQLite's online backup API."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "aliases", nargs="*",
+            help="Database aliases to sync, LEAD_READ_REPLICAS when none are given."
+        )
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep syncing every --interval seconds instead of exiting after one copy."
+        )
+        parser.add_argument(
+            "--interval", type=float, default=5,
+            help="Seconds between syncs when --loop is given, keep it below LEAD_REPLICA_PIN_SECONDS."
+        )
+
+    def handle(self, *args, **options):
+        aliases = options["aliases"] or replicas.get_replicas()
+        if not aliases:
+            raise CommandError("No replicas to sync, name them or set LEAD_READ_REPLICAS.")
+        unknown = [alias for alias in aliases if alias not in connections.databases]
+        if unknown:
+            raise CommandError(f"Unknown database(s) {', '.join(unknown)}.")
+        while True:
+            start = time.perf_counter()
+            for alias in aliases:
+                try:
+                    replicas.sync(alias)
+                except ValueError as error:
+                    raise CommandError(error)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Synced {', '.join(aliases)} in {time.perf_counter() - start:.2f}s")
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
+        self.stdout.write(self.style.SUCCESS(f"Synced {len(aliases)} replica(s)."))
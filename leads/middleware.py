@@ -0,0 +1,67 @@
+from django.core.exceptions import ObjectDoesNotExist
+from django.utils.functional import SimpleLazyObject
+
+from . import caching, replicas
+
+
+def get_organisation(user):
+    """The UserProfile whose leads the user works on, or None."""
+    if not user.is_authenticated:
+        return None
+    try:
+        if user.is_organisor:
+            return user.userprofile
+        return user.agent.organisation
+    except ObjectDoesNotExist:
+        return None
+
+
+class OrganisationMiddleware:
+    """Set request.organisation, resolved on first use and cached for the request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.organisation = SimpleLazyObject(lambda: get_organisation(request.user))
+        return self.get_response(request)
+
+
+class ReplicaMiddleware:
+    """Route the reads of views with read_from_replica = True to a read replica.
+
+    GET and HEAD requests to those views read from one of LEAD_READ_REPLICAS,
+    unless the client wrote something in the last LEAD_REPLICA_PIN_SECONDS:
+    any other request that succeeds pins the client's reads to the primary
+    for that long, so they always see their own changes. The session, user
+    and organisation are always read from the primary, but the organisation's
+    cache generation is read from the replica, so cached pages and ETags are
+    labelled with the generation of the data they were built from.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            response = self.get_response(request)
+        finally:
+            replicas.use_replica(None)
+        if request.method not in ("GET", "HEAD", "OPTIONS") and response.status_code < 400:
+            replicas.pin(response)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, "view_class", None)
+        if (getattr(view_class, "read_from_replica", False) and request.method in ("GET", "HEAD")
+                and not replicas.is_pinned(request)):
+            alias = replicas.choose_replica()
+            #who is asking is read from the primary, a lagging replica would still
+            #know sessions that were logged out and users that were deactivated
+            if alias is not None and request.user.is_authenticated and request.organisation:
+                generation = caching.read_generation(request.organisation.pk, using=alias)
+                if generation is None:
+                    #the replica hasn't got the organisation yet
+                    return None
+                request.organisation.cache_generation = generation
+            replicas.use_replica(alias)
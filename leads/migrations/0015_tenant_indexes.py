@@ -0,0 +1,37 @@
+# Generated by Django 3.1.4 on 2026-10-18 11:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0014_auto_20211026_2348'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='agent',
+            index=models.Index(fields=['organisation', 'user'], name='agent_org_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['organisation', 'name'], name='category_org_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['organisation', 'agent', '-date_added', '-id'], name='lead_org_agent_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(agent__isnull=False), fields=['organisation', '-date_added', '-id'], name='lead_org_assigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(condition=models.Q(agent__isnull=True), fields=['organisation', '-date_added', '-id'], name='lead_org_unassigned_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['organisation', 'category'], name='lead_org_category_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 3.1.4 on 2026-10-18 11:49
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def populate_counters(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    for name, model_name, column in [('agent', 'Agent', 'open_lead_count'), ('category', 'Category', 'lead_count')]:
+        model = apps.get_model('leads', model_name)
+        counts = Lead.objects.filter(**{name + '__isnull': False}).order_by().values_list(name).annotate(count=Count('id'))
+        for pk, count in counts:
+            model.objects.filter(pk=pk).update(**{column: count})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0015_tenant_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='open_lead_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='lead_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,52 @@
+from django.db import migrations
+
+# The schema as this migration created it, leads/search.py may have moved on since.
+FTS_TABLE = 'leads_lead_fts'
+SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_lead_fts USING fts5(
+        first_name, last_name, email, phone_number, description, content='leads_lead', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_fts_insert AFTER INSERT ON leads_lead BEGIN
+        INSERT INTO leads_lead_fts(rowid, first_name, last_name, email, phone_number, description)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.phone_number, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_fts_delete AFTER DELETE ON leads_lead BEGIN
+        INSERT INTO leads_lead_fts(leads_lead_fts, rowid, first_name, last_name, email, phone_number, description)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone_number, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_fts_update AFTER UPDATE OF first_name, last_name, email, phone_number, description ON leads_lead BEGIN
+        INSERT INTO leads_lead_fts(leads_lead_fts, rowid, first_name, last_name, email, phone_number, description)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, old.phone_number, old.description);
+        INSERT INTO leads_lead_fts(rowid, first_name, last_name, email, phone_number, description)
+        VALUES (new.id, new.first_name, new.last_name, new.email, new.phone_number, new.description);
+    END""",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SCHEMA:
+        schema_editor.execute(statement)
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('_insert', '_delete', '_update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}{suffix}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0017_outgoingemail'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
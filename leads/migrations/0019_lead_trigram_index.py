@@ -0,0 +1,55 @@
+from django.db import migrations
+
+# The schema as this migration created it, leads/fuzzy.py may have moved on since.
+TRIGRAM_TABLE = 'leads_lead_trigram'
+VOCAB_TABLE = 'leads_lead_trigram_vocab'
+SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_lead_trigram USING fts5(
+        first_name, last_name, email, content='leads_lead', content_rowid='id',
+        tokenize='trigram', detail='none'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_lead_trigram_vocab USING fts5vocab(leads_lead_trigram, 'row')""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_trigram_insert AFTER INSERT ON leads_lead BEGIN
+        INSERT INTO leads_lead_trigram(rowid, first_name, last_name, email)
+        VALUES (new.id, new.first_name, new.last_name, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_trigram_delete AFTER DELETE ON leads_lead BEGIN
+        INSERT INTO leads_lead_trigram(leads_lead_trigram, rowid, first_name, last_name, email)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_trigram_update AFTER UPDATE OF first_name, last_name, email ON leads_lead BEGIN
+        INSERT INTO leads_lead_trigram(leads_lead_trigram, rowid, first_name, last_name, email)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+        INSERT INTO leads_lead_trigram(rowid, first_name, last_name, email)
+        VALUES (new.id, new.first_name, new.last_name, new.email);
+    END""",
+]
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in SCHEMA:
+        schema_editor.execute(statement)
+    schema_editor.execute(f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('rebuild')")
+    schema_editor.execute(f"INSERT INTO {TRIGRAM_TABLE}({TRIGRAM_TABLE}) VALUES ('optimize')")
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for suffix in ('_insert', '_delete', '_update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {TRIGRAM_TABLE}{suffix}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {VOCAB_TABLE}')
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TRIGRAM_TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0018_lead_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 3.1.4 on 2026-10-18 12:03
+
+import re
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# leads/normalization.py as this migration filled the keys in, it may have moved on since.
+def normalize_email(email):
+    email = (email or "").strip().lower()
+    local, at, domain = email.rpartition("@")
+    if not at or not local or not domain:
+        return email
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def normalize_phone(phone):
+    phone = (phone or "").strip()
+    digits = re.sub(r"\D", "", phone)
+    if not digits:
+        return ""
+    if phone.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    else:
+        digits = getattr(settings, "LEAD_PHONE_COUNTRY_CODE", "1") + digits.lstrip("0")
+    if not 8 <= len(digits) <= 15:
+        return ""
+    return f"+{digits}"
+
+
+def populate_duplicate_keys(apps, schema_editor):
+    Lead = apps.get_model('leads', 'Lead')
+    rows = Lead.objects.values_list('id', 'email', 'phone_number').iterator(chunk_size=5000)
+    with schema_editor.connection.cursor() as cursor:
+        #one prepared UPDATE run for every row, bulk_update's CASE WHEN is far slower at this size
+        cursor.executemany(
+            'UPDATE leads_lead SET email_normalized = %s, phone_e164 = %s WHERE id = %s',
+            ((normalize_email(email), normalize_phone(phone), pk) for pk, email, phone in rows)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0019_lead_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='email_normalized',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.AddField(
+            model_name='lead',
+            name='phone_e164',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+        migrations.RunPython(populate_duplicate_keys, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['organisation', 'email_normalized'], name='lead_org_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['organisation', 'phone_e164'], name='lead_org_phone_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 3.1.4 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0020_lead_duplicate_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='agent',
+            name='categories',
+            field=models.ManyToManyField(blank=True, related_name='agents', to='leads.Category'),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='routing_cursor',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='routing_strategy',
+            field=models.CharField(blank=True, choices=[('', 'Manual, an organisor assigns every lead'), ('round_robin', 'Round robin'), ('least_loaded', 'Least loaded agent'), ('category_affinity', "Least loaded agent handling the lead's category")], default='', max_length=20),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 3.1.4 on 2026-10-18 12:13
+
+from django.db import migrations, models
+import leads.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0021_lead_routing'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='cache_generation',
+            field=models.BigIntegerField(default=leads.models.new_cache_generation, editable=False),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.1.4 on 2026-10-18 12:20
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0022_organisation_cache_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
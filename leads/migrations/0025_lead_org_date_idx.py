@@ -0,0 +1,17 @@
+# Generated by Django 3.1.4 on 2026-10-18 12:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0024_agent_category_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lead',
+            index=models.Index(fields=['organisation', 'date_added', 'id'], name='lead_org_date_idx'),
+        ),
+    ]
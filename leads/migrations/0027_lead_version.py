@@ -0,0 +1,18 @@
+# Generated by Django 3.1.4 on 2026-10-18 12:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0026_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lead',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,86 @@
+from django.db import migrations
+
+# The schema as this migration created it, leads/fuzzy.py may have moved on since.
+# The trigram index becomes contentless with a tenant column holding the
+# organisation id as one trigram of private use characters, so searches
+# only rank the organisation's own leads.
+TRIGRAM_TABLE = 'leads_lead_trigram'
+VOCAB_TABLE = 'leads_lead_trigram_vocab'
+SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_lead_trigram USING fts5(
+        first_name, last_name, email, tenant, content='', tokenize='trigram', detail='none'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_lead_trigram_vocab USING fts5vocab(leads_lead_trigram, 'row')""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_trigram_insert AFTER INSERT ON leads_lead BEGIN
+        INSERT INTO leads_lead_trigram(rowid, first_name, last_name, email, tenant) VALUES (new.id, new.first_name, new.last_name, new.email, char(57344 + new.organisation_id / 40960000 % 6400, 57344 + new.organisation_id / 6400 % 6400, 57344 + new.organisation_id % 6400));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_trigram_delete AFTER DELETE ON leads_lead BEGIN
+        INSERT INTO leads_lead_trigram(leads_lead_trigram, rowid, first_name, last_name, email, tenant)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, char(57344 + old.organisation_id / 40960000 % 6400, 57344 + old.organisation_id / 6400 % 6400, 57344 + old.organisation_id % 6400));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_trigram_update
+    AFTER UPDATE OF first_name, last_name, email, organisation_id ON leads_lead BEGIN
+        INSERT INTO leads_lead_trigram(leads_lead_trigram, rowid, first_name, last_name, email, tenant)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email, char(57344 + old.organisation_id / 40960000 % 6400, 57344 + old.organisation_id / 6400 % 6400, 57344 + old.organisation_id % 6400));
+        INSERT INTO leads_lead_trigram(rowid, first_name, last_name, email, tenant) VALUES (new.id, new.first_name, new.last_name, new.email, char(57344 + new.organisation_id / 40960000 % 6400, 57344 + new.organisation_id / 6400 % 6400, 57344 + new.organisation_id % 6400));
+    END""",
+]
+POPULATE = [
+    """INSERT INTO leads_lead_trigram(rowid, first_name, last_name, email, tenant)
+        SELECT id, first_name, last_name, email, char(57344 + organisation_id / 40960000 % 6400, 57344 + organisation_id / 6400 % 6400, 57344 + organisation_id % 6400) FROM leads_lead""",
+    """INSERT INTO leads_lead_trigram(leads_lead_trigram) VALUES ('optimize')""",
+]
+# 0019's schema, for going back
+OLD_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_lead_trigram USING fts5(
+        first_name, last_name, email, content='leads_lead', content_rowid='id',
+        tokenize='trigram', detail='none'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_lead_trigram_vocab USING fts5vocab(leads_lead_trigram, 'row')""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_trigram_insert AFTER INSERT ON leads_lead BEGIN
+        INSERT INTO leads_lead_trigram(rowid, first_name, last_name, email)
+        VALUES (new.id, new.first_name, new.last_name, new.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_trigram_delete AFTER DELETE ON leads_lead BEGIN
+        INSERT INTO leads_lead_trigram(leads_lead_trigram, rowid, first_name, last_name, email)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_lead_trigram_update AFTER UPDATE OF first_name, last_name, email ON leads_lead BEGIN
+        INSERT INTO leads_lead_trigram(leads_lead_trigram, rowid, first_name, last_name, email)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+        INSERT INTO leads_lead_trigram(rowid, first_name, last_name, email)
+        VALUES (new.id, new.first_name, new.last_name, new.email);
+    END""",
+]
+OLD_POPULATE = [
+    "INSERT INTO leads_lead_trigram(leads_lead_trigram) VALUES ('rebuild')",
+    "INSERT INTO leads_lead_trigram(leads_lead_trigram) VALUES ('optimize')",
+]
+
+
+def drop(schema_editor):
+    for suffix in ('_insert', '_delete', '_update'):
+        schema_editor.execute(f'DROP TRIGGER IF EXISTS {TRIGRAM_TABLE}{suffix}', params=None)
+    schema_editor.execute(f'DROP TABLE IF EXISTS {VOCAB_TABLE}', params=None)
+    schema_editor.execute(f'DROP TABLE IF EXISTS {TRIGRAM_TABLE}', params=None)
+
+
+def replace_index(schema, populate):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        drop(schema_editor)
+        for statement in schema + populate:
+            schema_editor.execute(statement, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('leads', '0027_lead_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(replace_index(SCHEMA, POPULATE), replace_index(OLD_SCHEMA, OLD_POPULATE)),
+    ]
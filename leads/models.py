@@ -1,16 +1,45 @@
+import random
+
 from django.db import models
-from django.db.models.signals import post_save
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save, post_delete
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+from . import counters
+from .sqlite import atomic_write
+from .normalization import normalize_email, normalize_phone
 
 class User(AbstractUser):
     is_organisor = models.BooleanField(default=True)
     is_agent = models.BooleanField(default=False)
 
+def new_cache_generation():
+    #random so that a new organisation, or one recreated with the same pk, never meets old cache entries
+    return random.getrandbits(62)
+
+
 class UserProfile(models.Model):
+    ROUTING_STRATEGY_CHOICES = (
+        ("", "Manual, an organisor assigns every lead"),
+        ("round_robin", "Round robin"),
+        ("least_loaded", "Least loaded agent"),
+        ("category_affinity", "Least loaded agent handling the lead's category"),
+    )
+
     user = models.OneToOneField(User, on_delete=models.CASCADE)
+    #how leads created without an agent get one, see leads.routing
+    routing_strategy = models.CharField(max_length=20, blank=True, default="", choices=ROUTING_STRATEGY_CHOICES)
+    #the agent the round robin strategy assigned last
+    routing_cursor = models.PositiveIntegerField(default=0, editable=False)
+    #bumped on every write to the organisation's data, cached data is keyed by it, see leads.caching
+    cache_generation = models.BigIntegerField(default=new_cache_generation, editable=False)
     def __str__(self):
         return self.user.username
 
+class VersionConflict(Exception):
+    """A lead was saved expecting a version that someone else's write has already replaced, or was deleted."""
+
+
 # Create your models here.
 class Lead(models.Model):
     first_name = models.CharField(max_length=20, default="")
@@ -21,17 +50,113 @@ class Lead(models.Model):
     category = models.ForeignKey("Category", related_name="leads", null=True, blank=True, on_delete=models.SET_NULL)
     description= models.TextField()
     date_added= models.DateTimeField(auto_now_add=True)
+    #also set by the bulk UPDATEs in leads.bulk and leads.routing, cached fragments are keyed on it
+    updated_at = models.DateTimeField(auto_now=True)
     phone_number= models.CharField(max_length=20)
     email= models.EmailField() 
+    #filled in from email and phone_number on save, duplicates are found by these
+    email_normalized = models.CharField(max_length=254, blank=True, default="", editable=False)
+    phone_e164 = models.CharField(max_length=16, blank=True, default="", editable=False)
+    #bumped by every write, including the bulk UPDATEs in leads.bulk and leads.routing, see expect_version()
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            # LeadListView for agents: organisation + agent, newest first
+            models.Index(fields=["organisation", "agent", "-date_added", "-id"], name="lead_org_agent_date_idx"),
+            # LeadListView for organisors, split on whether the lead has an agent
+            models.Index(
+                fields=["organisation", "-date_added", "-id"], name="lead_org_assigned_idx",
+                condition=models.Q(agent__isnull=False)
+            ),
+            models.Index(
+                fields=["organisation", "-date_added", "-id"], name="lead_org_unassigned_idx",
+                condition=models.Q(agent__isnull=True)
+            ),
+            # the JSON API, every lead of the organisation oldest first
+            models.Index(fields=["organisation", "date_added", "id"], name="lead_org_date_idx"),
+            # category counts and CategoryDetailView
+            models.Index(fields=["organisation", "category"], name="lead_org_category_idx"),
+            # duplicate detection
+            models.Index(fields=["organisation", "email_normalized"], name="lead_org_email_idx"),
+            models.Index(fields=["organisation", "phone_e164"], name="lead_org_phone_idx"),
+        ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}" 
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super(Lead, cls).from_db(db, field_names, values)
+        #remember what the counters currently include this lead under
+        instance._counted_keys = counters.counted_keys(instance)
+        return instance
+
+    def normalize(self):
+        self.email_normalized = normalize_email(self.email)
+        self.phone_e164 = normalize_phone(self.phone_number)
+
+    def expect_version(self, version):
+        """Make the next save() only write if the lead is still at version, else raise VersionConflict.
+
+        The check is part of the UPDATE's WHERE clause, so it takes no locks.
+        """
+        self._expected_version = version
+
+    def save(self, *args, **kwargs):
+        self.normalize()
+        expected = getattr(self, "_expected_version", None)
+        if not self._state.adding:
+            #without an expected version, bump whatever is stored rather than the version this copy was loaded at
+            self.version = F("version") + 1 if expected is None else expected + 1
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            normalized = {"email": "email_normalized", "phone_number": "phone_e164"}
+            kwargs["update_fields"] = set(update_fields) | {normalized[name] for name in normalized if name in update_fields}
+            kwargs["update_fields"].update(["updated_at", "version"])
+        try:
+            #the counter updates in the post_save signal commit or roll back with the lead,
+            #a conflict only rolls back to the savepoint so the caller's transaction can go on
+            with atomic_write():
+                super(Lead, self).save(*args, **kwargs)
+                if expected is None and not isinstance(self.version, int):
+                    self.refresh_from_db(fields=["version"])
+        finally:
+            self.__dict__.pop("_expected_version", None)
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        expected = getattr(self, "_expected_version", None)
+        if expected is None:
+            updated = super(Lead, self)._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+            #a lead loaded from the database was deleted meanwhile, rather than inserting it again,
+            #which the version expression can't do. New ones with a pk given, fixtures too, get inserted
+            if not updated and not self._state.adding:
+                raise VersionConflict(f"Lead {pk_val} no longer exists.")
+            return updated
+        #UPDATE ... WHERE id = %s AND version = %s
+        updated = super(Lead, self)._do_update(
+            base_qs.filter(version=expected), using, pk_val, values, update_fields, forced_update
+        )
+        if not updated:
+            raise VersionConflict(f"Lead {pk_val} is no longer at version {expected}.")
+        return updated
+
 
 
 class Agent(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     organisation = models.ForeignKey(UserProfile, on_delete=models.CASCADE, default=1)
+    #leads currently assigned to this agent, maintained by the lead signals below
+    open_lead_count = models.PositiveIntegerField(default=0, editable=False)
+    #categories the category affinity routing strategy prefers this agent for
+    categories = models.ManyToManyField("Category", blank=True, related_name="agents")
+    #also set by the counter UPDATEs in leads.counters
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["organisation", "user"], name="agent_org_user_idx"),
+        ]
     
     def __str__(self):
         return self.user.email
@@ -41,15 +166,112 @@ class Agent(models.Model):
 class Category(models.Model):
     name = models.CharField(max_length=30)   #New, Contacted, Converted, Unconverted
     organisation = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    #leads in this category, maintained by the lead signals below
+    lead_count = models.PositiveIntegerField(default=0, editable=False)
+    #also set by the counter UPDATEs in leads.counters
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["organisation", "name"], name="category_org_name_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
 
 
+class OutgoingEmail(models.Model):
+    """An email waiting in the outbox for the process_outbox worker to send."""
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    STATUS_CHOICES = (
+        (PENDING, "Pending"),
+        (SENT, "Sent"),
+        (FAILED, "Failed"),
+    )
+
+    subject = models.CharField(max_length=255)
+    message = models.TextField()
+    html_message = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipient_list = models.JSONField()
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="outgoing_email_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipient_list)}"
+
+
+
+class IdempotencyKey(models.Model):
+    """The response to a POST sent with an Idempotency-Key, replayed when the request is retried."""
+    organisation = models.ForeignKey(UserProfile, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    #hash of the request, a key sent again with a different request is refused
+    fingerprint = models.CharField(max_length=32)
+    status_code = models.PositiveSmallIntegerField()
+    content_type = models.CharField(max_length=100)
+    location = models.CharField(max_length=2048, blank=True)
+    body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["organisation", "key"], name="idempotency_org_key_uniq"),
+        ]
+        indexes = [
+            # pruning
+            models.Index(fields=["created_at"], name="idempotency_created_idx"),
+        ]
+
+    def __str__(self):
+        return self.key
+
+
 def post_user_created_signal(sender, instance, created, **kwargs):
     pass
     if created:
         UserProfile.objects.create(user=instance)
 
-post_save.connect(post_user_created_signal, sender=User)
\ No newline at end of file
+post_save.connect(post_user_created_signal, sender=User)
+
+
+
+def pre_lead_saved_signal(sender, instance, raw, **kwargs):
+    if raw or instance.pk is None or hasattr(instance, "_counted_keys"):
+        return
+    #an instance that wasn't loaded from the database, look up what it replaces
+    instance._counted_keys = Lead.objects.filter(pk=instance.pk).values(*counters.COUNTERS).first() or {}
+
+
+def post_lead_saved_signal(sender, instance, created, raw, update_fields, **kwargs):
+    if raw:
+        return
+    before = {} if created else instance._counted_keys
+    after = counters.counted_keys(instance)
+    if update_fields is not None:
+        #fields that weren't written keep whatever the database already had
+        after = {name: after[name] if {name, f"{name}_id"} & set(update_fields) else before.get(name) for name in after}
+    counters.lead_changed(before, after)
+    instance._counted_keys = after
+
+
+def post_lead_deleted_signal(sender, instance, **kwargs):
+    before = getattr(instance, "_counted_keys", None)
+    counters.lead_changed(counters.counted_keys(instance) if before is None else before, {})
+
+
+pre_save.connect(pre_lead_saved_signal, sender=Lead)
+post_save.connect(post_lead_saved_signal, sender=Lead)
+post_delete.connect(post_lead_deleted_signal, sender=Lead)
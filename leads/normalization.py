@@ -0,0 +1,35 @@
+import re
+
+from django.conf import settings
+
+
+def normalize_email(email):
+    """Lowercase an address and drop any +tag, so the same mailbox compares equal."""
+    email = (email or "").strip().lower()
+    local, at, domain = email.rpartition("@")
+    if not at or not local or not domain:
+        return email
+    return f"{local.split('+', 1)[0]}@{domain}"
+
+
+def normalize_phone(phone, country_code=None):
+    """Best effort E.164 form of a phone number, or "" if it doesn't look like one.
+
+    Numbers without an international prefix are taken to be national
+    numbers in LEAD_PHONE_COUNTRY_CODE, with any trunk 0 dropped.
+    """
+    phone = (phone or "").strip()
+    digits = re.sub(r"\D", "", phone)
+    if not digits:
+        return ""
+    if phone.startswith("+"):
+        pass
+    elif digits.startswith("00"):
+        digits = digits[2:]
+    else:
+        if country_code is None:
+            country_code = getattr(settings, "LEAD_PHONE_COUNTRY_CODE", "1")
+        digits = country_code + digits.lstrip("0")
+    if not 8 <= len(digits) <= 15:
+        return ""
+    return f"+{digits}"
@@ -0,0 +1,116 @@
+import base64
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """A single page of a keyset paginated queryset.
+
+    Unlike django's Page, it never knows the total number of rows or pages,
+    only whether there is something before and after it.
+    """
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """Paginate a queryset on a unique ordering, e.g. ("-date_added", "-id").
+
+    Each page is fetched with a WHERE clause on the ordering columns of the
+    row at the edge of the previous page, so there is no OFFSET and no
+    COUNT(*) and page N costs the same as page 1. Cursors are opaque strings
+    that encode the direction and the edge row's key.
+    """
+    def __init__(self, queryset, per_page, ordering=("-date_added", "-id")):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip("-") for name in self.ordering]
+
+    def page(self, cursor=None):
+        if not cursor:
+            return self._forward(None, first=True)
+        direction, key = self.decode_cursor(cursor)
+        if direction == "n":
+            return self._forward(key)
+        return self._backward(key)
+
+    def _forward(self, key, first=False):
+        queryset = self.queryset.order_by(*self.ordering)
+        if key is not None:
+            queryset = queryset.filter(self._after(key, self.ordering))
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return self._make_page(rows, has_next=has_next, has_previous=not first and bool(rows))
+
+    def _backward(self, key):
+        reverse = tuple(self._reverse(name) for name in self.ordering)
+        queryset = self.queryset.order_by(*reverse).filter(self._after(key, reverse))
+        rows = list(queryset[:self.per_page + 1])
+        has_previous = len(rows) > self.per_page
+        rows = rows[:self.per_page][::-1]
+        return self._make_page(rows, has_next=bool(rows), has_previous=has_previous)
+
+    def _make_page(self, rows, has_next, has_previous):
+        next_cursor = self.encode_cursor("n", rows[-1]) if has_next else None
+        previous_cursor = self.encode_cursor("p", rows[0]) if has_previous else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    def _after(self, key, ordering):
+        # (a, b) > (x, y)  <=>  a > x OR (a = x AND b > y)
+        condition = Q()
+        equal = {}
+        for name, value in zip(ordering, key):
+            field = name.lstrip("-")
+            lookup = "lt" if name.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{field}__{lookup}": value})
+            equal[field] = value
+        return condition
+
+    def _reverse(self, name):
+        return name[1:] if name.startswith("-") else f"-{name}"
+
+    def _key(self, row):
+        if isinstance(row, dict):
+            return [row[field] for field in self.fields]
+        return [getattr(row, field) for field in self.fields]
+
+    def encode_cursor(self, direction, row):
+        key = [value.isoformat() if hasattr(value, "isoformat") else value for value in self._key(row)]
+        raw = json.dumps([direction] + key, separators=(",", ":"))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + "=" * (-len(cursor) % 4)
+            direction, *values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+            if direction not in ("n", "p") or len(values) != len(self.fields):
+                raise ValueError
+            model = self.queryset.model
+            key = [model._meta.get_field(field).to_python(value) for field, value in zip(self.fields, values)]
+        except Exception:
+            raise InvalidCursor(cursor)
+        return direction, key
@@ -0,0 +1,92 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# a user's reads stay on the primary until the time in this cookie, set whenever they write
+PIN_COOKIE = "lead_primary_until"
+
+_state = threading.local()
+
+
+def get_replicas():
+    """The database aliases listed in LEAD_READ_REPLICAS."""
+    return list(getattr(settings, "LEAD_READ_REPLICAS", []))
+
+
+def get_pin_seconds():
+    """How long reads stay on the primary after a write, LEAD_REPLICA_PIN_SECONDS (10 by default).
+
+    It should outlast the replicas' lag, e.g. the sync_replicas interval.
+    """
+    return getattr(settings, "LEAD_REPLICA_PIN_SECONDS", 10)
+
+
+def current_replica():
+    """The alias reads are routed to in this thread, None for the primary."""
+    return getattr(_state, "alias", None)
+
+
+def use_replica(alias):
+    _state.alias = alias
+
+
+def choose_replica():
+    replicas = get_replicas()
+    return random.choice(replicas) if replicas else None
+
+
+def is_pinned(request):
+    try:
+        return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def pin(response):
+    """Keep the client's reads on the primary for the next get_pin_seconds()."""
+    seconds = get_pin_seconds()
+    response.set_cookie(PIN_COOKIE, str(int(time.time() + seconds)), max_age=seconds, httponly=True, samesite="Lax")
+
+
+class ReplicaRouter:
+    """Send reads to the replica chosen for the request, everything else to the primary.
+
+    Reads only leave the primary while ReplicaMiddleware has picked a
+    replica for a view that opted in, so code outside those views, and
+    every write, keeps seeing the primary. Replicas are copies of the
+    primary and are never migrated themselves.
+    """
+
+    def db_for_read(self, model, **hints):
+        return current_replica()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *get_replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+def sync(alias, source=DEFAULT_DB_ALIAS):
+    """Copy the primary SQLite database over the replica with SQLite's online backup API.
+
+    Readers of the replica carry on during the copy and see the new
+    snapshot once it is done. Other databases have their own replication.
+    """
+    primary, replica = connections[source], connections[alias]
+    if primary.vendor != "sqlite" or replica.vendor != "sqlite":
+        raise ValueError(f"Only SQLite databases can be synced, {alias!r} is {replica.vendor}")
+    primary.ensure_connection()
+    replica.ensure_connection()
+    primary.connection.backup(replica.connection)
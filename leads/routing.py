@@ -0,0 +1,182 @@
+import heapq
+from bisect import bisect_right
+from collections import Counter, defaultdict
+
+from django.db.models import F
+from django.utils import timezone
+
+from . import caching, counters
+from .models import Lead, Agent, UserProfile
+from .sqlite import atomic_write
+
+
+class RoutingStrategy:
+    """Picks an agent for each lead to route.
+
+    Everything a strategy needs is loaded once, when it is created, and
+    kept up to date in memory as it assigns leads, so pick() costs O(1)
+    (O(log agents) for the load balanced strategies) however many leads
+    are routed. Agent loads come from the maintained open_lead_count
+    counters rather than from counting leads.
+    """
+    name = None
+
+    def __init__(self, organisation):
+        self.organisation = organisation
+        self.agents = list(
+            Agent.objects.filter(organisation=organisation, user__is_active=True)
+            .order_by("id").values_list("id", "open_lead_count")
+        )
+
+    def refresh(self):
+        """Re-read any state other writers may have moved on, inside the transaction that saves the picks."""
+
+    def pick(self, category_id=None):
+        """The id of the agent to give a lead to, None if there are no agents."""
+        raise NotImplementedError
+
+    def save(self):
+        """Store any state that has to outlive this strategy."""
+
+
+class RoundRobinStrategy(RoutingStrategy):
+    """Every agent in turn, carrying on after the last agent of the previous run."""
+    name = "round_robin"
+
+    def __init__(self, organisation):
+        super(RoundRobinStrategy, self).__init__(organisation)
+        self.ids = [pk for pk, load in self.agents]
+        self.refresh()
+
+    def refresh(self):
+        #the organisation was loaded with the request, another request may have routed leads since
+        self.last = UserProfile.objects.filter(pk=self.organisation.pk).values_list("routing_cursor", flat=True).get()
+        self.position = bisect_right(self.ids, self.last)
+
+    def pick(self, category_id=None):
+        if not self.ids:
+            return None
+        self.last = self.ids[self.position % len(self.ids)]
+        self.position += 1
+        return self.last
+
+    def save(self):
+        UserProfile.objects.filter(pk=self.organisation.pk).update(routing_cursor=self.last)
+        self.organisation.routing_cursor = self.last
+
+
+class LeastLoadedStrategy(RoutingStrategy):
+    """The agent with the fewest open leads, ties going to the longest serving agent."""
+    name = "least_loaded"
+
+    def __init__(self, organisation):
+        super(LeastLoadedStrategy, self).__init__(organisation)
+        self.loads = dict(self.agents)
+        self.heap = [(load, pk) for pk, load in self.agents]
+        heapq.heapify(self.heap)
+
+    def pop_least_loaded(self, heap):
+        #an agent can sit in several heaps, entries with an out of date load are fixed as they surface
+        while heap:
+            load, pk = heap[0]
+            if load == self.loads[pk]:
+                self.loads[pk] = load + 1
+                heapq.heapreplace(heap, (load + 1, pk))
+                return pk
+            heapq.heapreplace(heap, (self.loads[pk], pk))
+        return None
+
+    def pick(self, category_id=None):
+        return self.pop_least_loaded(self.heap)
+
+
+class CategoryAffinityStrategy(LeastLoadedStrategy):
+    """The least loaded agent who handles the lead's category, or else the least loaded agent."""
+    name = "category_affinity"
+
+    def __init__(self, organisation):
+        super(CategoryAffinityStrategy, self).__init__(organisation)
+        self.category_heaps = defaultdict(list)
+        affinities = Agent.categories.through.objects.filter(agent_id__in=self.loads).values_list("category_id", "agent_id")
+        for category_id, pk in affinities:
+            heapq.heappush(self.category_heaps[category_id], (self.loads[pk], pk))
+
+    def pick(self, category_id=None):
+        heap = self.category_heaps.get(category_id)
+        if heap:
+            return self.pop_least_loaded(heap)
+        return self.pop_least_loaded(self.heap)
+
+
+STRATEGIES = {
+    strategy.name: strategy
+    for strategy in (RoundRobinStrategy, LeastLoadedStrategy, CategoryAffinityStrategy)
+}
+
+
+def get_strategy(organisation, name=None):
+    """The organisation's routing strategy, or the one called name."""
+    name = name or organisation.routing_strategy
+    try:
+        return STRATEGIES[name](organisation)
+    except KeyError:
+        raise ValueError(f"Unknown routing strategy {name!r}, expected one of {', '.join(STRATEGIES)}")
+
+
+def route_new_lead(lead):
+    """Give an unsaved lead without an agent one, if its organisation routes leads automatically.
+
+    Call it inside the atomic_write() transaction that saves the lead.
+    """
+    if lead.agent_id is not None or not lead.organisation.routing_strategy:
+        return
+    strategy = get_strategy(lead.organisation)
+    lead.agent_id = strategy.pick(lead.category_id)
+    strategy.save()
+
+
+def route_new_leads(strategy, leads):
+    """Give the unsaved leads without an agent one each from strategy, and store where it got to.
+
+    Call it inside the atomic_write() transaction that saves the leads, so
+    the strategy picks from state no other writer can change until then.
+    """
+    strategy.refresh()
+    for lead in leads:
+        if lead.agent_id is None:
+            lead.agent_id = strategy.pick(lead.category_id)
+    strategy.save()
+
+
+def route_unassigned(organisation, name=None, batch_size=500):
+    """Assign every unassigned lead in the organisation, oldest first. Returns how many were routed.
+
+    Each batch is written with one UPDATE per agent, in its own transaction.
+    """
+    strategy = get_strategy(organisation, name)
+    unassigned = Lead.objects.filter(organisation=organisation, agent__isnull=True).order_by("date_added", "id")
+    routed = 0
+    while strategy.agents:
+        rows = list(unassigned.values_list("id", "category_id")[:batch_size])
+        if not rows:
+            break
+        deltas = Counter()
+        now = timezone.now()
+        with atomic_write():
+            strategy.refresh()
+            by_agent = defaultdict(list)
+            for pk, category_id in rows:
+                by_agent[strategy.pick(category_id)].append(pk)
+            for agent_id, pks in by_agent.items():
+                #leads assigned by someone else in the meantime are left alone
+                updated = Lead.objects.filter(pk__in=pks, agent__isnull=True).update(
+                    agent_id=agent_id, updated_at=now, version=F("version") + 1
+                )
+                deltas[("agent", agent_id)] += updated
+                routed += updated
+            counters.apply_deltas(deltas)
+            strategy.save()
+            caching.bump(organisation.pk)
+        if len(rows) < batch_size:
+            break
+    return routed
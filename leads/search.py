@@ -0,0 +1,104 @@
+import re
+
+from django.db import connection as default_connection
+from django.db.models import Q
+
+from .models import Lead
+
+FTS_TABLE = "leads_lead_fts"
+COLUMNS = ("first_name", "last_name", "email", "phone_number", "description")
+# bm25 weights for COLUMNS, a match on a name counts for more than one in the description
+WEIGHTS = (10.0, 10.0, 5.0, 5.0, 1.0)
+
+# The index is an external content FTS5 table over leads_lead, kept in sync by
+# triggers so that every write path (save, bulk_create, update) is covered.
+SCHEMA = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {", ".join(COLUMNS)}, content='leads_lead', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON leads_lead BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {", ".join(COLUMNS)})
+        VALUES (new.id, {", ".join(f"new.{column}" for column in COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON leads_lead BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {", ".join(COLUMNS)})
+        VALUES ('delete', old.id, {", ".join(f"old.{column}" for column in COLUMNS)});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF {", ".join(COLUMNS)} ON leads_lead BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {", ".join(COLUMNS)})
+        VALUES ('delete', old.id, {", ".join(f"old.{column}" for column in COLUMNS)});
+        INSERT INTO {FTS_TABLE}(rowid, {", ".join(COLUMNS)})
+        VALUES (new.id, {", ".join(f"new.{column}" for column in COLUMNS)});
+    END""",
+]
+
+
+def is_supported(connection=default_connection):
+    return connection.vendor == "sqlite"
+
+
+def install(connection=default_connection):
+    """Create the search table and triggers if they are missing.
+
+    SQLite migrations that remake leads_lead drop its triggers, so this
+    also runs after every migrate.
+    """
+    if not is_supported(connection):
+        return
+    with connection.cursor() as cursor:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+
+
+def rebuild(connection=default_connection):
+    """Rebuild the whole index from leads_lead."""
+    install(connection)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+        cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+
+
+def match_expression(text):
+    """Turn free text into an FTS5 query: every word, as a prefix, must match."""
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def search_lead_ids(organisation, text, agent=None, limit=25, offset=0):
+    """Ids of the organisation's leads matching text, best match first."""
+    expression = match_expression(text)
+    if not expression:
+        return []
+    if not is_supported():
+        queryset = Lead.objects.filter(organisation=organisation)
+        for word in re.findall(r"\w+", text):
+            queryset = queryset.filter(
+                Q(first_name__icontains=word) | Q(last_name__icontains=word) | Q(email__icontains=word)
+                | Q(phone_number__icontains=word) | Q(description__icontains=word)
+            )
+        if agent is not None:
+            queryset = queryset.filter(agent=agent)
+        return list(queryset.order_by("-date_added", "-id").values_list("id", flat=True)[offset:offset + limit])
+
+    sql = f"""
+        SELECT lead.id FROM {FTS_TABLE}
+        JOIN leads_lead lead ON lead.id = {FTS_TABLE}.rowid
+        WHERE {FTS_TABLE} MATCH %s AND lead.organisation_id = %s
+    """
+    params = [expression, organisation.pk]
+    if agent is not None:
+        sql += " AND lead.agent_id = %s"
+        params.append(agent.pk)
+    sql += f" ORDER BY bm25({FTS_TABLE}, {', '.join(map(str, WEIGHTS))}), lead.id LIMIT %s OFFSET %s"
+    params += [limit, offset]
+    with default_connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search_leads(organisation, text, agent=None, limit=25, offset=0):
+    """The matching Lead objects, in rank order."""
+    ids = search_lead_ids(organisation, text, agent=agent, limit=limit, offset=offset)
+    leads = Lead.objects.select_related("category").in_bulk(ids)
+    return [leads[pk] for pk in ids if pk in leads]
@@ -0,0 +1,139 @@
+import random
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .bulk import bulk_create_leads
+from .models import User, UserProfile, Lead, Agent, Category
+
+FIRST_NAMES = (
+    "James", "Mary", "Robert", "Patricia", "John", "Jennifer", "Michael", "Linda", "Priya", "Rahul",
+    "Aisha", "Wei", "Fatima", "Carlos", "Sofia", "Yuki", "Olga", "Kwame", "Amara", "Lucas",
+)
+LAST_NAMES = (
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Sharma", "Patel",
+    "Khan", "Chen", "Nguyen", "Silva", "Rossi", "Tanaka", "Ivanova", "Mensah", "Okafor", "Martin",
+)
+CATEGORY_NAMES = ("New", "Contacted", "Converted", "Unconverted")
+DEFAULT_END_DATE = datetime(2021, 11, 1, tzinfo=timezone.utc)
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights for picking item i with probability proportional to 1/(i+1)**exponent."""
+    return list(accumulate(1 / (rank + 1) ** exponent for rank in range(count)))
+
+
+def set_date_added(leads, dates):
+    """Write the generated dates over the now() that auto_now_add gave the bulk created leads."""
+    table = connection.ops.quote_name(Lead._meta.db_table)
+    column = connection.ops.quote_name(Lead._meta.get_field("date_added").column)
+    adapt = connection.ops.adapt_datetimefield_value
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {table} SET {column} = %s WHERE id = %s",
+            [(adapt(date), lead.pk) for lead, date in zip(leads, dates)]
+        )
+    for lead, date in zip(leads, dates):
+        lead.date_added = date
+
+
+class Seeder:
+    """Generate organisations, agents, categories and leads deterministically.
+
+    Everything is written with bulk_create, which skips
+    post_user_created_signal, so the UserProfiles are created here too.
+    Assignment to agents and categories follows a zipf distribution and
+    lead ages an exponential one, like a real, uneven book of leads.
+    """
+    def __init__(self, seed=0, prefix="seed", batch_size=5000, skew=1.1,
+                 unassigned_ratio=0.1, uncategorised_ratio=0.2, mean_age_days=90,
+                 end_date=DEFAULT_END_DATE, log=None):
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.batch_size = batch_size
+        self.skew = skew
+        self.unassigned_ratio = unassigned_ratio
+        self.uncategorised_ratio = uncategorised_ratio
+        self.mean_age_days = mean_age_days
+        self.end_date = end_date
+        self.log = log or (lambda message: None)
+        #hashing is deliberately slow, every seeded user shares one password
+        self.password = make_password("password")
+
+    def seed(self, organisations=1, agents=10, categories=4, leads=10000):
+        created = []
+        for number in range(organisations):
+            organisation = self.seed_organisation(number, agents, categories, leads)
+            created.append(organisation)
+        return created
+
+    def create_users(self, usernames, **kwargs):
+        User.objects.bulk_create([
+            User(username=username, email=f"{username}@example.com", password=self.password, **kwargs)
+            for username in usernames
+        ], batch_size=self.batch_size)
+        ids = dict(User.objects.filter(username__in=usernames).values_list("username", "id"))
+        return [ids[username] for username in usernames]
+
+    def seed_organisation(self, number, agent_count, category_count, lead_count):
+        username = f"{self.prefix}-org{number}"
+        [user_id] = self.create_users([username])
+        organisation = UserProfile.objects.create(user_id=user_id)
+
+        agent_user_ids = self.create_users(
+            [f"{username}-agent{i}" for i in range(agent_count)], is_organisor=False, is_agent=True
+        )
+        Agent.objects.bulk_create([Agent(user_id=pk, organisation=organisation) for pk in agent_user_ids])
+        agent_ids = list(Agent.objects.filter(organisation=organisation).order_by("id").values_list("id", flat=True))
+
+        names = list(CATEGORY_NAMES[:category_count])
+        names += [f"Category {i}" for i in range(len(names), category_count)]
+        Category.objects.bulk_create([Category(name=name, organisation=organisation) for name in names])
+        category_ids = list(Category.objects.filter(organisation=organisation).order_by("id").values_list("id", flat=True))
+
+        self.log(f"{username}: {agent_count} agents, {category_count} categories, {lead_count} leads")
+        self.seed_leads(organisation, agent_ids, category_ids, lead_count)
+        return organisation
+
+    def seed_leads(self, organisation, agent_ids, category_ids, count):
+        agent_weights = zipf_weights(len(agent_ids), self.skew)
+        category_weights = zipf_weights(len(category_ids), self.skew)
+        written = 0
+        while written < count:
+            size = min(self.batch_size, count - written)
+            batch = [
+                self.make_lead(organisation, written + i, agent_ids, agent_weights, category_ids, category_weights)
+                for i in range(size)
+            ]
+            dates = [lead.date_added for lead in batch]
+            with transaction.atomic():
+                bulk_create_leads(batch)
+                set_date_added(batch, dates)
+            written += size
+            self.log(f"  {written}/{count} leads")
+
+    def make_lead(self, organisation, number, agent_ids, agent_weights, category_ids, category_weights):
+        rng = self.rng
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        agent_id = category_id = None
+        if agent_ids and rng.random() >= self.unassigned_ratio:
+            agent_id = rng.choices(agent_ids, cum_weights=agent_weights)[0]
+        if category_ids and rng.random() >= self.uncategorised_ratio:
+            category_id = rng.choices(category_ids, cum_weights=category_weights)[0]
+        age = timedelta(days=rng.expovariate(1 / self.mean_age_days))
+        return Lead(
+            first_name=first_name,
+            last_name=last_name,
+            age=rng.randint(18, 80),
+            organisation=organisation,
+            agent_id=agent_id,
+            category_id=category_id,
+            description=f"Lead {number} for {first_name} {last_name}",
+            date_added=self.end_date - age,
+            phone_number=f"+1{rng.randint(2000000000, 9999999999)}",
+            email=f"{first_name}.{last_name}.{number}@example.com".lower(),
+        )
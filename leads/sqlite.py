@@ -0,0 +1,96 @@
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+# What SQLite uses when nothing is set, for comparing against SQLITE_PRAGMAS.
+DEFAULT_PRAGMAS = {
+    "synchronous": "full",
+    "busy_timeout": 5000,
+    "mmap_size": 0,
+    "cache_size": -2000,
+    "temp_store": "default",
+}
+DEFAULT_JOURNAL_MODE = "delete"
+JOURNAL_MODES = ("delete", "truncate", "persist", "memory", "wal", "off")
+# stored in the database file, so set once with set_journal_mode rather than per connection
+PERSISTENT_PRAGMAS = ("journal_mode",)
+TRANSACTION_MODES = ("DEFERRED", "IMMEDIATE", "EXCLUSIVE")
+
+
+def get_pragmas():
+    return getattr(settings, "SQLITE_PRAGMAS", {})
+
+
+def get_journal_mode():
+    """The journal mode set_journal_mode switches databases to, SQLITE_JOURNAL_MODE (delete by default)."""
+    mode = getattr(settings, "SQLITE_JOURNAL_MODE", DEFAULT_JOURNAL_MODE).lower()
+    if mode not in JOURNAL_MODES:
+        raise ValueError(f"Unknown SQLite journal mode {mode!r}, expected one of {', '.join(JOURNAL_MODES)}")
+    return mode
+
+
+def get_transaction_mode():
+    """How leads.sqlite_backend begins transactions, SQLITE_TRANSACTION_MODE (DEFERRED by default)."""
+    mode = getattr(settings, "SQLITE_TRANSACTION_MODE", "DEFERRED").upper()
+    if mode not in TRANSACTION_MODES:
+        raise ValueError(f"Unknown SQLite transaction mode {mode!r}, expected one of {', '.join(TRANSACTION_MODES)}")
+    return mode
+
+
+def apply_pragmas(connection, pragmas):
+    """Run PRAGMA name = value for each of pragmas on a django connection's database connection."""
+    cursor = connection.connection.cursor()
+    try:
+        for name in sorted(pragmas):
+            value = pragmas[name]
+            if not name.isidentifier() or not isinstance(value, (int, str)) or not str(value).lstrip("-").isalnum():
+                raise ValueError(f"Invalid SQLite pragma {name!r} = {value!r}")
+            if name in PERSISTENT_PRAGMAS:
+                raise ValueError(f"{name} is stored in the database, set it once with manage.py set_journal_mode")
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def configure_connection(sender, connection, **kwargs):
+    """connection_created receiver applying SQLITE_PRAGMAS to every new SQLite connection."""
+    if connection.vendor == "sqlite":
+        apply_pragmas(connection, get_pragmas())
+
+
+def set_journal_mode(connection, mode):
+    """Switch a django connection's database to mode, returns the mode SQLite reports afterwards.
+
+    The mode is stored in the file, every later connection uses it. It
+    can't change inside a transaction, and switching to or from WAL needs
+    the database to itself.
+    """
+    if mode not in JOURNAL_MODES:
+        raise ValueError(f"Unknown SQLite journal mode {mode!r}, expected one of {', '.join(JOURNAL_MODES)}")
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode = {mode}")
+        return cursor.fetchone()[0]
+
+
+@contextmanager
+def atomic_write(using=None):
+    """transaction.atomic() for transactions that write.
+
+    A plain BEGIN only takes SQLite's write lock at the first write, and
+    upgrading to it while another writer commits fails with "database is
+    locked" at once, busy_timeout or not. On leads.sqlite_backend the
+    outermost block begins with BEGIN IMMEDIATE instead, which takes the
+    lock up front so the transaction waits for it. Anywhere else this is
+    transaction.atomic().
+    """
+    connection = transaction.get_connection(using)
+    immediate = connection.vendor == "sqlite" and not connection.in_atomic_block
+    if immediate:
+        connection.transaction_mode = "IMMEDIATE"
+    try:
+        with transaction.atomic(using=using):
+            yield
+    finally:
+        if immediate:
+            connection.transaction_mode = None
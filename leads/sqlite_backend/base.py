@@ -0,0 +1,17 @@
+from django.db.backends.sqlite3 import base
+
+from leads import sqlite
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Django's SQLite backend, able to begin transactions in other modes than DEFERRED.
+
+    Transactions begin in SQLITE_TRANSACTION_MODE, DEFERRED by default so
+    reads never wait for a writer. leads.sqlite.atomic_write() begins its
+    transactions IMMEDIATE, for the write paths.
+    """
+    #set by atomic_write() for the transaction it is about to begin
+    transaction_mode = None
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f"BEGIN {self.transaction_mode or sqlite.get_transaction_mode()}")
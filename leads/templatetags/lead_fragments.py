@@ -0,0 +1,48 @@
+from django import template
+from django.conf import settings
+
+from leads import caching
+
+register = template.Library()
+
+
+class LeadFragmentNode(template.Node):
+
+    def __init__(self, nodelist, name, lead, vary):
+        self.nodelist = nodelist
+        self.name = name
+        self.lead = lead
+        self.vary = vary
+
+    def render(self, context):
+        lead = self.lead.resolve(context)
+        key = caching.fragment_key(
+            self.name.resolve(context), lead, [value.resolve(context) for value in self.vary]
+        )
+        cache = caching.get_cache()
+        html = cache.get(key)
+        if html is not None:
+            caching.fragment_stats.hits += 1
+            return html
+        caching.fragment_stats.misses += 1
+        html = self.nodelist.render(context)
+        cache.set(key, html, getattr(settings, "LEAD_FRAGMENT_CACHE_TIMEOUT", 3600))
+        return html
+
+
+@register.tag
+def leadfragment(parser, token):
+    """Cache the enclosed template for one lead until the lead is saved again.
+
+        {% leadfragment "row" lead lead.category.name %} ... {% endleadfragment %}
+
+    Anything after the lead that the fragment shows but which can change
+    without the lead being saved has to be listed so it is part of the key.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(f"{bits[0]} takes a fragment name and a lead")
+    nodelist = parser.parse(("endleadfragment",))
+    parser.delete_first_token()
+    return LeadFragmentNode(nodelist, parser.compile_filter(bits[1]), parser.compile_filter(bits[2]),
+                            [parser.compile_filter(bit) for bit in bits[3:]])
@@ -0,0 +1,55 @@
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from leads.models import User, Lead, Agent, Category
+
+
+def create_organisor(username="organisor", password="password"):
+    user = User.objects.create_user(username=username, password=password, email=f"{username}@test.com")
+    return user
+
+
+def create_agent(organisation, username="agent", password="password"):
+    user = User.objects.create_user(
+        username=username, password=password, email=f"{username}@test.com",
+        is_organisor=False, is_agent=True
+    )
+    return Agent.objects.create(user=user, organisation=organisation)
+
+
+def create_category(organisation, name="New"):
+    return Category.objects.create(name=name, organisation=organisation)
+
+
+def create_leads(organisation, count, agent=None, category=None, **kwargs):
+    leads = []
+    for i in range(count):
+        fields = {
+            "first_name": f"first{i}", "last_name": f"last{i}", "description": "description",
+            "phone_number": f"0700{i:06d}", "email": f"lead{i}@test.com",
+        }
+        fields.update(kwargs)
+        leads.append(Lead.objects.create(organisation=organisation, agent=agent, category=category, **fields))
+    return leads
+
+
+class QueryBudgetMixin:
+    """TestCase mixin for asserting a view's query count doesn't grow with its rows."""
+
+    def assertQueryBudget(self, url, budget, seed, sizes=(1, 10, 30)):
+        """GET url after seed(n) has added n more rows for each size in turn.
+
+        Fails if the query count differs between sizes or exceeds budget.
+        """
+        counts = []
+        for size in sizes:
+            seed(size)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            counts.append(len(queries))
+        self.assertEqual(
+            len(set(counts)), 1,
+            f"{url} query count grows with rows seeded {list(sizes)}: {counts}"
+        )
+        self.assertLessEqual(counts[0], budget, f"{url} runs {counts[0]} queries, budget is {budget}")
@@ -0,0 +1,185 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import reverse
+
+from leads import search
+from leads.models import Lead, Agent, Category, OutgoingEmail
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+
+class LeadApiTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation)
+        self.leads = create_leads(self.organisation, 5, agent=self.agent, category=self.category)
+        self.unassigned = create_leads(self.organisation, 2, email="free@test.com")
+        create_leads(create_organisor("other").userprofile, 3)
+        self.client.force_login(self.user)
+
+    def get(self, name, status=200, **params):
+        response = self.client.get(reverse(f"leads:{name}"), params)
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def test_list_pages_through_every_lead_oldest_first(self):
+        ids = []
+        data = self.get("api-lead-list", limit=3)
+        while True:
+            ids += [row["id"] for row in data["results"]]
+            if not data["next"]:
+                break
+            data = self.client.get(data["next"]).json()
+        self.assertEqual(ids, [lead.pk for lead in self.leads + self.unassigned])
+        self.assertIsNotNone(data["previous"])
+
+    def test_fields_are_projected(self):
+        data = self.get("api-lead-list", fields="email,category_name")
+        self.assertEqual(data["results"][0], {"email": "lead0@test.com", "category_name": "New"})
+        lead = self.leads[0]
+        self.assertEqual(
+            self.client.get(reverse("leads:api-lead-detail", kwargs={"pk": lead.pk}), {"fields": "id,agent"}).json(),
+            {"id": lead.pk, "agent": self.agent.pk}
+        )
+
+    def test_unknown_fields_are_rejected(self):
+        data = self.get("api-lead-list", status=400, fields="email,password")
+        self.assertIn("password", data["errors"]["fields"][0])
+
+    def test_list_does_not_depend_on_the_number_of_leads(self):
+        with self.assertNumQueries(3):
+            self.get("api-lead-list")
+        create_leads(self.organisation, 20, agent=self.agent, category=self.category)
+        with self.assertNumQueries(3):
+            self.get("api-lead-list")
+
+    def test_agents_only_read_their_own_leads(self):
+        self.client.force_login(self.agent.user)
+        data = self.get("api-lead-list")
+        self.assertEqual([row["id"] for row in data["results"]], [lead.pk for lead in self.leads])
+        response = self.client.get(reverse("leads:api-lead-detail", kwargs={"pk": self.unassigned[0].pk}))
+        self.assertEqual(response.status_code, 404)
+        self.get("api-agent-list", status=403)
+
+    def test_categories_and_agents(self):
+        data = self.get("api-category-list", fields="name,lead_count")
+        self.assertEqual(data["results"], [{"name": "New", "lead_count": 5}])
+        data = self.get("api-agent-list", fields="id,username,open_lead_count")
+        self.assertEqual(data["results"], [{"id": self.agent.pk, "username": "agent", "open_lead_count": 5}])
+
+    def test_anonymous_clients_are_refused(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("leads:api-lead-list")).status_code, 403)
+
+    def test_invalid_cursor(self):
+        self.get("api-lead-list", status=404, cursor="nonsense")
+
+
+class LeadApiBulkTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation)
+        self.client.force_login(self.user)
+
+    def post(self, body, status=200):
+        response = self.client.post(
+            reverse("leads:api-lead-bulk"), json.dumps(body), content_type="application/json"
+        )
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def new_leads(self, count, **fields):
+        return [
+            dict({"first_name": f"first{i}", "last_name": f"last{i}", "age": 30, "email": f"Lead{i}@Test.com",
+                  "phone_number": f"0700{i:06d}", "description": "description"}, **fields)
+            for i in range(count)
+        ]
+
+    def test_create(self):
+        data = self.post({"leads": self.new_leads(3, agent=self.agent.pk, category=self.category.pk)})
+        self.assertEqual((data["created"], data["updated"], data["failed"]), (3, 0, 0))
+        ids = [result["id"] for result in data["results"]]
+        self.assertEqual(list(Lead.objects.order_by("id").values_list("id", flat=True)), ids)
+        lead = Lead.objects.get(pk=ids[1])
+        self.assertEqual((lead.first_name, lead.email_normalized), ("first1", "lead1@test.com"))
+        self.assertEqual(Agent.objects.get(pk=self.agent.pk).open_lead_count, 3)
+        self.assertEqual(Category.objects.get(pk=self.category.pk).lead_count, 3)
+        self.assertEqual(search.search_lead_ids(self.organisation, "first2"), [ids[2]])
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_new_leads_are_routed(self):
+        self.organisation.routing_strategy = "round_robin"
+        self.organisation.save()
+        data = self.post(self.new_leads(2))
+        self.assertEqual(
+            list(Lead.objects.filter(pk__in=[result["id"] for result in data["results"]]).values_list("agent", flat=True)),
+            [self.agent.pk, self.agent.pk]
+        )
+
+    def test_update_changes_only_the_given_fields(self):
+        lead = create_leads(self.organisation, 1, agent=self.agent)[0]
+        data = self.post([{"id": lead.pk, "email": "New@Test.com", "category": self.category.pk, "agent": None}])
+        self.assertEqual(data["results"], [{"status": "updated", "id": lead.pk}])
+        updated = Lead.objects.get(pk=lead.pk)
+        self.assertEqual((updated.first_name, updated.email, updated.email_normalized), ("first0", "New@Test.com", "new@test.com"))
+        self.assertEqual((updated.agent_id, updated.category_id), (None, self.category.pk))
+        self.assertGreater(updated.updated_at, lead.updated_at)
+        self.assertEqual(Agent.objects.get(pk=self.agent.pk).open_lead_count, 0)
+        self.assertEqual(Category.objects.get(pk=self.category.pk).lead_count, 1)
+
+    def test_update_many(self):
+        leads = create_leads(self.organisation, 3)
+        data = self.post([
+            {"id": leads[0].pk, "last_name": "a", "phone_number": "+44 20 7946 0000"},
+            {"id": leads[1].pk, "last_name": "b"},
+            {"id": leads[2].pk, "last_name": "last2"},
+        ])
+        self.assertEqual([result["status"] for result in data["results"]], ["updated", "updated", "unchanged"])
+        self.assertEqual(
+            list(Lead.objects.order_by("id").values_list("last_name", "phone_e164")),
+            [("a", "+442079460000"), ("b", "+1700000001"), ("last2", "+1700000002")]
+        )
+        self.assertEqual(Lead.objects.get(pk=leads[2].pk).updated_at, leads[2].updated_at)
+
+    def test_invalid_items_are_reported_and_the_rest_written(self):
+        lead = create_leads(self.organisation, 1)[0]
+        other = create_leads(create_organisor("other").userprofile, 1)[0]
+        items = self.new_leads(1) + [
+            dict(self.new_leads(1)[0], email="not an email"),
+            dict(self.new_leads(1)[0], agent=12345),
+            {"id": other.pk, "first_name": "stolen"},
+            {"id": lead.pk, "first_name": "once"},
+            {"id": lead.pk, "first_name": "twice"},
+            "not a lead",
+        ]
+        data = self.post(items)
+        self.assertEqual((data["created"], data["updated"], data["failed"]), (1, 1, 5))
+        self.assertEqual([result["status"] for result in data["results"]], ["created", "error", "error", "error", "updated", "error", "error"])
+        self.assertIn("email", data["results"][1]["errors"])
+        self.assertIn("agent", data["results"][2]["errors"])
+        self.assertEqual(Lead.objects.get(pk=other.pk).first_name, "first0")
+        self.assertEqual(Lead.objects.get(pk=lead.pk).first_name, "once")
+
+    def test_queries_do_not_depend_on_the_number_of_leads(self):
+        counts = []
+        for size in (5, 50):
+            leads = create_leads(self.organisation, size)
+            items = self.new_leads(size) + [{"id": lead.pk, "category": self.category.pk} for lead in leads]
+            with CaptureQueriesContext(connection) as queries:
+                self.post(items)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bad_requests(self):
+        self.post({"leads": "nope"}, status=400)
+        self.post([{}] * 5001, status=400)
+        self.client.force_login(self.agent.user)
+        self.post(self.new_leads(1), status=403)
@@ -0,0 +1,22 @@
+from django.test import TestCase
+
+from leads.benchmark import ViewBenchmark, percentile
+
+
+class ViewBenchmarkTest(TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
+
+    def test_run(self):
+        results = ViewBenchmark(requests=3, warmup=1, memory_requests=1, agents=2, categories=2).run(30)
+        self.assertEqual(
+            [row["view"] for row in results],
+            ["lead_list", "lead_detail", "category_list", "category_detail", "agent_list", "lead_search_fuzzy", "lead_create", "assign_agent"]
+        )
+        for row in results:
+            self.assertEqual(row["requests"], 3)
+            self.assertGreater(row["queries"], 0)
@@ -0,0 +1,96 @@
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from leads import caching
+from leads.bulk import bulk_update_leads
+from leads.models import Lead, UserProfile
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+
+class OrganisationCacheTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation)
+
+    def generation(self):
+        return UserProfile.objects.get(pk=self.organisation.pk).cache_generation
+
+    def assertBumps(self, write):
+        before = self.generation()
+        write()
+        self.assertGreater(self.generation(), before)
+
+    def test_writes_bump_the_generation(self):
+        lead = create_leads(self.organisation, 1)[0]
+        self.assertBumps(lambda: create_leads(self.organisation, 1))
+        self.assertBumps(lead.save)
+        self.assertBumps(lead.delete)
+        self.assertBumps(self.agent.save)
+        self.assertBumps(lambda: self.agent.categories.add(self.category))
+        self.assertBumps(lambda: self.category.save())
+        self.assertBumps(lambda: UserProfile.objects.get(pk=self.organisation.pk).save())
+        self.assertBumps(lambda: bulk_update_leads(self.organisation, Lead.objects.all(), "agent", self.agent))
+
+        other = create_organisor("other").userprofile
+        before = self.generation()
+        create_leads(other, 1)
+        self.assertEqual(self.generation(), before)
+
+    def test_user_changes_bump_the_generation(self):
+        self.assertBumps(self.user.save)
+        self.assertBumps(self.agent.user.save)
+        before = self.generation()
+        self.agent.user.save(update_fields=["last_login"])
+        self.assertEqual(self.generation(), before)
+
+    def test_agent_list_shows_a_changed_email(self):
+        self.client.force_login(self.user)
+        url = reverse("agents:agent-list")
+        self.assertContains(self.client.get(url), "agent@test.com")
+        self.agent.user.email = "renamed@test.com"
+        self.agent.user.save()
+        response = self.client.get(url)
+        self.assertContains(response, "renamed@test.com")
+        self.assertNotContains(response, "agent@test.com")
+
+    def test_new_organisations_start_on_different_generations(self):
+        other = create_organisor("other").userprofile
+        self.assertNotEqual(other.cache_generation, self.organisation.cache_generation)
+
+    def test_get_or_set(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return None
+
+        self.assertIsNone(caching.get_or_set(self.organisation, "thing", compute))
+        self.assertIsNone(caching.get_or_set(self.organisation, "thing", compute))
+        self.assertEqual(len(calls), 1)
+        caching.bump(self.organisation.pk)
+        self.organisation.refresh_from_db()
+        caching.get_or_set(self.organisation, "thing", compute)
+        self.assertEqual(len(calls), 2)
+
+    def test_views_are_served_from_the_cache_until_a_write(self):
+        create_leads(self.organisation, 3, category=self.category)
+        self.client.force_login(self.user)
+        #the session and the user, plus the bulk action form's choices on the lead list
+        for url, queries in [
+            (reverse("leads:lead-list"), 4),
+            (reverse("leads:category-list"), 2),
+            (reverse("leads:category-detail", kwargs={"pk": self.category.pk}), 3),
+            (reverse("agents:agent-list"), 2),
+        ]:
+            self.client.get(url)
+            with self.assertNumQueries(queries):
+                self.client.get(url)
+
+        response = self.client.get(reverse("leads:category-list"))
+        self.assertEqual(response.context["unassigned_leads_count"], 0)
+        create_leads(self.organisation, 2)
+        response = self.client.get(reverse("leads:category-list"))
+        self.assertEqual(response.context["unassigned_leads_count"], 2)
@@ -0,0 +1,92 @@
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from leads.models import Category
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+
+class ConditionalGetTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation)
+        self.leads = create_leads(self.organisation, 3, agent=self.agent, category=self.category)
+        self.login(self.user)
+
+    def login(self, user):
+        self.client.force_login(user)
+        #pages with forms hand out a CSRF cookie on the first visit, and the ETag covers it
+        self.client.get(reverse("leads:lead-list"))
+
+    def revalidate(self, url, **headers):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("no-cache", response["Cache-Control"])
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"], **headers)
+
+    def test_unchanged_pages_are_not_modified(self):
+        urls = [
+            reverse("leads:lead-list"),
+            reverse("leads:lead-details", kwargs={"pk": self.leads[0].pk}),
+            reverse("leads:category-list"),
+            reverse("leads:category-detail", kwargs={"pk": self.category.pk}),
+            reverse("agents:agent-list"),
+            reverse("agents:agent-detail", kwargs={"pk": self.agent.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b"")
+
+    def test_not_modified_skips_the_page_queries(self):
+        url = reverse("leads:lead-list")
+        etag = self.client.get(url)["ETag"]
+        #the session and the user with their organisation
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_writes_change_the_etag(self):
+        url = reverse("leads:lead-list")
+        etag = self.client.get(url)["ETag"]
+        self.leads[0].first_name = "changed"
+        self.leads[0].save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "changed")
+
+    def test_etags_differ_between_users(self):
+        url = reverse("leads:lead-list")
+        etag = self.client.get(url)["ETag"]
+        self.login(self.agent.user)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_lead_detail_validates_against_the_lead(self):
+        lead = self.leads[0]
+        url = reverse("leads:lead-details", kwargs={"pk": lead.pk})
+        response = self.client.get(url)
+        self.assertIn("Last-Modified", response)
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]).status_code, 304
+        )
+        #writes to other leads leave it alone
+        self.leads[1].save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 304)
+        lead.description = "changed"
+        lead.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"]).status_code, 200)
+
+    def test_pages_with_messages_are_rendered(self):
+        url = reverse("leads:lead-list")
+        etag = self.client.get(url)["ETag"]
+        self.client.post(reverse("leads:lead-bulk-action"), {"action": "assign", "leads": []})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_counter_updates_touch_updated_at(self):
+        before = self.category.updated_at
+        create_leads(self.organisation, 1, category=self.category)
+        self.assertGreater(Category.objects.get(pk=self.category.pk).updated_at, before)
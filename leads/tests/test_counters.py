@@ -0,0 +1,58 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from leads.models import Lead, Agent, Category
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+
+class LeadCountersTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation, "agent1")
+        self.other_agent = create_agent(self.organisation, "agent2")
+        self.category = create_category(self.organisation, "New")
+        self.other_category = create_category(self.organisation, "Contacted")
+        self.client.force_login(self.user)
+
+    def assertCounts(self, agent, other_agent, category, other_category):
+        self.assertEqual(Agent.objects.get(pk=self.agent.pk).open_lead_count, agent)
+        self.assertEqual(Agent.objects.get(pk=self.other_agent.pk).open_lead_count, other_agent)
+        self.assertEqual(Category.objects.get(pk=self.category.pk).lead_count, category)
+        self.assertEqual(Category.objects.get(pk=self.other_category.pk).lead_count, other_category)
+
+    def test_views_keep_counters_in_sync(self):
+        self.client.post(reverse("leads:lead-create"), {
+            "first_name": "Joe", "last_name": "Soap", "age": 30, "agent": self.agent.pk,
+            "description": "description", "phone_number": "0700", "email": "joe@test.com",
+        })
+        lead = Lead.objects.get(first_name="Joe")
+        self.assertCounts(1, 0, 0, 0)
+
+        self.client.post(reverse("leads:assign-agent", kwargs={"pk": lead.pk}), {"agent": self.other_agent.pk})
+        self.assertCounts(0, 1, 0, 0)
+
+        self.client.post(reverse("leads:lead-category-update", kwargs={"pk": lead.pk}), {"category": self.category.pk})
+        self.assertCounts(0, 1, 1, 0)
+
+        self.client.post(reverse("leads:lead-category-update", kwargs={"pk": lead.pk}), {"category": self.other_category.pk})
+        self.assertCounts(0, 1, 0, 1)
+
+        self.client.post(reverse("leads:lead-delete", kwargs={"pk": lead.pk}))
+        self.assertCounts(0, 0, 0, 0)
+
+    def test_recount_reports_and_fixes_drift(self):
+        create_leads(self.organisation, 3, agent=self.agent, category=self.category)
+        Category.objects.filter(pk=self.category.pk).update(lead_count=7)
+
+        out = StringIO()
+        call_command("recount_leads", "--dry-run", stdout=out)
+        self.assertIn("stored 7, actual 3", out.getvalue())
+        self.assertEqual(Category.objects.get(pk=self.category.pk).lead_count, 7)
+
+        call_command("recount_leads", stdout=StringIO())
+        self.assertCounts(3, 0, 3, 0)
@@ -0,0 +1,111 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from leads import duplicates
+from leads.bulk import bulk_create_leads
+from leads.models import Lead, Agent, Category
+from leads.normalization import normalize_email, normalize_phone
+from .helpers import create_organisor, create_agent, create_category
+
+
+class NormalizationTest(TestCase):
+
+    def test_email(self):
+        self.assertEqual(normalize_email(" Maria.Garcia+crm@Example.COM "), "maria.garcia@example.com")
+        self.assertEqual(normalize_email("not an email"), "not an email")
+        self.assertEqual(normalize_email(""), "")
+
+    def test_phone(self):
+        self.assertEqual(normalize_phone("+1 (555) 010-2030"), "+15550102030")
+        self.assertEqual(normalize_phone("001 555 010 2030"), "+15550102030")
+        self.assertEqual(normalize_phone("555-010-2030"), "+15550102030")
+        self.assertEqual(normalize_phone("07700 900123", country_code="44"), "+447700900123")
+        self.assertEqual(normalize_phone("12"), "")
+        self.assertEqual(normalize_phone(""), "")
+
+    def test_lead_columns_follow_writes(self):
+        organisation = create_organisor().userprofile
+        lead = Lead.objects.create(
+            first_name="Maria", organisation=organisation, agent=None, description="",
+            email="Maria@Example.com", phone_number="555 010 2030"
+        )
+        self.assertEqual((lead.email_normalized, lead.phone_e164), ("maria@example.com", "+15550102030"))
+        lead.email = "MARIA+x@example.org"
+        lead.save(update_fields=["email"])
+        lead.refresh_from_db()
+        self.assertEqual(lead.email_normalized, "maria@example.org")
+        bulk_create_leads([Lead(organisation=organisation, agent=None, email="A@B.com", phone_number="")])
+        self.assertEqual(Lead.objects.latest("id").email_normalized, "a@b.com")
+
+
+class DuplicateTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation)
+        self.maria = self.lead("Maria", "maria@example.com", "555 010 2030")
+        self.maria_tagged = self.lead("Maria", "Maria+crm@example.com", "", agent=self.agent)
+        self.maria_phone = self.lead("M", "mg@work.example.com", "+1 555-010-2030", category=self.category)
+        self.jon = self.lead("Jon", "jon@example.com", "555 999 0000")
+        other = create_organisor("other").userprofile
+        Lead.objects.create(organisation=other, agent=None, description="", email="maria@example.com")
+
+    def lead(self, first_name, email, phone_number, **kwargs):
+        kwargs.setdefault("agent", None)
+        return Lead.objects.create(
+            first_name=first_name, last_name="Garcia", organisation=self.organisation, description="",
+            email=email, phone_number=phone_number, **kwargs
+        )
+
+    def test_find_duplicates(self):
+        group = [self.maria.pk, self.maria_tagged.pk, self.maria_phone.pk]
+        self.assertEqual(duplicates.find_duplicates(self.organisation), [group])
+        self.assertEqual(duplicates.find_duplicates(self.organisation, keys=["phone"]), [[self.maria.pk, self.maria_phone.pk]])
+        self.assertEqual(duplicates.find_duplicates(self.organisation, keys=["email"], max_bucket_size=1), [])
+        name_groups = duplicates.find_duplicates(self.organisation, keys=["name"])
+        self.assertEqual(name_groups, [[self.maria.pk, self.maria_tagged.pk]])
+
+    def test_merge(self):
+        survivor = duplicates.merge_group(
+            self.organisation, [self.maria.pk, self.maria_tagged.pk, self.maria_phone.pk]
+        )
+        self.assertEqual(survivor.pk, self.maria.pk)
+        self.assertEqual(list(Lead.objects.filter(organisation=self.organisation).order_by("id")), [self.maria, self.jon])
+        survivor.refresh_from_db()
+        self.assertEqual((survivor.agent, survivor.category), (self.agent, self.category))
+        self.assertEqual(Agent.objects.get().open_lead_count, 1)
+        self.assertEqual(Category.objects.get().lead_count, 1)
+        with self.assertRaises(duplicates.MergeError):
+            duplicates.merge_group(self.organisation, [self.maria.pk, self.maria_tagged.pk])
+
+    def test_merge_command(self):
+        output = StringIO()
+        call_command("find_duplicate_leads", organisation="organisor", stdout=output)
+        self.assertIn("Found 1 group(s)", output.getvalue())
+        call_command("find_duplicate_leads", organisation="organisor", merge=True, stdout=output)
+        self.assertIn("Merged 1 group(s), removed 2 lead(s).", output.getvalue())
+        self.assertEqual(duplicates.find_duplicates(self.organisation), [])
+
+    def test_view(self):
+        url = reverse("leads:lead-duplicates")
+        self.client.force_login(self.agent.user)
+        self.assertRedirects(self.client.get(url), reverse("leads:lead-list"), fetch_redirect_response=False)
+
+        self.client.force_login(self.user)
+        response = self.client.get(url)
+        self.assertEqual(response.context["groups"], [[self.maria, self.maria_tagged, self.maria_phone]])
+
+        other_lead = Lead.objects.get(organisation__user__username="other")
+        response = self.client.post(url, {"survivor": self.maria.pk, "leads": [self.maria.pk, other_lead.pk]})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Lead.objects.filter(pk=other_lead.pk).exists())
+
+        response = self.client.post(url, {"survivor": self.maria_phone.pk, "leads": [self.maria.pk, self.maria_phone.pk]})
+        self.assertRedirects(response, url)
+        self.assertFalse(Lead.objects.filter(pk=self.maria.pk).exists())
+        self.assertEqual(Lead.objects.get(pk=self.maria_phone.pk).first_name, "M")
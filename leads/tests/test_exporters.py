@@ -0,0 +1,37 @@
+import csv
+import io
+import json
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+
+class LeadExportTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        organisation = self.user.userprofile
+        create_leads(organisation, 2, agent=create_agent(organisation), category=create_category(organisation))
+        create_leads(create_organisor("other").userprofile, 1)
+        self.client.force_login(self.user)
+
+    def test_csv_export(self):
+        response = self.client.get(reverse("leads:lead-export"))
+        self.assertTrue(response.streaming)
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0]["agent_email"], "agent@test.com")
+        self.assertEqual(rows[0]["category"], "New")
+
+    def test_ndjson_export(self):
+        response = self.client.get(reverse("leads:lead-export"), {"format": "ndjson"})
+        rows = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row["email"] for row in rows], ["lead0@test.com", "lead1@test.com"])
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command("export_leads", "--organisation", "organisor", "--format", "ndjson", stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 2)
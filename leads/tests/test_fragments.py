@@ -0,0 +1,55 @@
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from leads import caching
+from leads.bulk import bulk_update_leads
+from leads.models import Lead
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+
+class LeadFragmentCacheTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation)
+        self.leads = create_leads(self.organisation, 3, agent=self.agent, category=self.category)
+        self.unassigned = create_leads(self.organisation, 2)
+        self.client.force_login(self.user)
+        caching.fragment_stats.reset()
+
+    def get_list(self):
+        #a write elsewhere in the organisation, so the page itself isn't served from the cache
+        caching.bump(self.organisation.pk)
+        return self.client.get(reverse("leads:lead-list"))
+
+    def test_unchanged_rows_are_served_from_the_cache(self):
+        self.get_list()
+        self.assertEqual((caching.fragment_stats.hits, caching.fragment_stats.misses), (0, 5))
+        response = self.get_list()
+        self.assertEqual((caching.fragment_stats.hits, caching.fragment_stats.misses), (5, 5))
+        self.assertEqual(caching.fragment_stats.hit_rate, 0.5)
+        self.assertContains(response, self.leads[0].email)
+
+    def test_changed_leads_render_again(self):
+        self.get_list()
+        lead = self.leads[0]
+        lead.email = "changed@test.com"
+        lead.save(update_fields=["email"])
+        bulk_update_leads(self.organisation, Lead.objects.filter(pk=self.unassigned[0].pk), "category", self.category)
+        caching.fragment_stats.reset()
+
+        response = self.get_list()
+        self.assertEqual((caching.fragment_stats.hits, caching.fragment_stats.misses), (3, 2))
+        self.assertContains(response, "changed@test.com")
+
+    def test_category_rename_changes_rows(self):
+        self.category.name = "Contacted"
+        self.category.save()
+        self.assertContains(self.get_list(), "Contacted")
+        self.category.name = "Converted"
+        self.category.save()
+        response = self.get_list()
+        self.assertNotContains(response, "Contacted")
+        self.assertContains(response, "Converted")
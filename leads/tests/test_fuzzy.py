@@ -0,0 +1,90 @@
+from django.db import connection
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from leads import caching, fuzzy
+from leads.bulk import bulk_create_leads
+from leads.models import Lead
+from .helpers import create_organisor, create_agent, create_leads
+
+
+class FuzzySearchTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.lead = Lead.objects.create(
+            first_name="Priya", last_name="Sharma", organisation=self.organisation, agent=self.agent,
+            description="", phone_number="0700123456", email="priya.sharma@example.com"
+        )
+        self.other = Lead.objects.create(
+            first_name="Kwame", last_name="Mensah", organisation=self.organisation, agent=None,
+            description="", phone_number="0700999999", email="kwame@example.com"
+        )
+        create_leads(create_organisor("other").userprofile, 1, first_name="Priya", last_name="Sharma")
+
+    def ids(self, text, **kwargs):
+        return fuzzy.fuzzy_search_lead_ids(self.organisation, text, **kwargs)
+
+    def test_finds_misspellings_in_organisation(self):
+        self.assertEqual(self.ids("priay sharma"), [self.lead.pk])
+        self.assertEqual(self.ids("Sharam"), [self.lead.pk])
+        self.assertEqual(self.ids("priya.shrama"), [self.lead.pk])
+        self.assertEqual(self.ids("kwame mensha", agent=self.agent), [])
+        self.assertEqual(self.ids("zzzzzz"), [])
+        self.assertEqual(self.ids("pr"), [])
+
+    def test_index_is_scoped_by_organisation(self):
+        other = create_organisor("third").userprofile
+        Lead.objects.filter(pk=self.lead.pk).update(organisation=other)
+        self.assertEqual(self.ids("priay sharma"), [])
+        self.assertEqual(fuzzy.fuzzy_search_lead_ids(other, "priay sharma"), [self.lead.pk])
+
+    def test_tenant_token(self):
+        for pk in (1, 6399, 6400, 123456789):
+            with connection.cursor() as cursor:
+                cursor.execute(f"SELECT {fuzzy.tenant_sql('%s')}", [pk] * 3)
+                self.assertEqual(cursor.fetchone()[0], fuzzy.tenant_token(pk))
+        self.assertEqual(len({fuzzy.tenant_token(pk) for pk in range(1, 20000)}), 19999)
+
+    def test_term_counts_are_cached(self):
+        caching.get_cache().clear()
+        self.assertEqual(fuzzy.rarest_terms(fuzzy.trigrams("shakwa")), ["kwa", "sha"])
+        with self.assertNumQueries(0):
+            self.assertEqual(fuzzy.term_counts(["kwa", "sha"]), {"kwa": 1, "sha": 2})
+        #terms that aren't in the index are looked up again, they may be added
+        with self.assertNumQueries(1):
+            self.assertEqual(fuzzy.term_counts(["kwa", "zzz"]), {"kwa": 1})
+
+    def test_trigram_similarity(self):
+        query = fuzzy.trigrams("sharma")
+        self.assertEqual(fuzzy.similarity(query, "Sharma"), 1.0)
+        self.assertGreater(fuzzy.similarity(query, "Sharman"), fuzzy.similarity(query, "Shah"))
+        self.assertEqual(fuzzy.similarity(query, ""), 0.0)
+
+    def test_cache_is_invalidated_by_writes(self):
+        self.assertEqual(self.ids("mensah"), [self.other.pk])
+        with self.assertNumQueries(0):
+            self.ids("mensah")
+
+        #each write moves the organisation on to a new cache generation, as the next request would see it
+        self.lead.last_name = "Mensah"
+        self.lead.save()
+        self.organisation.refresh_from_db()
+        self.assertEqual(len(self.ids("mensah")), 2)
+
+        bulk_create_leads([Lead(first_name="Ama", last_name="Mensah", organisation=self.organisation, description="")])
+        self.organisation.refresh_from_db()
+        self.assertEqual(len(self.ids("mensah")), 3)
+
+        self.lead.delete()
+        self.organisation.refresh_from_db()
+        self.assertEqual(len(self.ids("mensah")), 2)
+
+    def test_view(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("leads:lead-search"), {"q": "priay", "mode": "fuzzy"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["leads"]), [self.lead])
+        self.assertTrue(response.context["fuzzy"])
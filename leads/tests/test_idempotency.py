@@ -0,0 +1,114 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase
+from django.shortcuts import reverse
+from django.utils import timezone
+
+from leads.models import Lead, OutgoingEmail, IdempotencyKey
+from .helpers import create_organisor, create_agent
+
+
+class IdempotencyKeyTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.client.force_login(self.user)
+        self.lead = {
+            "first_name": "first", "last_name": "last", "age": 30, "email": "lead@test.com",
+            "phone_number": "0700000000", "description": "description", "agent": self.agent.pk,
+        }
+
+    def create(self, key, **fields):
+        return self.client.post(reverse("leads:lead-create"), dict(self.lead, idempotency_key=key, **fields))
+
+    def bulk(self, key, items):
+        return self.client.post(
+            reverse("leads:api-lead-bulk"), json.dumps(items), content_type="application/json",
+            HTTP_IDEMPOTENCY_KEY=key
+        )
+
+    def test_create_form_carries_a_key(self):
+        response = self.client.get(reverse("leads:lead-create"))
+        self.assertRegex(response.content.decode(), r'name="idempotency_key" value="[0-9a-f]{32}"')
+
+    def test_retried_create_makes_one_lead(self):
+        first = self.create("abc")
+        with self.assertNumQueries(3):
+            retry = self.create("abc")
+        self.assertEqual((retry.status_code, retry["Location"]), (302, reverse("leads:lead-list")))
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(first["Location"], retry["Location"])
+        self.assertEqual(Lead.objects.count(), 1)
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+        self.create("def")
+        self.assertEqual(Lead.objects.count(), 2)
+
+    def test_invalid_forms_are_not_remembered(self):
+        self.assertEqual(self.create("abc", email="nonsense").status_code, 200)
+        self.create("abc")
+        self.assertEqual(Lead.objects.count(), 1)
+
+    def test_key_reused_for_another_request(self):
+        self.create("abc")
+        response = self.create("abc", first_name="other")
+        self.assertEqual(response.status_code, 422)
+        self.assertEqual(Lead.objects.count(), 1)
+        #the edited form comes back with an error and a new key to send it with
+        self.assertContains(response, "This form was already sent.", status_code=422)
+        self.assertContains(response, 'value="other"', status_code=422)
+        key = response.context["idempotency_key"]
+        self.assertNotEqual(key, "abc")
+        self.assertEqual(self.create(key, first_name="other").status_code, 302)
+        self.assertEqual(Lead.objects.count(), 2)
+
+        response = self.bulk("def", [self.lead])
+        response = self.bulk("def", [self.lead, self.lead])
+        self.assertEqual(response.status_code, 422)
+        self.assertIn("already used", response.json()["errors"]["__all__"][0])
+
+    def test_key_still_in_progress(self):
+        with mock.patch.object(IdempotencyKey.objects, "create", side_effect=IntegrityError):
+            response = self.bulk("abc", [self.lead])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Lead.objects.count(), 0)
+
+    def test_access_is_checked_before_replaying(self):
+        self.bulk("abc", [self.lead])
+        self.client.force_login(self.agent.user)
+        response = self.bulk("abc", [self.lead])
+        self.assertEqual(response.status_code, 403)
+        self.assertNotIn("Idempotent-Replayed", response)
+        self.client.logout()
+        self.assertEqual(self.bulk("abc", [self.lead]).status_code, 403)
+
+    def test_keys_belong_to_an_organisation(self):
+        self.create("abc")
+        other = create_organisor("other")
+        self.client.force_login(other)
+        self.create("abc", agent=create_agent(other.userprofile, "other-agent").pk)
+        self.assertEqual(Lead.objects.count(), 2)
+
+    def test_retried_bulk_request_replays_the_results(self):
+        first = self.bulk("abc", [self.lead, self.lead])
+        retry = self.bulk("abc", [self.lead, self.lead])
+        self.assertEqual(first.json(), retry.json())
+        self.assertEqual(Lead.objects.count(), 2)
+
+    def test_expired_keys(self):
+        self.create("abc")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.create("abc")
+        self.assertEqual(Lead.objects.count(), 2)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(days=2))
+        self.create("def")
+        call_command("prune_idempotency_keys", stdout=StringIO())
+        self.assertEqual(list(IdempotencyKey.objects.values_list("key", flat=True)), ["def"])
@@ -0,0 +1,71 @@
+import io
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from leads.importers import LeadImporter, read_rows
+from leads.models import Lead, Agent, Category
+from .helpers import create_organisor, create_agent, create_category
+
+CSV = """first_name,last_name,age,description,phone_number,email,agent,category
+Joe,Soap,30,Met at a conference,0700000001,joe@test.com,agent,New
+Jane,Doe,41,Called in,0700000002,jane@test.com,,
+Bad,Email,20,Typo,0700000003,not-an-email,,
+Ghost,Agent,25,Unknown agent,0700000004,ghost@test.com,nobody,
+Sam,Smith,33,Web form,0700000005,sam@test.com,AGENT@test.com,new
+"""
+
+
+class LeadImporterTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation, "New")
+
+    def test_csv_import_reports_bad_rows(self):
+        result = LeadImporter(self.organisation, batch_size=2).run(read_rows(io.StringIO(CSV), "csv"))
+        self.assertEqual(result.created, 3)
+        self.assertEqual([number for number, errors in result.errors], [4, 5])
+        self.assertIn("email", result.errors[0][1])
+        self.assertIn("agent", result.errors[1][1])
+
+        self.assertEqual(Lead.objects.filter(organisation=self.organisation, agent=self.agent).count(), 2)
+        self.assertEqual(Lead.objects.filter(organisation=self.organisation, agent__isnull=True).count(), 1)
+        self.assertEqual(Agent.objects.get(pk=self.agent.pk).open_lead_count, 2)
+        self.assertEqual(Category.objects.get(pk=self.category.pk).lead_count, 2)
+
+    def test_ndjson_import(self):
+        ndjson = (
+            '{"first_name": "Joe", "last_name": "Soap", "age": 30, "description": "x", '
+            '"phone_number": "0700", "email": "joe@test.com"}\n'
+            'not json\n'
+        )
+        result = LeadImporter(self.organisation).run(read_rows(io.StringIO(ndjson), "ndjson"))
+        self.assertEqual(result.created, 1)
+        self.assertEqual(result.errors[0][0], 2)
+
+    def test_errors_are_capped(self):
+        bad = "".join(f"Bad,Email,20,Typo,0700,bad{i},,\n" for i in range(5))
+        result = LeadImporter(self.organisation, max_errors=2).run(read_rows(io.StringIO(CSV + bad), "csv"))
+        self.assertEqual(result.created, 3)
+        self.assertEqual(result.failed, 7)
+        self.assertEqual(len(result.errors), 2)
+        self.assertEqual(result.errors_omitted, 5)
+
+    def test_upload_that_is_not_utf8(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile("leads.csv", CSV.replace("Soap", "Müller").encode("latin-1"))
+        response = self.client.post(reverse("leads:lead-import"), {"file": upload, "format": "csv"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["result"].created, 0)
+        self.assertContains(response, "isn&#x27;t utf-8 text")
+
+    def test_upload_view(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile("leads.csv", CSV.encode())
+        response = self.client.post(reverse("leads:lead-import"), {"file": upload, "format": "csv"})
+        self.assertEqual(response.context["result"].created, 3)
+        self.assertEqual(Lead.objects.count(), 3)
@@ -0,0 +1,60 @@
+from datetime import timedelta
+from smtplib import SMTPException
+
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase
+from django.shortcuts import reverse
+from django.utils import timezone
+
+from leads.mail import queue_mail, process_outbox
+from leads.models import OutgoingEmail
+from .helpers import create_organisor
+
+
+class FailingBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        raise SMTPException("Mail server unavailable")
+
+
+class OutboxTest(TestCase):
+
+    def test_lead_create_queues_email(self):
+        user = create_organisor()
+        self.client.force_login(user)
+        self.client.post(reverse("leads:lead-create"), {
+            "first_name": "Joe", "last_name": "Soap", "age": 30, "agent": "",
+            "description": "description", "phone_number": "0700", "email": "joe@test.com",
+        })
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.filter(status=OutgoingEmail.PENDING).count(), 1)
+
+        self.assertEqual(process_outbox(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, " A lead has been created")
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.SENT)
+
+    def test_password_reset_queues_email(self):
+        create_organisor()
+        self.client.post(reverse("reset-password"), {"email": "organisor@test.com"})
+        self.assertEqual(len(mail.outbox), 0)
+        process_outbox()
+        self.assertEqual(mail.outbox[0].to, ["organisor@test.com"])
+
+    def test_failures_back_off_then_give_up(self):
+        email = queue_mail("Subject", "Body", "from@test.com", ["to@test.com"])
+        with self.settings(OUTBOX_MAX_ATTEMPTS=2):
+            self.assertEqual(process_outbox(connection=FailingBackend()), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual(email.status, OutgoingEmail.PENDING)
+            self.assertGreater(email.next_attempt_at, timezone.now())
+
+            #not due yet
+            self.assertEqual(process_outbox(connection=FailingBackend()), (0, 0))
+
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(process_outbox(connection=FailingBackend()), (0, 1))
+            email.refresh_from_db()
+            self.assertEqual(email.status, OutgoingEmail.FAILED)
+            self.assertIn("Mail server unavailable", email.last_error)
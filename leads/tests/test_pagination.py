@@ -0,0 +1,69 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import reverse
+
+from leads.models import Lead
+from leads.pagination import KeysetPaginator, InvalidCursor
+from .helpers import create_organisor, create_agent, create_leads
+
+
+class KeysetPaginatorTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        create_leads(self.organisation, 7)
+        self.queryset = Lead.objects.filter(organisation=self.organisation)
+
+    def test_pages_forward_and_back(self):
+        paginator = KeysetPaginator(self.queryset, 3)
+        expected = list(self.queryset.order_by("-date_added", "-id"))
+
+        first = paginator.page()
+        second = paginator.page(first.next_cursor)
+        third = paginator.page(second.next_cursor)
+        self.assertEqual(first.object_list + second.object_list + third.object_list, expected)
+        self.assertFalse(first.has_previous())
+        self.assertFalse(third.has_next())
+
+        back = paginator.page(third.previous_cursor)
+        self.assertEqual(back.object_list, second.object_list)
+        self.assertEqual(paginator.page(back.previous_cursor).object_list, first.object_list)
+        self.assertFalse(paginator.page(back.previous_cursor).has_previous())
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(self.queryset, 3).page("not-a-cursor")
+
+    def test_no_count_or_offset(self):
+        paginator = KeysetPaginator(self.queryset, 3)
+        with CaptureQueriesContext(connection) as queries:
+            paginator.page(paginator.page().next_cursor)
+        for query in queries.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"])
+            self.assertNotIn("OFFSET", query["sql"])
+
+
+class LeadListPaginationTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        agent = create_agent(self.user.userprofile)
+        create_leads(self.user.userprofile, 30, agent=agent)
+        create_leads(self.user.userprofile, 12)
+        self.client.force_login(self.user)
+
+    def test_both_panels_are_paginated(self):
+        response = self.client.get(reverse("leads:lead-list"))
+        self.assertEqual(len(response.context["leads"]), 25)
+        self.assertEqual(len(response.context["unassigned_leads"]), 10)
+
+        next_url = reverse("leads:lead-list") + response.context["unassigned_leads"].next_url
+        response = self.client.get(next_url)
+        self.assertEqual(len(response.context["leads"]), 25)
+        self.assertEqual(len(response.context["unassigned_leads"]), 2)
+
+    def test_invalid_cursor_is_404(self):
+        response = self.client.get(reverse("leads:lead-list"), {"cursor": "garbage"})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,31 @@
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from .helpers import QueryBudgetMixin, create_organisor, create_agent, create_category, create_leads
+
+
+class LeadQueryBudgetTest(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation)
+
+    def seed_leads(self, count):
+        create_leads(self.organisation, count, agent=self.agent, category=self.category)
+        create_leads(self.organisation, count)
+
+    def test_lead_list(self):
+        self.client.force_login(self.user)
+        #organisors also get the agents and categories for the bulk action form
+        self.assertQueryBudget(reverse("leads:lead-list"), 7, self.seed_leads)
+
+    def test_lead_list_for_agent(self):
+        self.client.force_login(self.agent.user)
+        self.assertQueryBudget(reverse("leads:lead-list"), 5, self.seed_leads)
+
+    def test_category_detail(self):
+        self.client.force_login(self.user)
+        url = reverse("leads:category-detail", kwargs={"pk": self.category.pk})
+        self.assertQueryBudget(url, 5, self.seed_leads)
@@ -0,0 +1,68 @@
+import re
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import reverse
+
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+TENANT_TABLES = ("leads_lead", "leads_agent", "leads_category")
+FULL_SCAN = re.compile(r"\bSCAN (TABLE )?(?P<table>\w+)\b(?! USING)")
+
+
+class QueryPlanTest(TestCase):
+    """Every org-scoped query the views issue must be answered from an index."""
+
+    def setUp(self):
+        self.user = create_organisor()
+        organisation = self.user.userprofile
+        self.agent = create_agent(organisation)
+        self.category = create_category(organisation)
+        self.lead = create_leads(organisation, 3, agent=self.agent, category=self.category)[0]
+        create_leads(organisation, 3)
+
+    def assertNoFullScans(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            sql = query["sql"]
+            if not sql.startswith("SELECT") or not any(table in sql for table in TENANT_TABLES):
+                continue
+            with connection.cursor() as cursor:
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                plan = [row[-1] for row in cursor.fetchall()]
+            for line in plan:
+                match = FULL_SCAN.search(line)
+                if match and match.group("table") in TENANT_TABLES:
+                    self.fail(f"{url} does a full scan of {match.group('table')}:\n{sql}\n{plan}")
+
+    def test_organisor_views(self):
+        self.client.force_login(self.user)
+        for url in [
+            reverse("leads:lead-list"),
+            reverse("leads:lead-details", kwargs={"pk": self.lead.pk}),
+            reverse("leads:lead-update", kwargs={"pk": self.lead.pk}),
+            reverse("leads:category-list"),
+            reverse("leads:category-detail", kwargs={"pk": self.category.pk}),
+            reverse("leads:lead-duplicates"),
+            reverse("agents:agent-list"),
+            reverse("agents:agent-detail", kwargs={"pk": self.agent.pk}),
+            reverse("leads:api-lead-list"),
+            reverse("leads:api-lead-detail", kwargs={"pk": self.lead.pk}),
+            reverse("leads:api-category-list"),
+            reverse("leads:api-agent-list"),
+        ]:
+            self.assertNoFullScans(url)
+
+    def test_agent_views(self):
+        self.client.force_login(self.agent.user)
+        for url in [
+            reverse("leads:lead-list"),
+            reverse("leads:lead-details", kwargs={"pk": self.lead.pk}),
+            reverse("leads:category-list"),
+            reverse("leads:category-detail", kwargs={"pk": self.category.pk}),
+            reverse("leads:api-lead-list"),
+        ]:
+            self.assertNoFullScans(url)
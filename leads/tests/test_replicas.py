@@ -0,0 +1,149 @@
+import os
+import tempfile
+import time
+from unittest import mock
+
+from django.conf import settings
+from django.db import connections
+from django.db.utils import ConnectionHandler
+from django.shortcuts import reverse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from leads import caching, replicas
+from leads.models import Lead, UserProfile
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+
+@override_settings(LEAD_READ_REPLICAS=["replica"])
+class ReplicaRoutingTest(TransactionTestCase):
+    #TestCase would hold the primary's rows in a transaction the replica connection can't read
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation)
+        self.leads = create_leads(self.organisation, 3, agent=self.agent, category=self.category)
+        self.client.force_login(self.user)
+
+    def get(self, url, status_code=200):
+        """The SQL the request ran on the primary and on the replica."""
+        with CaptureQueriesContext(connections["default"]) as primary:
+            with CaptureQueriesContext(connections["replica"]) as replica:
+                response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code)
+        return [query["sql"] for query in primary], [query["sql"] for query in replica]
+
+    def assertReadsWhoIsAsking(self, primary, replica):
+        tables = ('"django_session"', '"leads_user"', '"leads_userprofile"')
+        self.assertTrue(primary)
+        self.assertTrue(all(any(table in sql for table in tables) for sql in primary), primary)
+        self.assertFalse([sql for sql in replica if 'FROM "django_session"' in sql or 'FROM "leads_user"' in sql])
+
+    def test_read_views_use_the_replica(self):
+        urls = [
+            reverse("leads:lead-list"),
+            reverse("leads:lead-details", kwargs={"pk": self.leads[0].pk}),
+            reverse("leads:category-list"),
+            reverse("leads:category-detail", kwargs={"pk": self.category.pk}),
+            reverse("agents:agent-list"),
+            reverse("agents:agent-detail", kwargs={"pk": self.agent.pk}),
+            reverse("leads:api-lead-list"),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                primary, replica = self.get(url)
+                self.assertReadsWhoIsAsking(primary, replica)
+                self.assertTrue(replica)
+        self.assertIsNone(replicas.current_replica())
+
+    def test_logged_out_sessions_are_not_read_from_the_replica(self):
+        #a lagging replica would still have the session, the old cookie must not get in
+        cookie = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        self.client.get(reverse("logout"))
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = cookie
+        primary, replica = self.get(reverse("leads:lead-list"), status_code=302)
+        self.assertTrue(any('FROM "django_session"' in sql for sql in primary))
+        self.assertEqual(replica, [])
+
+    def test_other_views_use_the_primary(self):
+        primary, replica = self.get(reverse("leads:lead-search") + "?q=first")
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_writes_pin_reads_to_the_primary(self):
+        response = self.client.post(
+            reverse("leads:lead-category-update", kwargs={"pk": self.leads[0].pk}),
+            {"category": self.category.pk, "version": self.leads[0].version},
+        )
+        self.assertEqual(response.status_code, 302)
+        pinned_until = float(response.cookies[replicas.PIN_COOKIE].value)
+        self.assertGreater(pinned_until, time.time())
+
+        primary, replica = self.get(reverse("leads:lead-list"))
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_pin_expires(self):
+        self.client.cookies[replicas.PIN_COOKIE] = str(int(time.time()) - 1)
+        primary, replica = self.get(reverse("leads:lead-list"))
+        self.assertReadsWhoIsAsking(primary, replica)
+        self.assertTrue(replica)
+
+    def test_replica_pages_carry_the_replicas_generation(self):
+        caching.get_cache().clear()
+        organisation = UserProfile.objects.get(pk=self.organisation.pk)
+        url = reverse("leads:category-list")
+        #the replica hasn't caught up with the last write yet
+        with mock.patch("leads.caching.read_generation", return_value=organisation.cache_generation - 1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(caching.get_cache().get(caching.cache_key(organisation, "categories")))
+
+        #once they write, the client's copy of the lagging page must not be confirmed
+        self.client.cookies[replicas.PIN_COOKIE] = str(int(time.time()) + 10)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(caching.get_cache().get(caching.cache_key(organisation, "categories")))
+
+    def test_organisations_missing_from_the_replica_use_the_primary(self):
+        with mock.patch("leads.caching.read_generation", return_value=None):
+            primary, replica = self.get(reverse("leads:lead-list"))
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    @override_settings(LEAD_READ_REPLICAS=[])
+    def test_no_replicas(self):
+        primary, replica = self.get(reverse("leads:lead-list"))
+        self.assertTrue(primary)
+        self.assertEqual(replica, [])
+
+    def test_router(self):
+        router = replicas.ReplicaRouter()
+        self.assertEqual(router.db_for_write(Lead), "default")
+        self.assertIsNone(router.db_for_read(Lead))
+        self.assertFalse(router.allow_migrate("replica", "leads"))
+        self.assertIsNone(router.allow_migrate("default", "leads"))
+
+
+class ReplicaSyncTest(TestCase):
+
+    def test_sync_copies_the_primary(self):
+        with tempfile.TemporaryDirectory() as directory:
+            databases = ConnectionHandler({
+                alias: {"ENGINE": "leads.sqlite_backend", "NAME": os.path.join(directory, f"{alias}.sqlite3")}
+                for alias in ("default", "replica")
+            })
+            try:
+                with databases["default"].cursor() as cursor:
+                    cursor.execute("CREATE TABLE synced (value TEXT)")
+                    cursor.execute("INSERT INTO synced VALUES ('copied')")
+                with mock.patch("leads.replicas.connections", databases):
+                    replicas.sync("replica")
+                with databases["replica"].cursor() as cursor:
+                    cursor.execute("SELECT value FROM synced")
+                    self.assertEqual(cursor.fetchall(), [("copied",)])
+            finally:
+                databases.close_all()
@@ -0,0 +1,115 @@
+import io
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from leads import routing
+from leads.api import LeadBatchWriter
+from leads.importers import LeadImporter, read_rows
+from leads.models import Lead, Agent, UserProfile
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+
+class RoutingTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agents = [create_agent(self.organisation, f"agent{i}") for i in range(3)]
+        self.category = create_category(self.organisation)
+
+    def loads(self):
+        return list(Agent.objects.order_by("id").values_list("open_lead_count", flat=True))
+
+    def route(self, name, **kwargs):
+        return routing.route_unassigned(UserProfile.objects.get(pk=self.organisation.pk), name, **kwargs)
+
+    def test_strategy_choices_match_model(self):
+        choices = {name for name, label in UserProfile.ROUTING_STRATEGY_CHOICES if name}
+        self.assertEqual(choices, set(routing.STRATEGIES))
+
+    def test_round_robin_carries_on_between_runs(self):
+        create_leads(self.organisation, 4)
+        self.assertEqual(self.route("round_robin", batch_size=3), 4)
+        self.assertEqual(self.loads(), [2, 1, 1])
+        create_leads(self.organisation, 2)
+        self.route("round_robin")
+        self.assertEqual(self.loads(), [2, 2, 2])
+
+    def test_least_loaded(self):
+        create_leads(self.organisation, 5, agent=self.agents[0])
+        create_leads(self.organisation, 1, agent=self.agents[1])
+        create_leads(self.organisation, 6)
+        self.assertEqual(self.route("least_loaded"), 6)
+        self.assertEqual(self.loads(), [5, 4, 3])
+        self.assertFalse(Lead.objects.filter(agent__isnull=True).exists())
+
+    def test_category_affinity(self):
+        self.agents[2].categories.add(self.category)
+        create_leads(self.organisation, 3, category=self.category)
+        create_leads(self.organisation, 2)
+        self.route("category_affinity")
+        self.assertEqual(Lead.objects.filter(category=self.category, agent=self.agents[2]).count(), 3)
+        self.assertEqual(self.loads(), [1, 1, 3])
+
+    def test_queries_do_not_grow_with_leads(self):
+        create_leads(self.organisation, 40)
+        organisation = UserProfile.objects.get(pk=self.organisation.pk)
+        with self.assertNumQueries(10):
+            routing.route_unassigned(organisation, "least_loaded")
+
+    def test_new_leads_are_routed(self):
+        UserProfile.objects.filter(pk=self.organisation.pk).update(routing_strategy="round_robin")
+        self.client.force_login(self.user)
+        for number in range(2):
+            self.client.post(reverse("leads:lead-create"), {
+                "first_name": "Joe", "last_name": f"Soap{number}", "age": 30, "agent": "",
+                "description": "New", "phone_number": "0700000000", "email": "joe@test.com",
+            })
+        self.assertEqual(self.loads(), [1, 1, 0])
+
+        csv = "first_name,last_name,age,description,phone_number,email\n" + "Jo,Bloggs,30,x,0700,jo@test.com\n" * 4
+        LeadImporter(UserProfile.objects.get(pk=self.organisation.pk)).run(read_rows(io.StringIO(csv), "csv"))
+        self.assertEqual(self.loads(), [2, 2, 2])
+
+    def test_round_robin_reads_the_cursor_when_writing(self):
+        UserProfile.objects.filter(pk=self.organisation.pk).update(routing_strategy="round_robin")
+        organisation = UserProfile.objects.get(pk=self.organisation.pk)
+        strategy = routing.get_strategy(organisation)
+        writer = LeadBatchWriter(organisation)
+        importer = LeadImporter(organisation)
+        #another request routes a lead to the first agent after these were set up
+        UserProfile.objects.filter(pk=self.organisation.pk).update(routing_cursor=self.agents[0].pk)
+
+        lead = Lead(organisation=self.organisation, agent=None)
+        routing.route_new_leads(strategy, [lead])
+        self.assertEqual(lead.agent_id, self.agents[1].pk)
+
+        row = {"first_name": "Jo", "last_name": "Bloggs", "age": 30, "email": "jo@test.com",
+               "phone_number": "0700", "description": "x"}
+        result = writer.run([row])[0]
+        self.assertEqual(Lead.objects.get(pk=result["id"]).agent, self.agents[2])
+
+        csv = "first_name,last_name,age,description,phone_number,email\nJo,Bloggs,30,x,0700,jo@test.com\n"
+        importer.run(read_rows(io.StringIO(csv), "csv"))
+        self.assertEqual(Lead.objects.latest("id").agent, self.agents[0])
+
+    def test_view_and_command(self):
+        create_leads(self.organisation, 3)
+        self.client.force_login(self.user)
+        url = reverse("leads:lead-routing")
+        self.assertEqual(self.client.get(url).context["unassigned_count"], 3)
+        response = self.client.post(url, {"routing_strategy": "", "route": "1"})
+        self.assertTrue(response.context["form"].errors)
+        response = self.client.post(url, {"routing_strategy": "least_loaded", "route": "1"})
+        self.assertEqual(response.context["routed"], 3)
+        #routing now doesn't change what happens to new leads
+        self.assertEqual(UserProfile.objects.get(pk=self.organisation.pk).routing_strategy, "")
+
+        self.client.post(url, {"routing_strategy": "least_loaded", "save": "1"})
+        create_leads(self.organisation, 3)
+        output = io.StringIO()
+        call_command("route_leads", organisation="organisor", stdout=output)
+        self.assertIn("Routed 3 lead(s).", output.getvalue())
+        self.assertEqual(self.loads(), [2, 2, 2])
@@ -0,0 +1,67 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.shortcuts import reverse
+
+from leads import search
+from leads.bulk import bulk_create_leads
+from leads.models import Lead
+from .helpers import create_organisor, create_agent, create_leads
+
+
+class LeadSearchTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.lead = Lead.objects.create(
+            first_name="Maria", last_name="Garcia", organisation=self.organisation, agent=self.agent,
+            description="Interested in the premium plan", phone_number="0700123456", email="maria@example.com"
+        )
+        Lead.objects.create(
+            first_name="Jon", last_name="Smith", organisation=self.organisation, agent=None,
+            description="Asked about Garcia's account", phone_number="0700999999", email="jon@example.com"
+        )
+        create_leads(create_organisor("other").userprofile, 1, first_name="Maria")
+
+    def ids(self, text, **kwargs):
+        return search.search_lead_ids(self.organisation, text, **kwargs)
+
+    def test_ranks_and_scopes_to_organisation(self):
+        results = self.ids("garcia")
+        self.assertEqual(len(results), 2)
+        self.assertEqual(results[0], self.lead.pk)
+        self.assertEqual(self.ids("mar"), [self.lead.pk])
+        self.assertEqual(self.ids("maria@example.com"), [self.lead.pk])
+        self.assertEqual(self.ids("0700123456"), [self.lead.pk])
+        self.assertEqual(self.ids('"premium('), [self.lead.pk])
+
+    def test_index_follows_writes(self):
+        self.lead.first_name = "Mariana"
+        self.lead.save()
+        self.assertEqual(self.ids("mariana"), [self.lead.pk])
+        Lead.objects.filter(pk=self.lead.pk).update(last_name="Lopez")
+        self.assertEqual(self.ids("lopez"), [self.lead.pk])
+        self.lead.delete()
+        self.assertEqual(self.ids("mariana"), [])
+        bulk_create_leads([Lead(first_name="Zed", organisation=self.organisation, agent=None, description="")])
+        self.assertEqual(len(self.ids("zed")), 1)
+
+    def test_rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {search.FTS_TABLE}({search.FTS_TABLE}) VALUES ('delete-all')")
+        self.assertEqual(self.ids("maria"), [])
+        stdout = StringIO()
+        call_command("rebuild_lead_search_index", stdout=stdout)
+        self.assertIn("Rebuilt the lead search indexes.", stdout.getvalue())
+        self.assertEqual(self.ids("maria"), [self.lead.pk])
+
+    def test_view(self):
+        self.client.force_login(self.agent.user)
+        response = self.client.get(reverse("leads:lead-search"), {"q": "garcia"})
+        #agents only find their own leads
+        self.assertEqual(response.context["leads"], [self.lead])
+        self.assertFalse(response.context["has_next"])
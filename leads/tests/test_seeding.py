@@ -0,0 +1,38 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from leads import counters
+from leads.models import Lead, UserProfile, Agent
+from leads.seeding import DEFAULT_END_DATE
+
+
+class SeedCrmTest(TestCase):
+
+    def seed(self, prefix):
+        call_command(
+            "seed_crm", "--organisations", "2", "--agents", "3", "--leads", "50",
+            "--batch-size", "20", "--prefix", prefix, stdout=StringIO()
+        )
+        return list(
+            Lead.objects.filter(organisation__user__username__startswith=prefix)
+            .order_by("id").values_list("first_name", "email", "date_added", "agent__user__username")
+        )
+
+    def test_seed(self):
+        rows = self.seed("a")
+        self.assertEqual(len(rows), 100)
+        #the generated dates, not the time of seeding
+        self.assertTrue(all(date <= DEFAULT_END_DATE for name, email, date, agent in rows))
+        self.assertEqual(UserProfile.objects.filter(user__username__startswith="a-org").count(), 2)
+        #agents get no profile of their own, as bulk_create skipped the signal
+        self.assertFalse(UserProfile.objects.filter(user__is_agent=True).exists())
+        self.assertEqual(Agent.objects.count(), 6)
+        self.assertEqual(counters.recount(dry_run=True), [])
+
+    def test_deterministic(self):
+        first = self.seed("a")
+        second = self.seed("b")
+        strip = lambda rows: [(name, email, date) for name, email, date, agent in rows]
+        self.assertEqual(strip(first), strip(second))
@@ -0,0 +1,120 @@
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection, transaction
+from django.db.utils import ConnectionHandler
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from leads import sqlite
+from leads.benchmark import ConcurrencyBenchmark
+
+
+class SqlitePragmaTest(TestCase):
+
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_new_connections_get_the_pragmas(self):
+        connection.ensure_connection()
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        self.assertEqual(self.pragma("synchronous"), 1)  # NORMAL
+        self.assertEqual(self.pragma("cache_size"), -64 * 1024)
+        self.assertEqual(self.pragma("temp_store"), 2)  # MEMORY
+
+    def test_apply_pragmas(self):
+        connection.ensure_connection()
+        sqlite.apply_pragmas(connection, {"busy_timeout": 1234})
+        self.assertEqual(self.pragma("busy_timeout"), 1234)
+        sqlite.apply_pragmas(connection, {"busy_timeout": 5000})
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+
+    def test_apply_pragmas_rejects_sql(self):
+        connection.ensure_connection()
+        with self.assertRaises(ValueError):
+            sqlite.apply_pragmas(connection, {"busy_timeout": "1; DROP TABLE leads_lead"})
+        with self.assertRaises(ValueError):
+            sqlite.apply_pragmas(connection, {"busy_timeout = 1; --": 1})
+
+    def test_journal_mode_is_not_set_per_connection(self):
+        connection.ensure_connection()
+        with self.assertRaises(ValueError):
+            sqlite.apply_pragmas(connection, {"journal_mode": "wal"})
+
+    @override_settings(SQLITE_TRANSACTION_MODE="sometimes", SQLITE_JOURNAL_MODE="sometimes")
+    def test_unknown_modes(self):
+        with self.assertRaises(ValueError):
+            sqlite.get_transaction_mode()
+        with self.assertRaises(ValueError):
+            sqlite.get_journal_mode()
+
+
+class SqliteJournalModeTest(TestCase):
+
+    def test_set_journal_mode(self):
+        with tempfile.TemporaryDirectory() as directory:
+            databases = ConnectionHandler({
+                "default": {"ENGINE": "leads.sqlite_backend", "NAME": os.path.join(directory, "db.sqlite3")},
+            })
+            try:
+                database = databases["default"]
+                #connecting leaves the file alone
+                with database.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], "delete")
+                stdout = StringIO()
+                with mock.patch("leads.management.commands.set_journal_mode.connections", databases):
+                    call_command("set_journal_mode", stdout=stdout)
+                    self.assertIn("default is in wal mode.", stdout.getvalue())
+                    with self.assertRaises(CommandError):
+                        call_command("set_journal_mode", "sometimes", stdout=stdout)
+                database.close()
+                with databases["default"].cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], "wal")
+            finally:
+                databases.close_all()
+
+
+class SqliteTransactionModeTest(TransactionTestCase):
+
+    def begins(self, block):
+        with CaptureQueriesContext(connection) as captured:
+            with block():
+                pass
+        return [query["sql"] for query in captured if query["sql"].startswith("BEGIN")]
+
+    def test_transactions_begin_deferred(self):
+        self.assertEqual(self.begins(transaction.atomic), ["BEGIN DEFERRED"])
+
+    def test_atomic_write_begins_immediate(self):
+        self.assertEqual(self.begins(sqlite.atomic_write), ["BEGIN IMMEDIATE"])
+        #only for its own transaction
+        self.assertEqual(self.begins(transaction.atomic), ["BEGIN DEFERRED"])
+        with transaction.atomic():
+            self.assertEqual(self.begins(sqlite.atomic_write), [])
+
+    @override_settings(SQLITE_TRANSACTION_MODE="IMMEDIATE")
+    def test_transaction_mode_setting(self):
+        self.assertEqual(self.begins(transaction.atomic), ["BEGIN IMMEDIATE"])
+
+
+class ConcurrencyBenchmarkTest(TestCase):
+
+    def test_summarise(self):
+        outcomes = [
+            {"reads": [10, 20], "writes": [5], "errors": {}},
+            {"reads": [30], "writes": [], "errors": {"OperationalError: database is locked": 2}},
+        ]
+        row = ConcurrencyBenchmark(seconds=2).summarise("tuned", 2, outcomes)
+        self.assertEqual(row["reads_per_s"], 1.5)
+        self.assertEqual(row["writes_per_s"], 0.5)
+        self.assertEqual(row["read_p95_ms"], 30)
+        self.assertEqual(row["write_p95_ms"], 5)
+        self.assertEqual(row["errors"], 2)
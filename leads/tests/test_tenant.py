@@ -0,0 +1,36 @@
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import reverse
+
+from .helpers import create_organisor, create_agent, create_leads
+
+
+class TenantContextTest(TestCase):
+    """The user's profile, agent and organisation come from the session user query."""
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.agent = create_agent(self.user.userprofile)
+        create_leads(self.user.userprofile, 2, agent=self.agent)
+
+    def assertNoTenantLookups(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        for query in queries.captured_queries:
+            #the page may list agents, but must not look up the user's own profile or agent
+            self.assertNotIn('WHERE "leads_userprofile"."user_id" =', query["sql"])
+            self.assertNotIn('WHERE "leads_agent"."user_id" =', query["sql"])
+        return response
+
+    def test_organisor(self):
+        self.client.force_login(self.user)
+        response = self.assertNoTenantLookups(reverse("leads:lead-list"))
+        self.assertEqual(response.wsgi_request.organisation, self.user.userprofile)
+
+    def test_agent(self):
+        self.client.force_login(self.agent.user)
+        response = self.assertNoTenantLookups(reverse("leads:lead-list"))
+        self.assertEqual(response.wsgi_request.organisation, self.user.userprofile)
+        self.assertEqual(len(response.context["leads"]), 2)
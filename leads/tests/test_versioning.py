@@ -0,0 +1,158 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.messages import get_messages
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.shortcuts import reverse
+
+from leads.bulk import bulk_update_leads
+from leads.models import Lead, VersionConflict
+from leads.views import LeadCategoryUpdateView
+from .helpers import create_organisor, create_agent, create_category, create_leads
+
+
+class LeadVersionTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.agent = create_agent(self.organisation)
+        self.category = create_category(self.organisation)
+        self.lead = create_leads(self.organisation, 1, agent=self.agent)[0]
+        self.client.force_login(self.user)
+
+    def update(self, version, **fields):
+        data = {
+            "first_name": "first0", "last_name": "last0", "age": 0, "agent": self.agent.pk,
+            "description": "description", "phone_number": "0700000000", "email": "lead0@test.com",
+            "version": version,
+        }
+        data.update(fields)
+        return self.client.post(reverse("leads:lead-update", kwargs={"pk": self.lead.pk}), data)
+
+    def test_every_write_bumps_the_version(self):
+        self.assertEqual(self.lead.version, 1)
+        self.lead.save()
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).version, 2)
+        self.lead.description = "changed"
+        self.lead.save(update_fields=["description"])
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).version, 3)
+        bulk_update_leads(self.organisation, Lead.objects.all(), "category", self.category)
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).version, 4)
+
+    def test_unversioned_saves_bump_the_stored_version(self):
+        stale = Lead.objects.get(pk=self.lead.pk)
+        self.lead.save()
+        stale.save()
+        self.assertEqual(stale.version, 3)
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).version, 3)
+
+    def test_new_leads_with_a_pk_are_inserted(self):
+        lead = Lead(
+            pk=self.lead.pk + 100, first_name="given", organisation=self.organisation, agent=None,
+            description="", phone_number="0700000000", email="given@test.com"
+        )
+        lead.save()
+        self.assertEqual((Lead.objects.get(pk=lead.pk).first_name, lead.version), ("given", 1))
+
+        fixture = [{
+            "model": "leads.lead", "pk": self.lead.pk + 200,
+            "fields": {
+                "first_name": "fixture", "last_name": "lead", "age": 30, "organisation": self.organisation.pk,
+                "agent": None, "description": "", "phone_number": "0700000000", "email": "fixture@test.com",
+                "date_added": "2020-01-01T00:00:00Z", "updated_at": "2020-01-01T00:00:00Z", "version": 1,
+            },
+        }]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "leads.json")
+            with open(path, "w") as file:
+                json.dump(fixture, file)
+            call_command("loaddata", path, stdout=StringIO())
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk + 200).first_name, "fixture")
+
+    def test_expected_version_is_checked_in_the_update(self):
+        stale = Lead.objects.get(pk=self.lead.pk)
+        self.lead.save()
+        stale.expect_version(1)
+        with CaptureQueriesContext(connection) as queries, self.assertRaises(VersionConflict):
+            stale.save()
+        self.assertIn('"leads_lead"."version" = 1', [query["sql"] for query in queries if query["sql"].startswith("UPDATE")][0])
+        #the expectation only applies to one save
+        stale.save()
+
+    def test_form_carries_the_version(self):
+        response = self.client.get(reverse("leads:lead-update", kwargs={"pk": self.lead.pk}))
+        self.assertContains(response, '<input type="hidden" name="version" value="1"', html=False)
+
+    def test_update(self):
+        response = self.update(1, first_name="mine")
+        self.assertRedirects(response, reverse("leads:lead-list"))
+        lead = Lead.objects.get(pk=self.lead.pk)
+        self.assertEqual((lead.first_name, lead.version), ("mine", 2))
+
+    def test_conflicting_update_is_shown_to_the_user(self):
+        theirs = Lead.objects.get(pk=self.lead.pk)
+        theirs.first_name = "theirs"
+        theirs.save()
+
+        response = self.update(1, first_name="mine")
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "Someone else changed this lead")
+        self.assertEqual(response.context["conflicts"], [("First name", "theirs")])
+        self.assertEqual(response.context["form"]["version"].value(), 2)
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).first_name, "theirs")
+
+        self.assertRedirects(self.update(2, first_name="mine"), reverse("leads:lead-list"))
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).first_name, "mine")
+
+    def test_bulk_changes_conflict_too(self):
+        bulk_update_leads(self.organisation, Lead.objects.all(), "agent", None)
+        response = self.update(1)
+        self.assertEqual(response.context["conflicts"], [("Agent", None)])
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).agent_id, None)
+
+    def test_category_update_conflict(self):
+        url = reverse("leads:lead-category-update", kwargs={"pk": self.lead.pk})
+        self.lead.save()
+        response = self.client.post(url, {"category": self.category.pk, "version": 1})
+        self.assertContains(response, "Someone else changed this lead")
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).category_id, None)
+        self.client.post(url, {"category": self.category.pk, "version": 2})
+        self.assertEqual(Lead.objects.get(pk=self.lead.pk).category_id, self.category.pk)
+
+    def deleted_after_loading(self, view):
+        get_object = view.get_object
+
+        def get_object_then_delete(view, queryset=None):
+            lead = get_object(view, queryset)
+            Lead.objects.filter(pk=lead.pk).delete()
+            return lead
+        return mock.patch.object(view, "get_object", get_object_then_delete)
+
+    def test_lead_deleted_while_editing(self):
+        url = reverse("leads:lead-category-update", kwargs={"pk": self.lead.pk})
+        with self.deleted_after_loading(LeadCategoryUpdateView):
+            response = self.client.post(url, {"category": self.category.pk, "version": 1})
+        self.assertRedirects(response, reverse("leads:lead-list"), fetch_redirect_response=False)
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         ["Someone else deleted this lead while you were editing it."])
+        self.assertFalse(Lead.objects.exists())
+
+        self.lead = create_leads(self.organisation, 1, agent=self.agent)[0]
+        Lead.objects.filter(pk=self.lead.pk).delete()
+        self.assertEqual(self.update(1).status_code, 404)
+
+    def test_lead_deleted_while_assigning(self):
+        url = reverse("leads:assign-agent", kwargs={"pk": self.lead.pk})
+        lead = Lead.objects.get(pk=self.lead.pk)
+        with mock.patch("leads.views.get_object_or_404", return_value=lead):
+            Lead.objects.filter(pk=self.lead.pk).delete()
+            response = self.client.post(url, {"agent": self.agent.pk})
+        self.assertRedirects(response, reverse("leads:lead-list"), fetch_redirect_response=False)
+        self.assertFalse(Lead.objects.exists())
@@ -1,6 +1,10 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.shortcuts import reverse
 
+from .helpers import create_organisor, create_category, create_leads
+
 # Create your tests here.
 class LandingPageTest(TestCase):   
 
@@ -11,3 +15,49 @@ class LandingPageTest(TestCase):
         self.assertTemplateUsed(response, "landing.html")
 
 
+
+class CategoryListViewTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.client.force_login(self.user)
+
+    def test_counts(self):
+        new = create_category(self.organisation, "New")
+        contacted = create_category(self.organisation, "Contacted")
+        create_leads(self.organisation, 3, category=new)
+        create_leads(self.organisation, 2)
+        response = self.client.get(reverse("leads:category-list"))
+        counts = {category.name: category.lead_count for category in response.context["category_list"]}
+        self.assertEqual(counts, {"New": 3, "Contacted": 0})
+        self.assertEqual(response.context["unassigned_leads_count"], 2)
+
+    def test_query_count_is_constant(self):
+        create_category(self.organisation, "New")
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse("leads:category-list"))
+        for i in range(10):
+            create_leads(self.organisation, 1, category=create_category(self.organisation, f"Category {i}"))
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse("leads:category-list"))
+        self.assertEqual(len(few), len(many))
+
+
+class CategoryDetailViewTest(TestCase):
+
+    def setUp(self):
+        self.user = create_organisor()
+        self.organisation = self.user.userprofile
+        self.category = create_category(self.organisation, "New")
+        self.client.force_login(self.user)
+
+    def test_leads_are_paginated(self):
+        leads = create_leads(self.organisation, 30, category=self.category)
+        url = reverse("leads:category-detail", kwargs={"pk": self.category.pk})
+        first = self.client.get(url).context["leads"]
+        self.assertEqual([lead.pk for lead in first], [lead.pk for lead in reversed(leads)][:25])
+        second = self.client.get(url + first.next_url).context["leads"]
+        self.assertEqual([lead.pk for lead in second], [lead.pk for lead in reversed(leads)][25:])
+        self.assertFalse(second.has_next())
+        self.assertEqual(self.client.get(url, {"cursor": "nonsense"}).status_code, 404)
@@ -1,6 +1,8 @@
 from django.urls import path
 from .views import (
     LeadListView, LeadDetailView, LeadCreateView, LeadUpdateView, LeadDeleteView,
+    LeadImportView, LeadExportView, LeadSearchView, LeadDuplicateView, LeadRoutingView,
+    LeadBulkActionView, LeadApiListView, LeadApiDetailView, LeadApiBulkView, CategoryApiListView, AgentApiListView,
     AssignAgentView, CategoryListView, 
     CategoryDetailView, LeadCategoryUpdateView
 )
@@ -9,7 +11,13 @@ app_name = "leads"
 
 urlpatterns=[
     path('', LeadListView.as_view(), name='lead-list'),
+    path('search/', LeadSearchView.as_view(), name='lead-search'),
     path('create/', LeadCreateView.as_view(), name='lead-create'),
+    path('import/', LeadImportView.as_view(), name='lead-import'),
+    path('export/', LeadExportView.as_view(), name='lead-export'),
+    path('bulk/', LeadBulkActionView.as_view(), name='lead-bulk-action'),
+    path('duplicates/', LeadDuplicateView.as_view(), name='lead-duplicates'),
+    path('routing/', LeadRoutingView.as_view(), name='lead-routing'),
     path('<int:pk>/', LeadDetailView.as_view(), name='lead-details'),
     path('<int:pk>/update/', LeadUpdateView.as_view(), name='lead-update'),
     path('<int:pk>/delete/', LeadDeleteView.as_view(), name='lead-delete'),
@@ -17,6 +25,11 @@ urlpatterns=[
     path('categories/', CategoryListView.as_view(), name='category-list'),
     path('categories/<int:pk>', CategoryDetailView.as_view(), name='category-detail'),
     path('<int:pk>/category/', LeadCategoryUpdateView.as_view(), name='lead-category-update'),
+    path('api/leads/', LeadApiListView.as_view(), name='api-lead-list'),
+    path('api/leads/bulk/', LeadApiBulkView.as_view(), name='api-lead-bulk'),
+    path('api/leads/<int:pk>/', LeadApiDetailView.as_view(), name='api-lead-detail'),
+    path('api/categories/', CategoryApiListView.as_view(), name='api-category-list'),
+    path('api/agents/', AgentApiListView.as_view(), name='api-agent-list'),
 
 ] 
 
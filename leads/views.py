@@ -1,12 +1,26 @@
-from django.core.mail import send_mail
+import json
+import uuid
+from collections import Counter
+
 from django.contrib.auth.forms import UserCreationForm
-from django.shortcuts import render, redirect, reverse 
+from django.shortcuts import render, redirect, reverse, get_object_or_404
 from django.contrib.auth.mixins import LoginRequiredMixin
-from agents.mixins import OrganisorAndLoginRequiredMixin
-from django.http import HttpResponse
+from agents.mixins import OrganisorAndLoginRequiredMixin, ConditionalGetMixin, IdempotentPostMixin
+from django.http import HttpResponse, Http404, StreamingHttpResponse, JsonResponse
 from django.views import generic 
-from .models import Lead, Agent, Category
-from .forms import LeadForm, LeadModelForm, CustomUserCreationForm, AssignAgentForm, LeadCategoryUpdateForm
+from django.contrib import messages
+from .models import Lead, Agent, Category, UserProfile, VersionConflict
+from .forms import (
+    LeadForm, LeadModelForm, CustomUserCreationForm, AssignAgentForm, LeadCategoryUpdateForm, LeadImportForm,
+    LeadMergeForm, LeadRoutingForm, LeadBulkActionForm
+)
+from .importers import LeadImporter, read_rows, text_stream
+from . import exporters
+from .pagination import KeysetPaginator, InvalidCursor
+from .mail import queue_mail
+from .sqlite import atomic_write
+from .bulk import bulk_update_leads, bulk_delete_leads
+from . import api, caching, idempotency, search, fuzzy, duplicates, routing
 
 
 class SignupView(generic.CreateView):
@@ -26,31 +40,114 @@ def landing_page(request):
     return render(request, "landing.html")
 
 
-class LeadListView(LoginRequiredMixin, generic.ListView):
+def page_url(request, cursor_kwarg, cursor):
+    """The current URL moved to the page at cursor, None if there is no such page."""
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query[cursor_kwarg] = cursor
+    return f"?{query.urlencode()}"
+
+
+class LeadListView(LoginRequiredMixin, ConditionalGetMixin, generic.ListView):
     template_name = "leads/lead_list.html"
+    read_from_replica = True
     #queryset = Lead.objects.all()
     context_object_name = "leads"
+    paginate_by = 25
+    unassigned_paginate_by = 10
+    cursor_kwarg = "cursor"
+    unassigned_cursor_kwarg = "unassigned_cursor"
+    #only the columns the table rows and unassigned cards render, plus the pagination and fragment cache keys
+    fields = ("first_name", "last_name", "age", "email", "phone_number", "date_added", "updated_at", "category", "category__name")
+    unassigned_fields = ("first_name", "last_name", "description", "date_added", "updated_at")
 
     def get_queryset(self):  
         user = self.request.user
 
         #initial queryset of leads for the entire organisation
-        if user.is_organisor:
-            queryset = Lead.objects.filter(organisation=user.userprofile, agent__isnull=False)
-        else:
-            queryset = Lead.objects.filter(organisation=user.agent.organisation, agent__isnull=False)
+        queryset = Lead.objects.filter(organisation=self.request.organisation, agent__isnull=False)
+        if not user.is_organisor:
             #filter for the agent that is logged in 
             queryset = queryset.filter(agent__user=user)
-        return queryset    
+        return queryset.select_related("category").only(*self.fields)
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size)
+        page = self.get_page(paginator, self.cursor_kwarg)
+        return (paginator, page, page.object_list, page.has_other_pages())
+
+    def get_cache_scope(self):
+        user = self.request.user
+        return "organisation" if user.is_organisor else f"user{user.pk}"
+
+    def get_page(self, paginator, cursor_kwarg):
+        cursor = self.request.GET.get(cursor_kwarg)
+        name = f"lead-list:{self.get_cache_scope()}:{cursor_kwarg}:{cursor or ''}"
+        try:
+            page = caching.get_or_set(self.request.organisation, name, lambda: paginator.page(cursor))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        page.next_url = self.get_page_url(cursor_kwarg, page.next_cursor)
+        page.previous_url = self.get_page_url(cursor_kwarg, page.previous_cursor)
+        return page
+
+    def get_page_url(self, cursor_kwarg, cursor):
+        return page_url(self.request, cursor_kwarg, cursor)
 
     def get_context_data(self, **kwargs):
         context = super(LeadListView, self).get_context_data(**kwargs)
+        if self.request.user.is_organisor:
+            queryset = Lead.objects.filter(
+                organisation=self.request.organisation, agent__isnull=True
+            ).only(*self.unassigned_fields)
+            paginator = KeysetPaginator(queryset, self.unassigned_paginate_by)
+            context.update({
+                "unassigned_leads": self.get_page(paginator, self.unassigned_cursor_kwarg),
+                "bulk_form": LeadBulkActionForm(request=self.request),
+            })
+        return context
+
+
+class LeadSearchView(LoginRequiredMixin, generic.TemplateView):
+    template_name = "leads/lead_search.html"
+    paginate_by = 25
+
+    def get_page_number(self):
+        try:
+            return max(1, int(self.request.GET.get("page", 1)))
+        except ValueError:
+            raise Http404("Invalid page")
+
+    def get_context_data(self, **kwargs):
+        context = super(LeadSearchView, self).get_context_data(**kwargs)
         user = self.request.user
-        if user.is_organisor:
-            queryset = Lead.objects.filter(organisation=user.userprofile, agent__isnull=True)
+        query = self.request.GET.get("q", "").strip()
+        agent = None if user.is_organisor else user.agent
+        if self.request.GET.get("mode") == "fuzzy":
             context.update({
-                "unassigned_leads": queryset
+                "query": query,
+                "fuzzy": True,
+                "leads": fuzzy.fuzzy_search_leads(self.request.organisation, query, agent=agent, limit=self.paginate_by),
+                "page_number": 1,
+                "has_next": False,
             })
+            return context
+        page_number = self.get_page_number()
+
+        #fetch one extra to know whether there is a next page without counting the matches
+        leads = search.search_leads(
+            self.request.organisation, query,
+            agent=agent,
+            limit=self.paginate_by + 1,
+            offset=(page_number - 1) * self.paginate_by
+        )
+        context.update({
+            "query": query,
+            "leads": leads[:self.paginate_by],
+            "page_number": page_number,
+            "has_next": len(leads) > self.paginate_by,
+        })
         return context
 
 
@@ -63,8 +160,9 @@ def lead_list(request):
 
 
 
-class LeadDetailView(LoginRequiredMixin, generic.DetailView):
+class LeadDetailView(LoginRequiredMixin, ConditionalGetMixin, generic.DetailView):
     template_name = "leads/lead_detail.html"
+    read_from_replica = True
     queryset = Lead.objects.all()
     context_object_name = "lead"
 
@@ -72,14 +170,25 @@ class LeadDetailView(LoginRequiredMixin, generic.DetailView):
         user = self.request.user
 
         #initial queryset of leads for the entire organisation
-        if user.is_organisor:
-            queryset = Lead.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Lead.objects.filter(organisation=user.agent.organisation)
+        queryset = Lead.objects.filter(organisation=self.request.organisation)
+        if not user.is_organisor:
             #filter for the agent that is logged in 
             queryset = queryset.filter(agent__user=user)
         return queryset 
 
+    def get_object(self, queryset=None):
+        #loaded once, for the conditional GET validators and then for the page
+        if not hasattr(self, "object"):
+            self.object = super(LeadDetailView, self).get_object(queryset)
+        return self.object
+
+    def get_version(self):
+        #the page shows nothing but the lead itself
+        return self.get_object().updated_at.timestamp()
+
+    def get_last_modified(self):
+        return self.get_object().updated_at
+
 def lead_details(request, pk):
     lead = Lead.objects.get(id=pk)
     context={
@@ -88,19 +197,33 @@ def lead_details(request, pk):
     return render(request, "leads/lead_detail.html", context)
 
 
-class LeadCreateView(OrganisorAndLoginRequiredMixin, generic.CreateView):
+class LeadCreateView(OrganisorAndLoginRequiredMixin, IdempotentPostMixin, generic.CreateView):
     template_name = "leads/lead_create.html"
     form_class = LeadModelForm
+
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(LeadCreateView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "request": self.request
+        })
+        return kwargs
     
     def get_success_url(self):
         return reverse("leads:lead-list")
 
+    def get_context_data(self, **kwargs):
+        context = super(LeadCreateView, self).get_context_data(**kwargs)
+        #a resubmitted or double clicked form creates the lead only once
+        context.setdefault("idempotency_key", idempotency.get_key(self.request) or uuid.uuid4().hex)
+        return context
+
+    @atomic_write()
     def form_valid(self, form):
-        #TODO send email
         lead = form.save(commit=False)
-        lead.organisation = self.request.user.userprofile
+        lead.organisation = self.request.organisation
+        routing.route_new_lead(lead)
         lead.save()
-        send_mail(
+        queue_mail(
             subject=" A lead has been created", 
             message="Go to the site to see the new lead",
             from_email= "test@test.com",
@@ -123,19 +246,179 @@ def lead_create(request):
     return render(request, "leads/lead_create.html", context)
 
 
-class LeadUpdateView(OrganisorAndLoginRequiredMixin, generic.UpdateView):
+class LeadConflictMixin:
+    """Shows a VersionedLeadForm again when someone else saved the lead first.
+
+    The form keeps the user's input, lists the saved values it would replace
+    and carries the new version, so submitting again overwrites them knowingly.
+    """
+    conflict_message = "Someone else changed this lead while you were editing it. Submit again to replace their changes with yours."
+
+    def form_valid(self, form):
+        try:
+            return super(LeadConflictMixin, self).form_valid(form)
+        except VersionConflict:
+            pass
+        current = self.get_queryset().filter(pk=self.object.pk).first()
+        if current is None:
+            messages.error(self.request, "Someone else deleted this lead while you were editing it.")
+            return redirect("leads:lead-list")
+        self.object = current
+        data = form.data.copy()
+        data["version"] = current.version
+        form = self.get_form_class()(**dict(self.get_form_kwargs(), data=data, instance=current))
+        initial = {name: form.get_initial_for_field(field, name) for name, field in form.fields.items()}
+        conflicts = [
+            (field.label, getattr(current, name))
+            for name, field in form.fields.items()
+            if name != "version" and field.has_changed(initial[name], form[name].data)
+        ]
+        form.is_valid()
+        form.add_error(None, self.conflict_message)
+        return self.render_to_response(self.get_context_data(form=form, conflicts=conflicts))
+
+
+class LeadUpdateView(OrganisorAndLoginRequiredMixin, LeadConflictMixin, generic.UpdateView):
     template_name = "leads/lead_update.html"
     form_class = LeadModelForm
+
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(LeadUpdateView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "request": self.request
+        })
+        return kwargs
     
     def get_queryset(self):  
-        user = self.request.user
-        return Lead.objects.filter(organisation=user.userprofile)
+        return Lead.objects.filter(organisation=self.request.organisation)
     
     def get_success_url(self):
         return reverse("leads:lead-list")
     
 
 
+class LeadImportView(OrganisorAndLoginRequiredMixin, generic.FormView):
+    template_name = "leads/lead_import.html"
+    form_class = LeadImportForm
+    max_errors_shown = 100
+
+    def form_valid(self, form):
+        importer = LeadImporter(self.request.organisation, max_errors=self.max_errors_shown)
+        rows = read_rows(text_stream(form.cleaned_data["file"]), form.cleaned_data["format"])
+        result = importer.run(rows)
+        return self.render_to_response(self.get_context_data(
+            form=self.form_class(),
+            result=result,
+            errors=result.errors
+        ))
+
+
+class LeadExportView(OrganisorAndLoginRequiredMixin, generic.View):
+
+    def get(self, request, *args, **kwargs):
+        format = request.GET.get("format", "csv")
+        if format not in exporters.FORMATS:
+            raise Http404("Unknown export format")
+        response = StreamingHttpResponse(
+            exporters.export_lines(request.organisation, format),
+            content_type=exporters.CONTENT_TYPES[format]
+        )
+        response["Content-Disposition"] = f'attachment; filename="leads.{format}"'
+        return response
+
+
+class LeadBulkActionView(OrganisorAndLoginRequiredMixin, generic.FormView):
+    """Assigns, recategorises or deletes many leads with a single UPDATE or DELETE.
+
+    Answers with JSON when asked for it, otherwise goes back to the lead list.
+    """
+    form_class = LeadBulkActionForm
+    http_method_names = ["post"]
+
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(LeadBulkActionView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "request": self.request
+        })
+        return kwargs
+
+    def wants_json(self):
+        return "application/json" in self.request.headers.get("Accept", "")
+
+    def form_valid(self, form):
+        organisation = self.request.organisation
+        action = form.cleaned_data["action"]
+        queryset = form.get_queryset()
+        if action == "delete":
+            count = bulk_delete_leads(organisation, queryset)
+        elif action == "assign":
+            count = bulk_update_leads(organisation, queryset, "agent", form.cleaned_data["agent"])
+        else:
+            count = bulk_update_leads(organisation, queryset, "category", form.cleaned_data["category"])
+
+        if self.wants_json():
+            return JsonResponse({"action": action, "count": count})
+        verb = {"assign": "Assigned", "categorise": "Recategorised", "delete": "Deleted"}[action]
+        messages.success(self.request, f"{verb} {count} lead{'' if count == 1 else 's'}.")
+        return redirect("leads:lead-list")
+
+    def form_invalid(self, form):
+        if self.wants_json():
+            return JsonResponse({"errors": form.errors}, status=400)
+        for error in form.errors.values():
+            messages.error(self.request, " ".join(error))
+        return redirect("leads:lead-list")
+
+
+class LeadDuplicateView(OrganisorAndLoginRequiredMixin, generic.FormView):
+    """Lists groups of leads that look like the same person and merges a group on POST."""
+    template_name = "leads/lead_duplicates.html"
+    form_class = LeadMergeForm
+    max_groups = 50
+
+    def get_keys(self):
+        keys = [key for key in self.request.GET.getlist("by") if key in duplicates.KEYS]
+        return keys or list(duplicates.DEFAULT_KEYS)
+
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(LeadDuplicateView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "request": self.request
+        })
+        return kwargs
+
+    def get_success_url(self):
+        return self.request.get_full_path()
+
+    def form_valid(self, form):
+        try:
+            duplicates.merge_group(
+                self.request.organisation,
+                [lead.pk for lead in form.cleaned_data["leads"]],
+                survivor_id=form.cleaned_data["survivor"].pk
+            )
+        except duplicates.MergeError as error:
+            form.add_error(None, str(error))
+            return self.form_invalid(form)
+        return super(LeadDuplicateView, self).form_valid(form)
+
+    def get_context_data(self, **kwargs):
+        context = super(LeadDuplicateView, self).get_context_data(**kwargs)
+        keys = self.get_keys()
+        groups = duplicates.find_duplicates(self.request.organisation, keys=keys)
+        shown = groups[:self.max_groups]
+        leads = Lead.objects.select_related("agent__user", "category").in_bulk(
+            [pk for group in shown for pk in group]
+        )
+        context.update({
+            "keys": keys,
+            "all_keys": sorted(duplicates.KEYS),
+            "group_count": len(groups),
+            "groups": [[leads[pk] for pk in group if pk in leads] for group in shown],
+        })
+        return context
+
+
 def lead_update(request, pk):
     lead = Lead.objects.get(id=pk)
     form = LeadModelForm(instance=lead)
@@ -158,8 +441,7 @@ class LeadDeleteView(OrganisorAndLoginRequiredMixin, generic.DeleteView):
         return reverse("leads:lead-list")
 
     def get_queryset(self):  
-        user = self.request.user
-        return Lead.objects.filter(organisation=user.userprofile)
+        return Lead.objects.filter(organisation=self.request.organisation)
 
 def lead_delete(request, pk):
     lead = Lead.objects.get(id=pk)
@@ -183,70 +465,265 @@ class AssignAgentView(OrganisorAndLoginRequiredMixin, generic.FormView):
 
     def form_valid(self, form):
         agent =form.cleaned_data["agent"]
-        lead = Lead.objects.get(id=self.kwargs["pk"])
+        lead = get_object_or_404(Lead, organisation=self.request.organisation, id=self.kwargs["pk"])
         lead.agent =agent
-        lead.save()
+        try:
+            lead.save()
+        except VersionConflict:
+            messages.error(self.request, "Someone else deleted this lead while you were assigning it.")
         return super(AssignAgentView, self).form_valid(form)
 
 
-class CategoryListView(LoginRequiredMixin, generic.ListView):
+class LeadRoutingView(OrganisorAndLoginRequiredMixin, generic.UpdateView):
+    """The organisation's automatic routing setting, and routing every unassigned lead on demand."""
+    template_name = "leads/lead_routing.html"
+    form_class = LeadRoutingForm
+
+    def get_object(self, queryset=None):
+        return UserProfile.objects.get(pk=self.request.organisation.pk)
+
+    def get_success_url(self):
+        return reverse("leads:lead-routing")
+
+    def form_valid(self, form):
+        if "route" not in self.request.POST:
+            return super(LeadRoutingView, self).form_valid(form)
+        if not form.cleaned_data["routing_strategy"]:
+            form.add_error("routing_strategy", "Pick a strategy to route the unassigned leads with.")
+            return self.form_invalid(form)
+        routed = routing.route_unassigned(self.object, form.cleaned_data["routing_strategy"])
+        return self.render_to_response(self.get_context_data(form=form, routed=routed))
+
+    def get_context_data(self, **kwargs):
+        context = super(LeadRoutingView, self).get_context_data(**kwargs)
+        context.update({
+            "unassigned_count": Lead.objects.filter(organisation=self.request.organisation, agent__isnull=True).count(),
+            "agents": Agent.objects.filter(organisation=self.request.organisation).select_related("user").order_by("id"),
+        })
+        return context
+
+
+class CategoryListView(LoginRequiredMixin, ConditionalGetMixin, generic.ListView):
     template_name = "leads/category_list.html"
+    read_from_replica = True
     context_object_name = "category_list"
-    
-    # def get_context_data(self, **kwargs):
-    #     context = super(CategoryListView, self).get_context_data(**kwargs)
-    #     user = self.request.user
 
-    #     if user.is_organisor:
-    #         queryset = Category.objects.filter(organisation=user.userprofile)
-    #     else:
-    #         queryset = Category.objects.filter(organisation=user.agent.organisation)
-
-    #     context.update({
-    #         "unassigned_lead_count": queryset.filter(category__isnull=True).count()
-    #     })
-    #     return context
+    def get_context_data(self, **kwargs):
+        context = super(CategoryListView, self).get_context_data(**kwargs)
+        #category counts are kept on Category.lead_count, only the uncategorised leads need counting
+        organisation = self.request.organisation
+        unassigned_leads_count = caching.get_or_set(
+            organisation, "uncategorised-count",
+            lambda: Lead.objects.filter(organisation=organisation, category__isnull=True).count()
+        )
+        context.update({
+            "unassigned_leads_count": unassigned_leads_count
+        })
+        return context
 
     def get_queryset(self):  
-        user = self.request.user
-        #initial queryset of leads for the entire organisation
-        if user.is_organisor:
-            queryset = Category.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Category.objects.filter(organisation=user.agent.organisation)
-        return queryset
+        organisation = self.request.organisation
+        return caching.get_or_set(organisation, "categories", lambda: list(Category.objects.filter(organisation=organisation)))
 
 
-class CategoryDetailView(LoginRequiredMixin, generic.DetailView):
+class CategoryDetailView(LoginRequiredMixin, ConditionalGetMixin, generic.DetailView):
     template_name = "leads/category_detail.html"
+    read_from_replica = True
     context_object_name = "category"
+    paginate_by = 25
+    cursor_kwarg = "cursor"
 
     def get_queryset(self):  
-        user = self.request.user
+        return Category.objects.filter(organisation=self.request.organisation)
 
-        #initial queryset of leads for the entire organisation
-        if user.is_organisor:
-            queryset = Category.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Category.objects.filter(organisation=user.agent.organisation)
-        return queryset
+    def get_context_data(self, **kwargs):
+        context = super(CategoryDetailView, self).get_context_data(**kwargs)
+        leads = Lead.objects.filter(
+            organisation=self.request.organisation, category=self.object
+        ).only("first_name", "last_name", "category")
+        #newest first by id, which lead_org_category_idx already holds in order
+        paginator = KeysetPaginator(leads, self.paginate_by, ordering=("-id",))
+        cursor = self.request.GET.get(self.cursor_kwarg)
+        #only the page asked for is cached, never the whole category
+        name = f"category:{self.object.pk}:leads:{cursor or ''}"
+        try:
+            page = caching.get_or_set(self.request.organisation, name, lambda: paginator.page(cursor))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        page.next_url = page_url(self.request, self.cursor_kwarg, page.next_cursor)
+        page.previous_url = page_url(self.request, self.cursor_kwarg, page.previous_cursor)
+        context.update({
+            "leads": page,
+        })
+        return context
 
 
-class LeadCategoryUpdateView(LoginRequiredMixin, generic.UpdateView):
+class LeadCategoryUpdateView(LoginRequiredMixin, LeadConflictMixin, generic.UpdateView):
     template_name = "leads/lead_category_update.html"
     form_class =  LeadCategoryUpdateForm
     
+    def get_form_kwargs(self, **kwargs):
+        kwargs = super(LeadCategoryUpdateView, self).get_form_kwargs(**kwargs)
+        kwargs.update({
+            "request": self.request
+        })
+        return kwargs
+
     def get_queryset(self):  
-        user = self.request.user
-        #initial queryset of leads for the entire organisation
-        if user.is_organisor:
-            queryset = Lead.objects.filter(organisation=user.userprofile)
-        else:
-            queryset = Lead.objects.filter(organisation=user.agent.organisation)
-        return queryset   
+        return Lead.objects.filter(organisation=self.request.organisation)
 
     def get_success_url(self):
-        return reverse("lead:lead-detail", kwargs={"pk": self.get_object().id})
-    
-    
+        return reverse("leads:lead-details", kwargs={"pk": self.object.id})
+
+
+class ApiView(LoginRequiredMixin, generic.View):
+    """Base for the read-only JSON API, answers GETs with whatever get_data() returns.
+
+    Rows are read with values(), so no model instances are built, and
+    the `fields` parameter narrows the columns selected.
+    """
+    #field name -> lookup
+    fields = {}
+    organisor_required = False
+    #anonymous clients get a 403 rather than a login redirect
+    raise_exception = True
+
+    def dispatch(self, request, *args, **kwargs):
+        user = request.user
+        if user.is_authenticated and self.organisor_required and not user.is_organisor:
+            return JsonResponse({"errors": {"__all__": ["Only organisors can read this."]}}, status=403)
+        return super(ApiView, self).dispatch(request, *args, **kwargs)
+
+    def get_field_names(self):
+        return api.parse_fields(self.request.GET.get("fields"), self.fields)
+
+    def get_data(self):
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        try:
+            return JsonResponse(self.get_data())
+        except api.InvalidFields as error:
+            return JsonResponse({"errors": {"fields": [str(error)]}}, status=400)
+        except Http404 as error:
+            return JsonResponse({"errors": {"__all__": [str(error)]}}, status=404)
+
+
+class LeadApiListView(ConditionalGetMixin, ApiView):
+    fields = api.LEAD_FIELDS
+    read_from_replica = True
+    paginate_by = 100
+    max_paginate_by = 500
+    cursor_kwarg = "cursor"
+
+    def get_page_size(self):
+        try:
+            return min(self.max_paginate_by, max(1, int(self.request.GET.get("limit", self.paginate_by))))
+        except ValueError:
+            return self.paginate_by
+
+    def get_page_url(self, cursor):
+        if cursor is None:
+            return None
+        query = self.request.GET.copy()
+        query[self.cursor_kwarg] = cursor
+        return f"{self.request.path}?{query.urlencode()}"
+
+    def get_data(self):
+        names = self.get_field_names()
+        queryset = api.lead_queryset(self.request.user, self.request.organisation)
+        #the paginator reads the cursor columns from the rows
+        rows = api.project(queryset, names, self.fields, extra=api.LEAD_ORDERING)
+        paginator = KeysetPaginator(rows, self.get_page_size(), ordering=api.LEAD_ORDERING)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404("Invalid cursor")
+        return {
+            "results": api.serialise(page, names, self.fields),
+            "next": self.get_page_url(page.next_cursor),
+            "previous": self.get_page_url(page.previous_cursor),
+        }
+
+
+class LeadApiDetailView(ConditionalGetMixin, ApiView):
+    fields = api.LEAD_FIELDS
+    read_from_replica = True
+
+    def get_data(self):
+        names = self.get_field_names()
+        queryset = api.lead_queryset(self.request.user, self.request.organisation).filter(pk=self.kwargs["pk"])
+        row = api.project(queryset, names, self.fields).first()
+        if row is None:
+            raise Http404("No lead found")
+        return api.serialise([row], names, self.fields)[0]
+
+
+class CategoryApiListView(ConditionalGetMixin, ApiView):
+    fields = api.CATEGORY_FIELDS
+    read_from_replica = True
+
+    def get_data(self):
+        names = self.get_field_names()
+        rows = api.project(api.category_queryset(self.request.organisation), names, self.fields)
+        return {"results": api.serialise(rows, names, self.fields)}
+
+
+class AgentApiListView(ConditionalGetMixin, ApiView):
+    fields = api.AGENT_FIELDS
+    read_from_replica = True
+    organisor_required = True
+
+    def get_data(self):
+        names = self.get_field_names()
+        rows = api.project(api.agent_queryset(self.request.organisation), names, self.fields)
+        return {"results": api.serialise(rows, names, self.fields)}
+
+
+class BaseLeadApiBulkView(ApiView):
+    """Creates and updates up to max_items leads from a JSON list, answering with a result per lead.
+
+    The body is a list of leads, or an object with the list under "leads".
+    Leads with an "id" are updated, only the fields given change.
+    """
+    organisor_required = True
+    http_method_names = ["post"]
+    max_items = 5000
+
+    def error(self, message):
+        return JsonResponse({"errors": {"__all__": [message]}}, status=400)
+
+    def post(self, request, *args, **kwargs):
+        try:
+            body = json.loads(request.body)
+        except ValueError:
+            return self.error("The body is not valid JSON.")
+        items = body.get("leads") if isinstance(body, dict) else body
+        if not isinstance(items, list):
+            return self.error("Expected a list of leads.")
+        if len(items) > self.max_items:
+            return self.error(f"At most {self.max_items} leads can be sent at once.")
+
+        results = api.LeadBatchWriter(request.organisation).run(items)
+        counts = Counter(result["status"] for result in results)
+        if counts["created"]:
+            #one email for the whole request rather than one per lead
+            queue_mail(
+                subject=f" {counts['created']} leads have been created",
+                message="Go to the site to see the new leads",
+                from_email="test@test.com",
+                recipient_list=["test2@test.com"]
+            )
+        return JsonResponse({
+            "created": counts["created"],
+            "updated": counts["updated"],
+            "failed": counts["error"],
+            "results": results,
+        })
+
+
+class LeadApiBulkView(IdempotentPostMixin, BaseLeadApiBulkView):
+    """The bulk endpoint, sent with an Idempotency-Key header the whole request is one transaction.
 
+    A retry either replays a complete result or runs from scratch.
+    """